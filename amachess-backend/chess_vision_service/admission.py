@@ -0,0 +1,177 @@
+"""
+Admission control for expensive endpoints.
+AdmissionController caps how many operations run at once and how many may
+wait for a slot; TokenBucketLimiter applies per-client request rates.
+Both reject with AdmissionRejected, which carries the HTTP status and a
+Retry-After hint, instead of letting work pile up.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Request refused because the service or the client is over its limits"""
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, time-limited wait queue"""
+
+    def __init__(self, name: str, max_active: int, max_waiting: int, wait_timeout: float):
+        self.name = name
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.background_waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        # Moving average of how long a slot is held, used for Retry-After hints
+        self._avg_hold_seconds = 1.0
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Take a slot, waiting up to timeout; raises AdmissionRejected (503)"""
+        timeout = self.wait_timeout if timeout is None else timeout
+        with self._condition:
+            if self.active >= self.max_active:
+                if self.waiting >= self.max_waiting:
+                    self.rejected_queue_full += 1
+                    raise AdmissionRejected(
+                        f'Service busy: {self.name} queue is full',
+                        503, self._estimated_wait()
+                    )
+
+                self.waiting += 1
+                try:
+                    deadline = time.monotonic() + timeout
+                    while self.active >= self.max_active:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected_timeout += 1
+                            raise AdmissionRejected(
+                                f'Service busy: timed out waiting for a {self.name} slot',
+                                503, self._estimated_wait()
+                            )
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            self.active += 1
+            self.admitted += 1
+        return time.monotonic()
+
+    def acquire_background(self, interrupt: Optional[Callable[[], None]] = None,
+                           poll_seconds: float = 1.0) -> float:
+        """
+        Take a slot for queued background work. It waits as long as it takes,
+        outside the request queue, so it never fills it or times out. interrupt()
+        is called between polls and may raise to stop waiting.
+        """
+        while True:
+            with self._condition:
+                if self.active < self.max_active:
+                    self.active += 1
+                    self.admitted += 1
+                    return time.monotonic()
+                self.background_waiting += 1
+                try:
+                    self._condition.wait(poll_seconds)
+                finally:
+                    self.background_waiting -= 1
+            if interrupt is not None:
+                interrupt()
+
+    def release(self, acquired_at: Optional[float] = None):
+        with self._condition:
+            self.active -= 1
+            if acquired_at is not None:
+                held = time.monotonic() - acquired_at
+                self._avg_hold_seconds = 0.8 * self._avg_hold_seconds + 0.2 * held
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        acquired_at = self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release(acquired_at)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'active': self.active,
+                'max_active': self.max_active,
+                'queue_depth': self.waiting,
+                'background_waiting': self.background_waiting,
+                'max_queue': self.max_waiting,
+                'admitted': self.admitted,
+                'rejected_queue_full': self.rejected_queue_full,
+                'rejected_timeout': self.rejected_timeout,
+                'avg_hold_seconds': round(self._avg_hold_seconds, 3)
+            }
+
+    def _estimated_wait(self) -> float:
+        # Everyone ahead of us has to finish, max_active at a time
+        return self._avg_hold_seconds * (self.waiting + 1) / self.max_active
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets: rate tokens per second, up to burst"""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def consume(self, client: str, tokens: float = 1.0):
+        """Take tokens from the client's bucket; raises AdmissionRejected (429)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._prune(now)
+                bucket = self._buckets[client] = [self.burst, now]
+
+            available = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if available < tokens:
+                bucket[0] = available
+                self.rejected += 1
+                raise AdmissionRejected(
+                    'Rate limit exceeded, please slow down',
+                    429, (tokens - available) / self.rate
+                )
+            bucket[0] = available - tokens
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'clients': len(self._buckets),
+                'rejected': self.rejected
+            }
+
+    def _prune(self, now: float):
+        """Forget clients whose buckets have refilled completely"""
+        full_after = self.burst / self.rate
+        for client, (_, last_seen) in list(self._buckets.items()):
+            if now - last_seen >= full_after:
+                del self._buckets[client]
@@ -1,16 +1,33 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, make_response
 from flask_cors import CORS
 import cv2
 import numpy as np
-from pdf2image import convert_from_bytes
-import io
+from pdf2image import convert_from_path, pdfinfo_from_path
+import json
 import base64
 import logging
 import os
-import hashlib
-import tempfile
+import re
+import subprocess
+import threading
+import time
 from datetime import datetime
+from functools import wraps
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
+from PIL import Image
+
+from page_cache import PageCache
+from glyph_cache import GlyphCache
+from fen_cache import FenCache
+from page_store import PageStore
+from page_codec import CompressedPage, available_codecs, decode_page
+from uploads import SpoolingRequest, take_upload
+from jobs import JobManager
+from admission import AdmissionController, AdmissionRejected, TokenBucketLimiter
+import metrics
+import tracing
+from board_detection import create_detection_pool, detect_pages, detector_fingerprint
 
 # Try to import chesscog - if not available, use mock implementation
 try:
@@ -23,6 +40,14 @@ except ImportError as e:
     print("   Using mock FEN implementation")
     CHESSCOG_AVAILABLE = False
 
+# CPU square classifier for printed diagrams (no torch needed)
+try:
+    from square_classifier import SquareClassifier
+    SQUARE_CLASSIFIER_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️  Square classifier not available: {e}")
+    SQUARE_CLASSIFIER_AVAILABLE = False
+
 # Import mock chesscog if available
 try:
     from mock_chesscog import MockChessboardDetector
@@ -42,27 +67,120 @@ CORS(app)
 # Configuration
 UPLOAD_FOLDER = 'temp_uploads'
 CACHE_FOLDER = 'pdf_cache'
+JOB_STATE_FOLDER = 'job_state'  # Job snapshots shared by all worker processes
 ALLOWED_EXTENSIONS = {'pdf'}
+PDF_HASH_PATTERN = re.compile(r'^[0-9a-f]{32}$')  # MD5 hex digest of the PDF bytes
 MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 1024 * 1024 * 1024))  # 1GB of rendered pages
+PDF_CACHE_TTL_SECONDS = int(os.environ.get('PDF_CACHE_TTL_SECONDS', 60 * 60))  # 1 hour
+PAGE_CACHE_CODEC = os.environ.get('PAGE_CACHE_CODEC', 'raw')  # raw, png, zlib or zstd for cached pages
+PAGE_CACHE_BAND_ROWS = int(os.environ.get('PAGE_CACHE_BAND_ROWS', 128))  # Rows per separately decoded band
+PAGE_STORE_MAX_BYTES = int(os.environ.get('PAGE_STORE_MAX_BYTES', 10 * 1024 * 1024 * 1024))  # 10GB on disk, 0 = unbounded
+PAGE_STORE_RESCAN_SECONDS = int(os.environ.get('PAGE_STORE_RESCAN_SECONDS', 300))  # Recount disk use written by other workers
+COORDINATE_DPI = 150  # Bounding boxes are reported in pixels of a page rendered at this DPI
+DETECTION_DPI = int(os.environ.get('DETECTION_DPI', 100))  # Cheap render used for contour detection
+FEN_DPI = int(os.environ.get('FEN_DPI', 300))  # Board regions are re-rendered at this DPI for recognition
+REGION_RENDER_TIMEOUT = 30  # Seconds allowed for one pdftoppm region render
+RENDER_WINDOW_PAGES = int(os.environ.get('RENDER_WINDOW_PAGES', 4))  # Pages rendered per pdftoppm call
+DETECTION_MODE = os.environ.get('DETECTION_MODE', 'thread')  # serial, thread or process
+DETECTION_WORKERS = int(os.environ.get('DETECTION_WORKERS', os.cpu_count() or 1))
+FEN_BATCH_SIZE = int(os.environ.get('FEN_BATCH_SIZE', 32))  # Crops recognized per batch
+MAX_BATCH_BOXES = 500  # Boxes accepted by one /extract_fen/batch request
+MIN_BOARD_PIXELS = 16  # Smallest board side, in request pixels and in the crop, worth recognizing
+FEN_CACHE_MAX_BYTES = int(os.environ.get('FEN_CACHE_MAX_BYTES', 16 * 1024 * 1024))  # Results by region
+FEN_CACHE_TTL_SECONDS = int(os.environ.get('FEN_CACHE_TTL_SECONDS', 24 * 3600))
+GLYPH_CACHE_MAX_ENTRIES = int(os.environ.get('GLYPH_CACHE_MAX_ENTRIES', 50000))  # Memoized square glyphs
+MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', '1') == '1'  # Load fork-safe models at import
+MODEL_RETRY_SECONDS = 5  # First retry after a failed model initialization, doubling per failure
+MODEL_RETRY_MAX_SECONDS = 300  # Longest wait between initialization retries
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))  # Books detected concurrently in the background
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', 60 * 60))  # Keep finished jobs for 1 hour
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get('SHUTDOWN_DRAIN_SECONDS', 100))  # Job grace period on shutdown
+MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 20))  # Jobs waiting for a worker before /jobs answers 503
+MAX_CONCURRENT_DETECTIONS = int(os.environ.get('MAX_CONCURRENT_DETECTIONS', 2))  # PDF conversions + detections at once
+MAX_CONCURRENT_RECOGNITIONS = int(os.environ.get('MAX_CONCURRENT_RECOGNITIONS', 4))  # FEN extractions at once
+ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', 8))  # Requests allowed to wait for a slot
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 30))  # Seconds a request may wait
+CLIENT_RATE_LIMIT = float(os.environ.get('CLIENT_RATE_LIMIT', 5))  # Requests per second per client
+CLIENT_BURST = float(os.environ.get('CLIENT_BURST', 30))  # Burst allowance per client
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))  # Proxies whose X-Forwarded-For is trusted (1 behind the Node backend)
+TRACE_DUMP_DIR = os.environ.get('TRACE_DUMP_DIR', '')  # Enables ?trace=1 Chrome trace dumps into this directory
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Uploaded files are streamed into UPLOAD_FOLDER and hashed as they arrive
+app.request_class = SpoolingRequest
+SpoolingRequest.upload_folder = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+if TRUSTED_PROXY_COUNT > 0:
+    # remote_addr becomes the address the nearest trusted proxy saw
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)
+else:
+    logger.warning("TRUSTED_PROXY_COUNT is 0: X-Forwarded-For is ignored, so clients behind a proxy "
+                   "(such as the Node backend) share one rate limit bucket; set it to 1 there")
 
 # Create directories if they don't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(CACHE_FOLDER, exist_ok=True)
+os.makedirs(JOB_STATE_FOLDER, exist_ok=True)
+
+# PDF cache to store converted page images temporarily (LRU, byte-budgeted, TTL)
+pdf_cache = PageCache(PDF_CACHE_MAX_BYTES, PDF_CACHE_TTL_SECONDS)
+if PAGE_CACHE_CODEC != 'raw' and PAGE_CACHE_CODEC not in available_codecs():
+    print(f"⚠️  Page cache codec {PAGE_CACHE_CODEC} not available, using zlib")
+    PAGE_CACHE_CODEC = 'zlib'
+
+# Persistent page rasters so cached books survive restarts
+page_store = PageStore(CACHE_FOLDER, PAGE_STORE_MAX_BYTES, PAGE_STORE_RESCAN_SECONDS)
 
-# PDF cache to store converted images temporarily
-pdf_cache = {}
+# Recognized positions by request region
+fen_cache = FenCache(FEN_CACHE_MAX_BYTES, FEN_CACHE_TTL_SECONDS)
+
+# Square classifications memoized per book by glyph perceptual hash
+glyph_cache = GlyphCache(GLYPH_CACHE_MAX_ENTRIES)
+
+# Worker pool for per-page board detection (None means serial)
+detection_pool = create_detection_pool(DETECTION_MODE, DETECTION_WORKERS)
+
+# Background queue for whole-book detection jobs, visible to every worker process
+job_manager = JobManager(JOB_WORKERS, JOB_RETENTION_SECONDS, state_dir=JOB_STATE_FOLDER)
+
+# Load protection: bounded concurrency and wait queues, per-client rate limits
+detection_admission = AdmissionController(
+    'detection', MAX_CONCURRENT_DETECTIONS, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+)
+recognition_admission = AdmissionController(
+    'recognition', MAX_CONCURRENT_RECOGNITIONS, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+)
+client_limiter = TokenBucketLimiter(CLIENT_RATE_LIMIT, CLIENT_BURST)
 
 # Initialize chesscog recognizer if available
 recognizer = None
+square_classifier = None
 mock_detector = None
 
-def init_chesscog():
-    """Initialize chesscog recognizer if available"""
-    global recognizer, mock_detector
-    if CHESSCOG_AVAILABLE:
+# Model lifecycle: what is loaded, how long loading and warm-up took, and
+# whether the best available engine has answered a warm-up inference
+model_lock = threading.RLock()
+model_state = {
+    'ready': False,
+    'engine': None,
+    'load_seconds': None,
+    'warmup_seconds': None,
+    'warmed_up_at': None,
+    'error': None,
+    'failures': 0,
+    'retry_in_seconds': None
+}
+# time.monotonic() before which a failed initialization is not retried
+model_retry_at = 0.0
+
+def init_chesscog(load_chesscog=True):
+    """
+    Initialize chesscog recognizer if available, plus the fallback engines.
+    Engines that are already loaded are kept, so this is safe to call again.
+    """
+    global recognizer, square_classifier, mock_detector
+    if CHESSCOG_AVAILABLE and load_chesscog and recognizer is None:
         try:
             recognizer = ChessRecognizer()
             print("✅ ChessRecognizer initialized successfully")
@@ -71,8 +189,17 @@ def init_chesscog():
             print("   Falling back to mock implementation")
             recognizer = None
     
+    # Template-matching engine used whenever chesscog is not
+    if SQUARE_CLASSIFIER_AVAILABLE and square_classifier is None:
+        try:
+            square_classifier = SquareClassifier(glyph_cache=glyph_cache)
+            print(f"✅ Square classifier initialized (glyphs from {square_classifier.font_path})")
+        except Exception as e:
+            print(f"⚠️  Failed to initialize square classifier: {e}")
+            square_classifier = None
+
     # Initialize mock detector as fallback
-    if MOCK_CHESSCOG_AVAILABLE:
+    if MOCK_CHESSCOG_AVAILABLE and mock_detector is None:
         try:
             mock_detector = MockChessboardDetector()
             print("✅ Mock ChessRecognizer initialized as fallback")
@@ -80,180 +207,489 @@ def init_chesscog():
             print(f"⚠️  Failed to initialize Mock ChessRecognizer: {e}")
             mock_detector = None
 
-def generate_pdf_hash(pdf_bytes):
-    """Generate a hash for the PDF content"""
-    return hashlib.md5(pdf_bytes).hexdigest()
+def active_engine():
+    """Name of the engine extract_fen_from_image will use"""
+    return available_engines()[0]
 
-def cache_pdf_images(pdf_hash, images):
-    """Cache PDF images in memory"""
-    pdf_cache[pdf_hash] = {
-        'images': images,
-        'timestamp': datetime.now()
-    }
+def available_engines():
+    """Engines loaded in this process, in the order extract_fen_from_image tries them"""
+    engines = []
+    if CHESSCOG_AVAILABLE and recognizer is not None:
+        engines.append('chesscog')
+    if square_classifier is not None:
+        engines.append('square_classifier')
+    if MOCK_CHESSCOG_AVAILABLE and mock_detector is not None:
+        engines.append('mock')
+    engines.append('basic')
+    return engines
 
-def get_cached_pdf_images(pdf_hash):
-    """Get cached PDF images"""
-    return pdf_cache.get(pdf_hash, {}).get('images')
+def synthetic_board_image(size=400):
+    """Checkered 8x8 grayscale board with a few solid pieces, for warm-up inferences"""
+    square = size // 8
+    board = np.full((size, size), 255, dtype=np.uint8)
+    for row in range(8):
+        for col in range(8):
+            if (row + col) % 2 == 1:
+                board[row * square:(row + 1) * square, col * square:(col + 1) * square] = 170
+    for row, col in ((0, 4), (1, 3), (6, 4), (7, 4)):
+        cv2.circle(board, (col * square + square // 2, row * square + square // 2), square // 3, 0, -1)
+    cv2.rectangle(board, (0, 0), (size - 1, size - 1), 0, 3)
+    return board
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def warm_up_models():
+    """Run one inference on a synthetic board so no request pays first-call costs"""
+    start = time.perf_counter()
+    extract_fens_from_images([synthetic_board_image()])
+    return time.perf_counter() - start
 
-def detect_chessboard_contours(image):
+def init_models(load_chesscog=True, warm_up=True):
     """
-    Detect chessboard-like contours in an image using OpenCV
-    Returns list of bounding boxes with confidence scores
+    Load recognition models once and warm up the active engine.
+    The pure NumPy engines are loaded at import (see MODEL_PRELOAD), so a
+    preloading WSGI master shares them with its workers copy-on-write.
+    chesscog (torch) and the warm-up inference are not fork-safe and run in
+    each worker instead: from the WSGI server's post-fork hook, from wsgi.py
+    under servers without one, from __main__, or on the first recognition
+    request as a last resort. A failure is recorded in model_state and
+    retried with exponential backoff (see ensure_models_ready).
     """
+    global model_retry_at
+    with model_lock:
+        try:
+            start = time.perf_counter()
+            init_chesscog(load_chesscog)
+            # Total across calls: preload in the master plus the rest in the worker
+            model_state['load_seconds'] = round((model_state['load_seconds'] or 0) + time.perf_counter() - start, 3)
+            model_state['engine'] = active_engine()
+            if warm_up:
+                model_state['warmup_seconds'] = round(warm_up_models(), 3)
+                model_state['warmed_up_at'] = datetime.now().isoformat()
+                # Not ready while chesscog is installed but not loaded yet
+                model_state['ready'] = load_chesscog or not CHESSCOG_AVAILABLE
+            model_state['error'] = None
+            model_state['failures'] = 0
+            model_state['retry_in_seconds'] = None
+        except Exception as e:
+            model_state['error'] = str(e)
+            model_state['ready'] = False
+            model_state['failures'] += 1
+            backoff = min(MODEL_RETRY_SECONDS * 2 ** (model_state['failures'] - 1), MODEL_RETRY_MAX_SECONDS)
+            model_state['retry_in_seconds'] = backoff
+            model_retry_at = time.monotonic() + backoff
+            logger.error(f"Model initialization failed ({model_state['failures']} in a row), "
+                         f"retrying in {backoff}s: {str(e)}")
+
+def ensure_models_ready():
+    """
+    Finish model initialization on a recognition request if nothing else
+    did. After a failure the request goes on with the engines that did load
+    and the next attempt waits out the backoff instead of running per request.
+    """
+    if model_state['ready']:
+        return
+    with model_lock:
+        if model_state['ready'] or time.monotonic() < model_retry_at:
+            return
+        init_models()
+
+def shutdown_service(timeout=SHUTDOWN_DRAIN_SECONDS):
+    """
+    Graceful exit of a serving process, after the WSGI server has finished
+    its in-flight requests: background jobs get up to timeout seconds to
+    complete before they are cancelled, then the detection pool stops.
+    """
+    logger.info(f"Shutting down: draining {job_manager.stats()['running']} running job(s)")
+    job_manager.drain(timeout)
+    if detection_pool is not None:
+        detection_pool.shutdown(wait=True)
+
+def cache_pdf_page(pdf_hash, page_num, image, dpi=DETECTION_DPI):
+    """Cache a rendered PDF page in memory, compressed unless PAGE_CACHE_CODEC is raw"""
+    if PAGE_CACHE_CODEC != 'raw':
+        image = CompressedPage.encode(image, PAGE_CACHE_CODEC, PAGE_CACHE_BAND_ROWS)
+    pdf_cache.put((pdf_hash, dpi, page_num), image)
+
+def get_cached_pdf_page(pdf_hash, page_num, dpi=DETECTION_DPI):
+    """
+    Get a cached PDF page: an array, or a CompressedPage that decodes on
+    slicing (see decode_page for the whole raster)
+    """
+    return pdf_cache.get((pdf_hash, dpi, page_num))
+
+def is_pdf_page_available(pdf_hash, page_num, dpi=DETECTION_DPI):
+    """Whether a page can be served without rendering it again"""
+    return (pdf_hash, dpi, page_num) in pdf_cache or page_store.has_page(pdf_hash, dpi, page_num)
+
+def persist_pdf_page(pdf_hash, page_num, image, dpi=DETECTION_DPI):
+    """Write a rendered page to the on-disk page store"""
     try:
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-        
-        # Resize image if too large for faster processing
-        height, width = gray.shape
-        if width > 1500 or height > 1500:
-            scale_factor = min(1500/width, 1500/height)
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            gray = cv2.resize(gray, (new_width, new_height))
-            scale_back = 1 / scale_factor
-        else:
-            scale_back = 1
-        
-        # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        
-        # Apply adaptive thresholding to handle different lighting conditions
-        adaptive_thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                               cv2.THRESH_BINARY, 11, 2)
-        
-        # Find contours
-        contours, _ = cv2.findContours(adaptive_thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        page_store.save_page(pdf_hash, dpi, page_num, image)
+    except Exception as e:
+        # The in-memory cache still works, so a full disk must not fail the request
+        logger.warning(f"Failed to persist page {page_num} for {pdf_hash[:8]}: {str(e)}")
+
+def get_pdf_page_count(pdf_path):
+    """Read the number of pages from the PDF without rendering anything"""
+    return int(pdfinfo_from_path(pdf_path)['Pages'])
+
+def iter_pdf_pages(pdf_path, first_page, last_page, dpi=DETECTION_DPI, window=RENDER_WINDOW_PAGES):
+    """
+    Lazily render pages first_page..last_page (inclusive, 1-based) as
+    single-channel uint8 arrays. Book diagrams are monochrome, so poppler
+    renders grayscale directly: a third of the memory of RGB and no
+    conversion later. Only a small window of pages is rasterized at a time
+    and each page is handed over as soon as it is yielded, so peak memory
+    does not grow with the length of the book.
+    """
+    for window_start in range(first_page, last_page + 1, window):
+        window_end = min(window_start + window - 1, last_page)
+        start = time.perf_counter()
+        with tracing.span('rasterize_page', first_page=window_start, last_page=window_end):
+            images = convert_from_path(
+                pdf_path,
+                dpi=dpi,
+                first_page=window_start,
+                last_page=window_end,
+                grayscale=True,
+                thread_count=min(2, window_end - window_start + 1)
+            )
+        metrics.observe_stage('rasterize_page', time.perf_counter() - start, len(images))
+        metrics.count_rendered(len(images))
+        page_num = window_start
+        while images:
+            yield page_num, np.asarray(images.pop(0))
+            page_num += 1
+
+def iter_book_pages(pdf_hash, pdf_path, first_page, last_page, dpi=DETECTION_DPI):
+    """
+    Yield (page_num, image) for an absolute page range, rendering only the
+    pages that are neither in the memory cache nor in the page store.
+    Missing pages are rendered in contiguous runs, cached and persisted;
+    stored pages are yielded as memory-mapped arrays.
+    """
+    page_num = first_page
+    while page_num <= last_page:
+        with tracing.span('load_page', page=page_num):
+            image = get_cached_pdf_page(pdf_hash, page_num, dpi)
+            if image is not None:
+                image = decode_page(image)
+            else:
+                image = page_store.load_page(pdf_hash, dpi, page_num)
+        if image is not None:
+            yield page_num, image
+            page_num += 1
+            continue
         
-        chessboard_candidates = []
+        run_end = page_num
+        while run_end < last_page and not is_pdf_page_available(pdf_hash, run_end + 1, dpi):
+            run_end += 1
         
-        # Filter contours more efficiently
-        for contour in contours:
-            # Quick area filter (chess boards should be reasonably large)
-            area = cv2.contourArea(contour)
-            min_area = 5000 * (scale_back ** 2)  # Adjust for scaling
-            if area < min_area:
-                continue
-                
-            # Get bounding rectangle directly (faster than approximation)
-            x, y, w, h = cv2.boundingRect(contour)
-            
-            # Check aspect ratio (chess boards are roughly square)
-            aspect_ratio = w / h
-            if not (0.6 <= aspect_ratio <= 1.4):  # Allow some tolerance
-                continue
-                
-            # Scale coordinates back to original size
-            x = int(x * scale_back)
-            y = int(y * scale_back)
-            w = int(w * scale_back)
-            h = int(h * scale_back)
+        logger.info(f"Rendering pages {page_num}-{run_end} of {pdf_hash[:8]}...")
+        for rendered_page, image in iter_pdf_pages(pdf_path, page_num, run_end, dpi):
+            with tracing.span('store_page', page=rendered_page):
+                cache_pdf_page(pdf_hash, rendered_page, image, dpi)
+                persist_pdf_page(pdf_hash, rendered_page, image, dpi)
+            yield rendered_page, image
+        page_num = run_end + 1
+
+def to_gray_array(image):
+    """
+    Single-channel uint8 array from a page or crop. Grayscale arrays are
+    returned as they are; RGB rasters stored by older versions and PIL
+    images are converted.
+    """
+    if isinstance(image, np.ndarray):
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    return np.asarray(image.convert('L'))
+
+def get_client_id():
+    """
+    Identify the caller for rate limiting. X-Forwarded-For is only honoured
+    (by ProxyFix, into remote_addr) for TRUSTED_PROXY_COUNT proxy hops, so
+    direct clients can't pick a fresh identity per request.
+    """
+    return request.remote_addr or 'unknown'
+
+def admission_rejected_response(error):
+    """Fast 429/503 response with a Retry-After hint"""
+    response = jsonify({
+        'success': False,
+        'message': error.message,
+        'retry_after': error.retry_after
+    })
+    response.status_code = error.status_code
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def admission_required(controller):
+    """
+    Apply the per-client rate limit and hold a slot of controller for the
+    whole response. Streamed responses keep their slot until the stream closes.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                client_limiter.consume(get_client_id())
+                acquired_at = controller.acquire()
+            except AdmissionRejected as e:
+                logger.warning(f"Rejected {request.path} from {get_client_id()}: {e.message}")
+                return admission_rejected_response(e)
             
-            # Calculate confidence based on size and aspect ratio
-            confidence = calculate_chessboard_confidence_fast(area, aspect_ratio, w, h)
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                controller.release(acquired_at)
+                raise
             
-            if confidence > 0.3:  # Minimum confidence threshold
-                chessboard_candidates.append({
-                    'x': x,
-                    'y': y,
-                    'width': w,
-                    'height': h,
-                    'confidence': round(confidence, 2)
-                })
-        
-        # Sort by confidence and return top candidates
-        chessboard_candidates.sort(key=lambda x: x['confidence'], reverse=True)
-        return chessboard_candidates[:10]  # Return top 10 candidates
-        
-    except Exception as e:
-        logger.error(f"Error in detect_chessboard_contours: {str(e)}")
-        return []
-        chessboard_candidates.sort(key=lambda x: x['confidence'], reverse=True)
-        return chessboard_candidates[:5]  # Return top 5 candidates
-        
-    except Exception as e:
-        logger.error(f"Error in chessboard detection: {str(e)}")
-        return []
+            if response.is_streamed:
+                response.call_on_close(lambda: controller.release(acquired_at))
+            else:
+                controller.release(acquired_at)
+            return response
+        return wrapper
+    return decorator
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def detection_request_fields():
+    """Fields of a detection request: the multipart form, or the JSON body of a hash-only request"""
+    if request.files or request.form:
+        return request.form
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+def parse_pdf_hash(value):
+    """Lowercased PDF hash, or None unless value is an MD5 hex digest (hashes name page store paths)"""
+    if not isinstance(value, str) or not PDF_HASH_PATTERN.fullmatch(value.lower()):
+        return None
+    return value.lower()
 
-def calculate_chessboard_confidence_fast(area, aspect_ratio, width, height):
+def int_field(fields, name, default=None):
+    """Integer field of a form or JSON body; missing or malformed values give default"""
+    try:
+        return int(fields[name])
+    except (KeyError, TypeError, ValueError):
+        return default
+
+def read_detection_upload():
     """
-    Fast confidence calculation for chessboard detection
+    Validate the PDF and pagination fields of a detection request.
+    The PDF is either uploaded as the 'pdf' file or, when the service
+    already stores it, named by its content hash ('pdf_hash' form field or
+    JSON body) so it does not have to be uploaded again; an unknown hash
+    gets a 404 with upload_required.
+    Returns (upload, None) on success or (None, error_response) on failure,
+    where upload holds pdf_hash, pdf_path and the absolute page range.
+    Pass upload to release_upload() when done.
     """
+    fields = detection_request_fields()
+    if 'pdf' not in request.files and fields.get('pdf_hash'):
+        return read_known_pdf(fields)
+    
+    # Check if file is in request
+    if 'pdf' not in request.files:
+        return None, (jsonify({
+            'success': False,
+            'message': 'No PDF file provided'
+        }), 400)
+    
+    file = request.files['pdf']
+    
+    if file.filename == '':
+        return None, (jsonify({
+            'success': False,
+            'message': 'No file selected'
+        }), 400)
+    
+    if not allowed_file(file.filename):
+        return None, (jsonify({
+            'success': False,
+            'message': 'Only PDF files are allowed'
+        }), 400)
+    
+    # The upload was spooled to UPLOAD_FOLDER and hashed while the request
+    # was parsed; the rasterizer works from that file, never from memory
+    with tracing.span('spool_upload'):
+        pdf_path, pdf_hash, pdf_size = take_upload(file, UPLOAD_FOLDER)
+    logger.info(f"Processing PDF file: {file.filename}, Size: {pdf_size} bytes, Hash: {pdf_hash[:8]}...")
+    
+    # Read the page count up front so pages can be streamed one window at a time
     try:
-        confidence = 0.0
-        
-        # Area-based confidence (larger areas get higher confidence)
-        if area > 50000:
-            confidence += 0.4
-        elif area > 20000:
-            confidence += 0.3
-        elif area > 10000:
-            confidence += 0.2
-        else:
-            confidence += 0.1
-        
-        # Aspect ratio confidence (closer to square is better)
-        aspect_diff = abs(aspect_ratio - 1.0)
-        if aspect_diff < 0.1:
-            confidence += 0.3
-        elif aspect_diff < 0.2:
-            confidence += 0.2
-        elif aspect_diff < 0.3:
-            confidence += 0.1
-        
-        # Size confidence (reasonable chess board size)
-        if 150 <= width <= 600 and 150 <= height <= 600:
-            confidence += 0.3
-        elif 100 <= width <= 800 and 100 <= height <= 800:
-            confidence += 0.2
-        else:
-            confidence += 0.1
-        
-        return min(confidence, 1.0)
-        
+        with tracing.span('pdfinfo'):
+            page_count = get_pdf_page_count(pdf_path)
     except Exception as e:
-        logger.error(f"Error calculating confidence: {str(e)}")
-        return 0.0
+        os.remove(pdf_path)
+        logger.error(f"Error reading PDF page count: {str(e)}")
+        return None, (jsonify({
+            'success': False,
+            'message': 'Failed to convert PDF to images'
+        }), 500)
+    
+    # Keep the source so board regions can be re-rendered at FEN_DPI later,
+    # and so the book can be detected again by its hash alone
+    try:
+        with tracing.span('store_source'):
+            page_store.save_source(pdf_hash, pdf_path, page_count)
+    except Exception as e:
+        logger.warning(f"Failed to store source PDF for {pdf_hash[:8]}: {str(e)}")
+    
+    return detection_range({'pdf_hash': pdf_hash, 'pdf_path': pdf_path, 'owned': True}, fields, page_count)
 
+def read_known_pdf(fields):
+    """read_detection_upload for a PDF named by hash: detect from the stored source, no upload"""
+    pdf_hash = parse_pdf_hash(fields['pdf_hash'])
+    source_path = page_store.source_path(pdf_hash) if pdf_hash else None
+    if source_path is None:
+        return None, (jsonify({
+            'success': False,
+            'message': 'PDF not found in cache. Please upload it.',
+            'pdf_hash': pdf_hash or str(fields['pdf_hash']),
+            'upload_required': True
+        }), 404)
+    
+    logger.info(f"Processing known PDF by hash: {pdf_hash[:8]}...")
+    page_count = (page_store.manifest(pdf_hash) or {}).get('page_count')
+    if not page_count:
+        try:
+            with tracing.span('pdfinfo'):
+                page_count = get_pdf_page_count(source_path)
+        except Exception as e:
+            logger.error(f"Error reading PDF page count: {str(e)}")
+            return None, (jsonify({
+                'success': False,
+                'message': 'Failed to convert PDF to images'
+            }), 500)
+    
+    # The stored source is shared, never removed by release_upload
+    return detection_range({'pdf_hash': pdf_hash, 'pdf_path': source_path, 'owned': False}, fields, page_count)
 
-def calculate_chessboard_confidence(roi, contour, area):
+def detection_range(upload, fields, page_count):
+    """Complete upload with the absolute page range requested by start_page and max_pages"""
+    max_pages = int_field(fields, 'max_pages')
+    start_page = int_field(fields, 'start_page', 1)
+    
+    if max_pages is not None and max_pages < 0:
+        release_upload(upload)
+        return None, (jsonify({
+            'success': False,
+            'message': f'Invalid max_pages: {max_pages} (0 or more, 0 for all pages)'
+        }), 400)
+    
+    if start_page < 1 or start_page > page_count:
+        release_upload(upload)
+        return None, (jsonify({
+            'success': False,
+            'message': f'Invalid start page: {start_page} (PDF has {page_count} pages)'
+        }), 400)
+    
+    last_page = min(start_page + max_pages - 1, page_count) if max_pages else page_count
+    
+    return {
+        **upload,
+        'start_page': start_page,
+        'last_page': last_page,
+        'page_count': page_count
+    }, None
+
+def release_upload(upload):
+    """Remove the temporary copy of an uploaded PDF; later calls do nothing"""
+    if upload['owned']:
+        upload['owned'] = False
+        try:
+            os.remove(upload['pdf_path'])
+        except FileNotFoundError:
+            pass
+
+def detect_boards_by_page(pdf_hash, pdf_path, start_page, last_page):
     """
-    Calculate confidence score for a potential chessboard region
+    Run chess board detection over an absolute page range.
+    Yields (page_num, bounding_boxes) as soon as each page is done.
+    Pages detected before (recorded in the page store) are answered from
+    there; the rest are detected in contiguous runs, reusing cached pages
+    and rendering only missing ones. pdf_path is only read for those.
     """
-    try:
-        confidence = 0.5  # Base confidence
-        
-        # Factor 1: Edge density (chess boards have many internal edges)
-        edges = cv2.Canny(roi, 50, 150)
-        edge_density = np.sum(edges > 0) / (roi.shape[0] * roi.shape[1])
-        confidence += min(edge_density * 2, 0.3)  # Up to 0.3 bonus
-        
-        # Factor 2: Contour solidity (how well the contour fills its convex hull)
-        hull = cv2.convexHull(contour)
-        hull_area = cv2.contourArea(hull)
-        if hull_area > 0:
-            solidity = area / hull_area
-            confidence += solidity * 0.2  # Up to 0.2 bonus
-        
-        # Factor 3: Check for grid-like patterns using template matching
-        # This is a simplified approach - in practice you might use more sophisticated methods
-        if roi.shape[0] > 100 and roi.shape[1] > 100:
-            # Look for repetitive patterns that suggest a grid
-            resized = cv2.resize(roi, (64, 64))
-            variance = np.var(resized)
-            if variance > 1000:  # High variance suggests pattern complexity
-                confidence += 0.1
-        
-        return min(confidence, 1.0)
+    total_pages = last_page - start_page + 1
+    # Results of an older detector or other detection parameters are not reused
+    detector = detector_fingerprint()
+    with tracing.span('load_detections'):
+        stored = page_store.load_detections(pdf_hash, DETECTION_DPI, detector)
+    
+    # Process each page with progress logging
+    logger.info(f"Processing {total_pages} pages for chess board detection "
+                f"({DETECTION_MODE}, {DETECTION_WORKERS} workers, "
+                f"{sum(start_page <= page <= last_page for page in stored)} already detected)...")
+    
+    page_num = start_page
+    while page_num <= last_page:
+        if page_num in stored:
+            yield page_num, [dict(box) for box in stored[page_num]]
+            page_num += 1
+            continue
         
-    except Exception as e:
-        logger.error(f"Error calculating confidence: {str(e)}")
-        return 0.3
+        run_end = page_num
+        while run_end < last_page and run_end + 1 not in stored:
+            run_end += 1
+        yield from detect_page_run(pdf_hash, pdf_path, page_num, run_end, total_pages, detector)
+        page_num = run_end + 1
+
+def detect_page_run(pdf_hash, pdf_path, first_page, last_page, total_pages, detector):
+    """
+    Detect boards on pages first_page..last_page and record the results in
+    the page store under the detector fingerprint, also when the consumer
+    stops early.
+    """
+    def prepared_pages():
+        for page_num, image in iter_book_pages(pdf_hash, pdf_path, first_page, last_page):
+            # Detection only needs luminance; this also keeps worker payloads small
+            with tracing.span('grayscale', page=page_num):
+                gray = to_gray_array(image)
+            yield page_num, gray
+    
+    detected = {}
+    try:
+        for page_num, bounding_boxes in detect_pages(prepared_pages(), detection_pool,
+                                                     max_in_flight=2 * DETECTION_WORKERS,
+                                                     observe=observe_detection):
+            metrics.count_detection(len(bounding_boxes))
+            
+            # Translate to the public coordinate space and add the absolute page number
+            for box in bounding_boxes:
+                box['x'], box['y'], box['width'], box['height'] = scale_region(
+                    box['x'], box['y'], box['width'], box['height'], COORDINATE_DPI / DETECTION_DPI
+                )
+                box['page'] = page_num
+            detected[page_num] = [dict(box) for box in bounding_boxes]
+            
+            logger.info(f"Page {page_num} (of {total_pages}): Found {len(bounding_boxes)} potential chessboards")
+            
+            yield page_num, bounding_boxes
+    finally:
+        try:
+            page_store.save_detections(pdf_hash, DETECTION_DPI, detected, detector)
+        except Exception as e:
+            logger.warning(f"Failed to record detections for {pdf_hash[:8]}: {str(e)}")
+
+def observe_detection(page_num, started_at, seconds, worker):
+    """Timing of one page's detection, wherever it ran: metrics and a trace span"""
+    metrics.observe_stage('detect', seconds)
+    on_this_thread = worker == f'{os.getpid()}:{threading.current_thread().name}'
+    tracing.record_span('detect', started_at, seconds, None if on_this_thread else worker, page=page_num)
+
+def build_detection_summary(pdf_hash, all_bounding_boxes, total_pages):
+    """Final /detect-boards response body"""
+    return {
+        'success': True,
+        'boundingBoxes': all_bounding_boxes,
+        'message': f'Found {len(all_bounding_boxes)} chess boards across {total_pages} pages',
+        'pdf_hash': pdf_hash,
+        'pages_processed': total_pages,
+        'processing_time': f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    }
 
 @app.route('/detect-boards', methods=['POST'])
+@admission_required(detection_admission)
 def detect_boards():
     """
     Flask route 1: /detect-boards
@@ -263,110 +699,431 @@ def detect_boards():
     For each one, return { page, x, y, width, height }
     """
     try:
-        # Check if file is in request
-        if 'pdf' not in request.files:
-            return jsonify({
-                'success': False,
-                'message': 'No PDF file provided'
-            }), 400
-        
-        file = request.files['pdf']
+        upload, error_response = read_detection_upload()
+        if error_response:
+            return error_response
         
-        if file.filename == '':
-            return jsonify({
-                'success': False,
-                'message': 'No file selected'
-            }), 400
+        pdf_hash = upload['pdf_hash']
+        total_pages = upload['last_page'] - upload['start_page'] + 1
+        all_bounding_boxes = []
         
-        if not allowed_file(file.filename):
+        try:
+            for page_num, bounding_boxes in detect_boards_by_page(
+                pdf_hash, upload['pdf_path'], upload['start_page'], upload['last_page']
+            ):
+                all_bounding_boxes.extend(bounding_boxes)
+        except Exception as e:
+            logger.error(f"Error converting PDF to images: {str(e)}")
             return jsonify({
                 'success': False,
-                'message': 'Only PDF files are allowed'
-            }), 400
-        
-        # Read PDF file
-        pdf_data = file.read()
-        pdf_hash = generate_pdf_hash(pdf_data)
-        logger.info(f"Processing PDF file: {file.filename}, Size: {len(pdf_data)} bytes, Hash: {pdf_hash[:8]}...")
+                'message': 'Failed to convert PDF to images'
+            }), 500
+        finally:
+            release_upload(upload)
         
-        # Get optional parameters for pagination
-        max_pages = request.form.get('max_pages', type=int, default=None)
-        start_page = request.form.get('start_page', type=int, default=1)
+        logger.info(f"Completed processing: {len(all_bounding_boxes)} total chessboards detected")
         
-        # Check cache first
-        cached_images = get_cached_pdf_images(pdf_hash)
-        if cached_images:
-            logger.info("Using cached PDF images")
-            images = cached_images
-        else:
-            # Convert PDF to images with optimized settings
-            try:
-                logger.info("Converting PDF to images...")
-                images = convert_from_bytes(
-                    pdf_data, 
-                    dpi=150,  # Reduced DPI for faster processing while maintaining quality
-                    first_page=start_page,
-                    last_page=max_pages + start_page - 1 if max_pages else None,
-                    thread_count=2  # Use multiple threads for conversion
-                )
-                logger.info(f"Converted PDF to {len(images)} images")
-                # Cache the images
-                cache_pdf_images(pdf_hash, images)
-            except Exception as e:
-                logger.error(f"Error converting PDF to images: {str(e)}")
-                return jsonify({
-                    'success': False,
-                    'message': 'Failed to convert PDF to images'
-                }), 500
+        # Return results with processing info
+        with tracing.span('serialize'):
+            return jsonify(build_detection_summary(pdf_hash, all_bounding_boxes, total_pages))
         
+    except Exception as e:
+        logger.error(f"Error in detect_boards: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'Internal server error during chess board detection',
+            'error': str(e)
+        }), 500
+
+@app.route('/detect-boards/stream', methods=['POST'])
+@admission_required(detection_admission)
+def detect_boards_stream():
+    """
+    Streaming variant of /detect-boards
+    Accepts the same multipart form, but emits one record per page as soon
+    as that page is done, followed by a summary record that matches the
+    /detect-boards JSON response. Records are newline-delimited JSON by
+    default, or Server-Sent Events with ?format=sse or
+    Accept: text/event-stream.
+    """
+    try:
+        upload, error_response = read_detection_upload()
+        if error_response:
+            return error_response
+    except Exception as e:
+        logger.error(f"Error in detect_boards_stream: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'Internal server error during chess board detection',
+            'error': str(e)
+        }), 500
+    
+    use_sse = (request.args.get('format') == 'sse'
+               or 'text/event-stream' in request.headers.get('Accept', ''))
+    
+    def format_record(record_type, record):
+        with tracing.span('serialize', record=record_type):
+            if use_sse:
+                return f"event: {record_type}\ndata: {json.dumps(record)}\n\n"
+            return json.dumps({'type': record_type, **record}) + '\n'
+    
+    def generate():
+        pdf_hash = upload['pdf_hash']
+        total_pages = upload['last_page'] - upload['start_page'] + 1
         all_bounding_boxes = []
-        
-        # Process each page with progress logging
-        total_pages = len(images)
-        logger.info(f"Processing {total_pages} pages for chess board detection...")
-        
-        for page_num, image in enumerate(images, 1):
-            logger.info(f"Processing page {page_num}/{total_pages}...")
-            
-            # Convert PIL image to numpy array
-            image_array = np.array(image)
-            
-            # Detect chessboards on this page
-            bounding_boxes = detect_chessboard_contours(image_array)
-            
-            # Add page number to each bounding box
-            for box in bounding_boxes:
-                box['page'] = page_num + start_page - 1  # Adjust for start_page
-                all_bounding_boxes.append(box)
-            
-            logger.info(f"Page {page_num}: Found {len(bounding_boxes)} potential chessboards")
+        pages_done = 0
+        try:
+            for page_num, bounding_boxes in detect_boards_by_page(
+                pdf_hash, upload['pdf_path'], upload['start_page'], upload['last_page']
+            ):
+                pages_done += 1
+                all_bounding_boxes.extend(bounding_boxes)
+                yield format_record('page', {
+                    'pdf_hash': pdf_hash,
+                    'page': page_num,
+                    'boundingBoxes': bounding_boxes,
+                    'pages_done': pages_done,
+                    'total_pages': total_pages,
+                    'boards_found': len(all_bounding_boxes)
+                })
             
-            # Add a small delay to prevent overwhelming the system
-            if page_num % 5 == 0:
-                import time
-                time.sleep(0.1)
+            logger.info(f"Completed processing: {len(all_bounding_boxes)} total chessboards detected")
+            yield format_record('summary', build_detection_summary(pdf_hash, all_bounding_boxes, total_pages))
+        except Exception as e:
+            logger.error(f"Error streaming chess board detection: {str(e)}")
+            yield format_record('error', {
+                'success': False,
+                'message': 'Failed to convert PDF to images',
+                'pdf_hash': pdf_hash,
+                'pages_done': pages_done,
+                'total_pages': total_pages,
+                'error': str(e)
+            })
+    
+    try:
+        mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+        response = Response(stream_with_context(generate()), mimetype=mimetype, headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering so pages arrive as they finish
+        })
+    except Exception:
+        release_upload(upload)
+        raise
+    # The server closes the response even when the client disconnects before
+    # the stream was iterated, which a finally in generate() would miss
+    response.call_on_close(lambda: release_upload(upload))
+    return response
+
+def run_detection_job(job, upload):
+    """
+    Job runner: detect boards page by page, publishing progress as it goes.
+    The job holds a detection slot like /detect-boards, so the
+    MAX_CONCURRENT_DETECTIONS cap covers background jobs too.
+    """
+    pdf_hash = upload['pdf_hash']
+    total_pages = upload['last_page'] - upload['start_page'] + 1
+    all_bounding_boxes = []
+    
+    acquired_at = detection_admission.acquire_background(interrupt=job.check_cancelled)
+    try:
+        for page_num, bounding_boxes in detect_boards_by_page(
+            pdf_hash, upload['pdf_path'], upload['start_page'], upload['last_page']
+        ):
+            all_bounding_boxes.extend(bounding_boxes)
+            job.add_progress(bounding_boxes)
+            job.check_cancelled()
+    finally:
+        detection_admission.release(acquired_at)
+    
+    logger.info(f"Job {job.id}: {len(all_bounding_boxes)} total chessboards detected")
+    return build_detection_summary(pdf_hash, all_bounding_boxes, total_pages)
+
+@app.route('/jobs', methods=['POST'])
+def submit_detection_job():
+    """
+    Submit a PDF for background chess board detection
+    Accepts the same multipart form as /detect-boards and returns a job id
+    immediately (202); poll /jobs/<job_id> for progress.
+    """
+    try:
+        client_limiter.consume(get_client_id())
+        if not job_manager.accepting:
+            raise AdmissionRejected('Service shutting down', 503, 5.0)
+        queued_jobs = job_manager.stats()['queued']
+        if queued_jobs >= MAX_QUEUED_JOBS:
+            raise AdmissionRejected('Service busy: too many queued jobs', 503, queued_jobs * 5.0 / JOB_WORKERS)
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected job from {get_client_id()}: {e.message}")
+        return admission_rejected_response(e)
+    
+    try:
+        upload, error_response = read_detection_upload()
+        if error_response:
+            return error_response
         
-        logger.info(f"Completed processing: {len(all_bounding_boxes)} total chessboards detected")
+        try:
+            job = job_manager.submit(
+                lambda job: run_detection_job(job, upload),
+                total=upload['last_page'] - upload['start_page'] + 1,
+                metadata={'pdf_hash': upload['pdf_hash']},
+                on_finish=lambda job: release_upload(upload)
+            )
+        except Exception:
+            # on_finish only runs for jobs that were actually queued
+            release_upload(upload)
+            raise
+        logger.info(f"Queued detection job {job.id} for {upload['pdf_hash'][:8]}")
         
-        # Return results with processing info
         return jsonify({
             'success': True,
-            'boundingBoxes': all_bounding_boxes,
-            'message': f'Found {len(all_bounding_boxes)} chess boards across {total_pages} pages',
-            'pdf_hash': pdf_hash,
-            'pages_processed': total_pages,
-            'processing_time': f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        })
+            'message': 'Detection job queued',
+            'status_url': f'/jobs/{job.id}',
+            'results_url': f'/jobs/{job.id}/results',
+            **job.to_dict()
+        }), 202
         
     except Exception as e:
-        logger.error(f"Error in detect_boards: {str(e)}")
+        logger.error(f"Error in submit_detection_job: {str(e)}")
         return jsonify({
             'success': False,
-            'message': 'Internal server error during chess board detection',
+            'message': 'Internal server error while queueing detection job',
             'error': str(e)
         }), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_detection_job(job_id):
+    """Report job status and progress (pages done out of total)"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found'
+        }), 404
+    
+    info = job.to_dict()
+    info['boards_found'] = len(job.partial_results)
+    return jsonify({'success': True, **info})
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def get_detection_job_results(job_id):
+    """
+    Return results of a job: the bounding boxes found so far while it is
+    running, and the same body as /detect-boards once it has completed.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found'
+        }), 404
+    
+    info = job.to_dict(include_results=True)
+    if info['status'] == 'completed':
+        return jsonify({'job_id': job.id, 'status': info['status'], **info['result']})
+    
+    return jsonify({
+        'success': info['status'] != 'failed',
+        'job_id': job.id,
+        'status': info['status'],
+        'progress': info['progress'],
+        'partial': True,
+        'boundingBoxes': info['partial_results'],
+        'pdf_hash': info['pdf_hash'],
+        **({'error': info['error']} if 'error' in info else {})
+    })
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_detection_job(job_id):
+    """Cancel a queued or running job; partial results remain available"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'message': 'Cancellation requested',
+        **job.to_dict()
+    })
+
+class RegionError(Exception):
+    """Invalid or unavailable FEN extraction region; carries the HTTP status"""
+    
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+def parse_fen_region(data):
+    """Validate { page, x, y, width, height } and return them as integers"""
+    # Validate required fields
+    required_fields = ['page', 'x', 'y', 'width', 'height']
+    for field in required_fields:
+        if field not in data:
+            raise RegionError(f'Missing required field: {field}')
+    
+    # Validate data types and ranges
+    try:
+        page = int(data['page'])
+        x = int(data['x'])
+        y = int(data['y'])
+        width = int(data['width'])
+        height = int(data['height'])
+    except (TypeError, ValueError):
+        raise RegionError('All coordinates must be integers')
+    
+    if page < 1 or x < 0 or y < 0 or width <= 0 or height <= 0:
+        raise RegionError('Invalid coordinate values')
+    
+    if width < MIN_BOARD_PIXELS or height < MIN_BOARD_PIXELS:
+        raise RegionError(f'Region too small: boards need at least {MIN_BOARD_PIXELS} pixels a side')
+    
+    return page, x, y, width, height
+
+def clip_fen_region(x, y, width, height, page_width, page_height):
+    """Clip a box to the page (all in the same pixels); raises RegionError if little or nothing is left"""
+    right, bottom = min(x + width, page_width), min(y + height, page_height)
+    if right <= x or bottom <= y:
+        raise RegionError('Region is outside the page')
+    width, height = right - x, bottom - y
+    if width < MIN_BOARD_PIXELS or height < MIN_BOARD_PIXELS:
+        raise RegionError(f'Region too small: boards need at least {MIN_BOARD_PIXELS} pixels a side')
+    return x, y, width, height
+
+def stored_page_size(manifest, page):
+    """(width, height) of a page in COORDINATE_DPI pixels from its detection render, or None"""
+    pages = (manifest.get('pages') or {}).get(str(DETECTION_DPI)) or {}
+    shape = (pages.get(str(page)) or {}).get('shape')
+    if not shape:
+        return None
+    scale = COORDINATE_DPI / DETECTION_DPI
+    return int(round(shape[1] * scale)), int(round(shape[0] * scale))
+
+def load_pdf_page(pdf_hash, page):
+    """
+    Get a rendered page from the in-memory cache, falling back to the
+    memory-mapped page store. Returns a grayscale array (read-only when
+    memory-mapped) or a CompressedPage; both crop with [rows, cols].
+    """
+    cached_image = get_cached_pdf_page(pdf_hash, page)
+    if cached_image is not None:
+        return cached_image
+    
+    page_raster = page_store.load_page(pdf_hash, DETECTION_DPI, page)
+    if page_raster is None:
+        if page_store.manifest(pdf_hash):
+            raise RegionError(f'Invalid page number: {page}')
+        raise RegionError('PDF not found in cache. Please detect boards first.', 404)
+    return page_raster
+
+def crop_page_region(page_image, x, y, width, height):
+    """
+    Crop a region from a page returned by load_pdf_page. The crop is a view
+    of the page, not a copy; from a memory-mapped page only the region's
+    rows are read from disk, from a compressed page only their bands are
+    decoded.
+    """
+    return page_image[y:y + height, x:x + width]
+
+@metrics.stage_timer('rasterize_region')
+@tracing.traced('rasterize_region')
+def render_pdf_region(pdf_path, page, x, y, width, height, dpi):
+    """
+    Render only a region of one page with poppler's crop options.
+    Coordinates are pixels at the given DPI. Returns a grayscale uint8 array.
+    """
+    command = [
+        'pdftoppm',
+        '-gray',
+        '-r', str(dpi),
+        '-f', str(page), '-l', str(page),
+        '-x', str(x), '-y', str(y),
+        '-W', str(width), '-H', str(height),
+        pdf_path
+    ]
+    # Without an output root pdftoppm writes the single page as PGM to stdout
+    completed = subprocess.run(command, capture_output=True, timeout=REGION_RENDER_TIMEOUT, check=True)
+    if not completed.stdout:
+        raise RuntimeError(f'pdftoppm produced no output for page {page}')
+    region = cv2.imdecode(np.frombuffer(completed.stdout, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if region is None:
+        raise RuntimeError(f'pdftoppm output for page {page} could not be decoded')
+    return region
+
+def scale_region(x, y, width, height, scale):
+    """Translate a box between two render resolutions"""
+    return (int(round(x * scale)), int(round(y * scale)),
+            max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+
+def load_fen_crop(pdf_hash, page, x, y, width, height, manifest):
+    """
+    Get the board image for a box given in COORDINATE_DPI pixels.
+    When the source PDF is stored, only the box is re-rendered at FEN_DPI;
+    otherwise it is cropped from the low-resolution detection render. The
+    two are timed as the rasterize_region and crop stages.
+    manifest is the book's page_store manifest ({} if none), read once by
+    the caller for all its boxes.
+    """
+    page_size = stored_page_size(manifest, page)
+    if page_size:
+        x, y, width, height = clip_fen_region(x, y, width, height, *page_size)
+    
+    source_path = page_store.source_path(pdf_hash)
+    if source_path:
+        page_count = manifest.get('page_count')
+        if page_count and page > page_count:
+            raise RegionError(f'Invalid page number: {page}')
+        try:
+            region = scale_region(x, y, width, height, FEN_DPI / COORDINATE_DPI)
+            crop = render_pdf_region(source_path, page, *region, FEN_DPI)
+            return check_fen_crop(crop)
+        except RegionError:
+            raise
+        except Exception as e:
+            logger.warning(f"Region render failed for page {page} of {pdf_hash[:8]}, "
+                           f"cropping the detection render instead: {str(e)}")
+    
+    return crop_detection_render(pdf_hash, page, x, y, width, height)
+
+@metrics.stage_timer('crop')
+@tracing.traced('crop')
+def crop_detection_render(pdf_hash, page, x, y, width, height):
+    """Cut a box given in COORDINATE_DPI pixels from the page's detection render"""
+    page_image = load_pdf_page(pdf_hash, page)
+    region = scale_region(x, y, width, height, DETECTION_DPI / COORDINATE_DPI)
+    return check_fen_crop(crop_page_region(page_image, *region))
+
+def check_fen_crop(crop):
+    """A crop cut off by the page edge (or lying beyond it) is rejected before recognition"""
+    if crop.shape[0] == 0 or crop.shape[1] == 0:
+        raise RegionError('Region is outside the page')
+    if min(crop.shape[:2]) < MIN_BOARD_PIXELS:
+        raise RegionError(f'Region too small: boards need at least {MIN_BOARD_PIXELS} pixels a side')
+    return crop
+
+def extract_fens_from_images(image_crops, pdf_hash=None):
+    """
+    Recognize a batch of cropped boards, optionally all from one book.
+    Returns a (fen, confidence) pair per crop, in input order.
+    """
+    use_chesscog = CHESSCOG_AVAILABLE and recognizer is not None
+    if not use_chesscog and square_classifier is not None and image_crops:
+        try:
+            # All squares of all boards are classified in one pass
+            start = time.perf_counter()
+            with tracing.span('recognize', boards=len(image_crops)):
+                results = square_classifier.predict_batch(image_crops, pdf_hash)
+            metrics.observe_stage('recognize', time.perf_counter() - start, len(image_crops))
+            metrics.count_recognition('square_classifier', len(image_crops))
+            return results
+        except Exception as e:
+            logger.warning(f"Error in batch square classification: {e}")
+    return [extract_fen_from_image(image_crop, pdf_hash) for image_crop in image_crops]
+
 @app.route('/extract_fen', methods=['POST'])
+@admission_required(recognition_admission)
 def extract_fen():
     """
     Flask route 2: /extract_fen
@@ -377,6 +1134,8 @@ def extract_fen():
     Return the FEN as JSON
     """
     try:
+        ensure_models_ready()
+        
         # Get JSON data
         data = request.get_json()
         
@@ -386,131 +1145,248 @@ def extract_fen():
                 'message': 'No JSON data provided'
             }), 400
         
-        # Validate required fields
-        required_fields = ['page', 'x', 'y', 'width', 'height']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({
-                    'success': False,
-                    'message': f'Missing required field: {field}'
-                }), 400
-        
-        page = data['page']
-        x = data['x']
-        y = data['y']
-        width = data['width']
-        height = data['height']
         pdf_hash = data.get('pdf_hash')
         
-        # Validate data types and ranges
         try:
-            page = int(page)
-            x = int(x)
-            y = int(y)
-            width = int(width)
-            height = int(height)
-        except ValueError:
+            page, x, y, width, height = parse_fen_region(data)
+            
+            if not pdf_hash:
+                raise RegionError('PDF hash is required')
+            pdf_hash = parse_pdf_hash(pdf_hash)
+            if pdf_hash is None:
+                raise RegionError('Invalid PDF hash')
+            
+            logger.info(f"Extracting FEN from page {page}, coordinates ({x}, {y}, {width}, {height})")
+            
+            # Same box of the same book recognized before: no render needed
+            region_key = (pdf_hash, page, x, y, width, height)
+            with tracing.span('region_cache'):
+                cached = fen_cache.get_region(region_key)
+            if cached is None:
+                # Render the region at high resolution, or crop it from the cached page
+                manifest = page_store.manifest(pdf_hash) or {}
+                cropped_image = load_fen_crop(pdf_hash, page, x, y, width, height, manifest)
+        except RegionError as e:
             return jsonify({
                 'success': False,
-                'message': 'All coordinates must be integers'
-            }), 400
+                'message': e.message
+            }), e.status_code
         
-        if page < 1 or x < 0 or y < 0 or width <= 0 or height <= 0:
+        if cached is None:
+            fen, confidence = extract_fen_from_image(cropped_image, pdf_hash)
+            fen_cache.put(region_key, fen, confidence)
+        else:
+            fen, confidence = cached
+        
+        return jsonify({
+            'success': True,
+            'fen': fen,
+            'confidence': confidence,
+            'cached': cached is not None,
+            'message': 'FEN extracted successfully'
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in extract_fen: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'Internal server error during FEN extraction',
+            'error': str(e)
+        }), 500
+
+@app.route('/extract_fen/batch', methods=['POST'])
+@admission_required(recognition_admission)
+def extract_fen_batch():
+    """
+    Batch variant of /extract_fen
+    Accept JSON: { pdf_hash, boxes: [{ page, x, y, width, height }, ...] }
+    Crops are prepared and recognized FEN_BATCH_SIZE at a time, and each box
+    gets its own result so one bad box doesn't fail the batch.
+    """
+    try:
+        ensure_models_ready()
+        
+        data = request.get_json(silent=True)
+        
+        if not data:
             return jsonify({
                 'success': False,
-                'message': 'Invalid coordinate values'
+                'message': 'No JSON data provided'
             }), 400
         
+        pdf_hash = data.get('pdf_hash')
+        boxes = data.get('boxes')
+        
         if not pdf_hash:
             return jsonify({
                 'success': False,
                 'message': 'PDF hash is required'
             }), 400
         
-        # Get cached images
-        cached_images = get_cached_pdf_images(pdf_hash)
-        if not cached_images:
+        pdf_hash = parse_pdf_hash(pdf_hash)
+        if pdf_hash is None:
             return jsonify({
                 'success': False,
-                'message': 'PDF not found in cache. Please detect boards first.'
-            }), 404
+                'message': 'Invalid PDF hash'
+            }), 400
         
-        if page > len(cached_images):
+        if not isinstance(boxes, list) or not boxes:
             return jsonify({
                 'success': False,
-                'message': f'Invalid page number: {page}'
+                'message': 'boxes must be a non-empty list'
             }), 400
         
-        logger.info(f"Extracting FEN from page {page}, coordinates ({x}, {y}, {width}, {height})")
+        if len(boxes) > MAX_BATCH_BOXES:
+            return jsonify({
+                'success': False,
+                'message': f'Too many boxes: {len(boxes)} (maximum {MAX_BATCH_BOXES})'
+            }), 400
         
-        # Get the specific page image
-        image = cached_images[page - 1]
+        logger.info(f"Extracting FEN for {len(boxes)} boxes from {pdf_hash[:8]}...")
         
-        # Crop the region
-        cropped_image = image.crop((x, y, x + width, y + height))
+        results = [None] * len(boxes)
+        manifest = None  # read on the first box that needs a crop, then shared
+        valid = []  # (index, page, x, y, width, height)
+        for index, box in enumerate(boxes):
+            try:
+                if not isinstance(box, dict):
+                    raise RegionError('Box must be an object')
+                valid.append((index,) + parse_fen_region(box))
+            except RegionError as e:
+                results[index] = {'index': index, 'success': False, 'message': e.message}
         
-        # Extract FEN from the cropped region (mock implementation)
-        fen, confidence = extract_fen_from_image(cropped_image)
+        for batch_start in range(0, len(valid), FEN_BATCH_SIZE):
+            batch_keys = []  # (index, region_key)
+            batch_crops = []
+            for index, page, x, y, width, height in valid[batch_start:batch_start + FEN_BATCH_SIZE]:
+                region_key = (pdf_hash, page, x, y, width, height)
+                with tracing.span('region_cache', page=page):
+                    cached = fen_cache.get_region(region_key)
+                if cached is not None:
+                    fen, confidence = cached
+                    results[index] = {
+                        'index': index,
+                        'success': True,
+                        'fen': fen,
+                        'confidence': confidence,
+                        'cached': True
+                    }
+                    continue
+                
+                try:
+                    if manifest is None:
+                        manifest = page_store.manifest(pdf_hash) or {}
+                    batch_crops.append(load_fen_crop(pdf_hash, page, x, y, width, height, manifest))
+                    batch_keys.append((index, region_key))
+                except RegionError as e:
+                    results[index] = {'index': index, 'success': False, 'message': e.message}
+                except Exception as e:
+                    logger.error(f"Error preparing box {index} on page {page}: {str(e)}")
+                    results[index] = {'index': index, 'success': False,
+                                      'message': 'Failed to load board region'}
+            
+            recognized = extract_fens_from_images(batch_crops, pdf_hash)
+            for (index, region_key), (fen, confidence) in zip(batch_keys, recognized):
+                fen_cache.put(region_key, fen, confidence)
+                results[index] = {
+                    'index': index,
+                    'success': True,
+                    'fen': fen,
+                    'confidence': confidence,
+                    'cached': False
+                }
         
-        return jsonify({
-            'success': True,
-            'fen': fen,
-            'confidence': confidence,
-            'message': 'FEN extracted successfully'
-        })
+        # Echo the box coordinates back so clients can match results without indices
+        for index, result in enumerate(results):
+            if isinstance(boxes[index], dict):
+                for field in ('page', 'x', 'y', 'width', 'height'):
+                    if field in boxes[index]:
+                        result[field] = boxes[index][field]
+        
+        succeeded = sum(1 for result in results if result['success'])
+        with tracing.span('serialize'):
+            return jsonify({
+                'success': True,
+                'results': results,
+                'succeeded': succeeded,
+                'failed': len(results) - succeeded,
+                'pdf_hash': pdf_hash,
+                'message': f'Extracted {succeeded} of {len(results)} FENs'
+            })
         
     except Exception as e:
-        logger.error(f"Error in extract_fen: {str(e)}")
+        logger.error(f"Error in extract_fen_batch: {str(e)}")
         return jsonify({
             'success': False,
-            'message': 'Internal server error during FEN extraction',
+            'message': 'Internal server error during batch FEN extraction',
             'error': str(e)
         }), 500
 
-def extract_fen_from_image(image_crop):
+@metrics.stage_timer('recognize')
+@tracing.traced('recognize')
+def extract_fen_from_image(image_crop, pdf_hash=None, engine=None):
     """
-    Extract FEN from a cropped chess board image
-    Uses chesscog if available, otherwise falls back to mock implementation
+    Extract FEN from a cropped chess board image (grayscale array, RGB
+    array or PIL image). Uses chesscog if available, then the square
+    classifier, otherwise falls back to mock implementation. pdf_hash
+    scopes the glyph cache.
+    engine (one of available_engines()) forces a single backend without
+    fallbacks, for benchmarks comparing them.
     """
+    if engine is not None and engine not in available_engines():
+        raise ValueError(f'Recognition engine not available: {engine}')
     try:
+        # One array for every engine; no copy when the crop already is one
+        image_array = np.asarray(image_crop)
+
         # Try to use real chesscog first
-        if CHESSCOG_AVAILABLE and recognizer is not None:
+        if engine in (None, 'chesscog') and CHESSCOG_AVAILABLE and recognizer is not None:
             try:
-                # Convert PIL image to numpy array format expected by chesscog
-                image_array = np.array(image_crop)
+                # chesscog expects an RGB array
+                rgb = cv2.cvtColor(image_array, cv2.COLOR_GRAY2RGB) if image_array.ndim == 2 else image_array
                 
                 # Use chesscog to recognize the chess position
-                fen = recognizer.predict(image_array)
+                fen = recognizer.predict(rgb)
                 logger.info(f"Chesscog FEN prediction: {fen}")
+                metrics.count_recognition('chesscog')
                 return fen, 0.95  # Return FEN and high confidence for real chesscog
             except Exception as e:
                 logger.warning(f"Error using chesscog: {e}")
                 logger.info("Falling back to mock implementation")
                 # Fall through to mock implementation
         
+        # Template-matching square classifier
+        if engine in (None, 'square_classifier') and square_classifier is not None:
+            try:
+                fen, confidence = square_classifier.predict(image_array, pdf_hash)
+                logger.info(f"Square classifier FEN prediction: {fen}")
+                metrics.count_recognition('square_classifier')
+                return fen, confidence
+            except Exception as e:
+                logger.warning(f"Error using square classifier: {e}")
+                logger.info("Falling back to mock implementation")
+
         # Try to use mock chesscog
-        if MOCK_CHESSCOG_AVAILABLE and mock_detector is not None:
+        if engine in (None, 'mock') and MOCK_CHESSCOG_AVAILABLE and mock_detector is not None:
             try:
-                # Convert PIL image to numpy array
-                image_array = np.array(image_crop)
                 # Convert RGB to BGR for OpenCV processing
-                if len(image_array.shape) == 3:
-                    image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+                bgr = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR) if image_array.ndim == 3 else image_array
                 
-                fen = mock_detector.detect_chessboard(image_array)
+                fen = mock_detector.detect_chessboard(bgr)
                 logger.info(f"Mock chesscog FEN prediction: {fen}")
+                metrics.count_recognition('mock')
                 return fen, 0.85  # Return FEN and good confidence for mock
             except Exception as e:
                 logger.warning(f"Error using mock chesscog: {e}")
                 logger.info("Falling back to basic mock implementation")
                 # Fall through to basic mock implementation
-        
+
+        if engine not in (None, 'basic'):
+            raise RuntimeError(f'{engine} failed to recognize the board')
+
         # Basic mock implementation (existing code)
         logger.info("Using basic mock FEN implementation")
         
-        # Convert PIL image to numpy array for analysis
-        image_array = np.array(image_crop)
-        
         # Calculate some basic image statistics for mock FEN selection
         gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY) if len(image_array.shape) == 3 else image_array
         mean_intensity = np.mean(gray)
@@ -532,27 +1408,116 @@ def extract_fen_from_image(image_crop):
         height, width = image_array.shape[:2]
         confidence = min(0.95, 0.5 + (width * height) / 100000)
         
+        metrics.count_recognition('basic')
         return selected_fen, confidence
         
     except Exception as e:
         logger.error(f"Error in FEN extraction: {str(e)}")
+        metrics.count_recognition('error')
         return 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', 0.5
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness; readiness is reported under 'models')"""
     return jsonify({
         'status': 'healthy',
+        'ready': model_state['ready'],
+        'models': dict(model_state),
         'service': 'Chess Vision Service',
         'version': '1.0.0',
         'timestamp': datetime.now().isoformat(),
         'cache_size': len(pdf_cache),
+        'cache': {**pdf_cache.stats(), 'codec': PAGE_CACHE_CODEC},
+        'page_store': page_store.stats(),
+        'jobs': job_manager.stats(),
+        'admission': {
+            'detection': detection_admission.stats(),
+            'recognition': recognition_admission.stats(),
+            'client_rate_limit': client_limiter.stats()
+        },
+        'fen_cache': fen_cache.stats(),
+        'glyph_cache': glyph_cache.stats(),
         'chesscog_available': CHESSCOG_AVAILABLE,
         'chesscog_initialized': recognizer is not None,
+        'square_classifier_initialized': square_classifier is not None,
         'mock_chesscog_available': MOCK_CHESSCOG_AVAILABLE,
         'mock_chesscog_initialized': mock_detector is not None
     })
 
+@app.before_request
+def begin_request_trace():
+    tracing.start_trace(f'{request.method} {request.path}')
+
+@app.teardown_request
+def discard_upload_spools(exc):
+    """Remove spooled uploads that no handler took over, e.g. of rejected requests"""
+    request.discard_spools()
+
+@app.after_request
+def add_server_timing(response):
+    """
+    Server-Timing header with the time per span name. A streamed response
+    only reports what ran before its first byte; the full trace, including
+    every page, can be dumped with ?trace=1 when TRACE_DUMP_DIR is set.
+    """
+    trace = tracing.current_trace()
+    if trace is None:
+        return response
+    response.headers['Server-Timing'] = trace.server_timing()
+    
+    trace_path = None
+    if TRACE_DUMP_DIR and (request.args.get('trace') == '1' or request.headers.get('X-Trace') == '1'):
+        trace_path = os.path.join(TRACE_DUMP_DIR, trace.file_name())
+        response.headers['X-Trace-File'] = os.path.basename(trace_path)
+    
+    def finish_trace():
+        if trace_path:
+            try:
+                trace.dump(trace_path)
+                logger.info(f"Trace of {trace.name} written to {trace_path}")
+            except Exception as e:
+                logger.warning(f"Could not write trace {trace_path}: {str(e)}")
+        tracing.end_trace()
+    
+    if response.is_streamed:
+        # Pages are still to come: finish once the body has been sent
+        response.call_on_close(finish_trace)
+    else:
+        finish_trace()
+    return response
+
+def cache_stats_for_metrics():
+    """stats() of every in-memory cache, by the name used in metric labels"""
+    return {
+        'pdf_pages': pdf_cache.stats(),
+        'fen_region': fen_cache.by_region.stats(),
+        'glyph': glyph_cache.stats()
+    }
+
+@app.after_request
+def refresh_cache_metrics(response):
+    """Keep this worker's cache gauges current for scrapes served by other workers"""
+    try:
+        metrics.update_cache_metrics(cache_stats_for_metrics())
+    except Exception as e:
+        logger.warning(f"Could not update cache metrics: {str(e)}")
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of stage latencies, engines, throughput and caches"""
+    metrics.update_cache_metrics(cache_stats_for_metrics(), force=True)
+    metrics.update_page_store_metrics(page_store.stats())
+    return Response(metrics.render(), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 once models are loaded and warmed up, else 503"""
+    return jsonify({
+        'ready': model_state['ready'],
+        'models': dict(model_state)
+    }), 200 if model_state['ready'] else 503
+
 @app.route('/test-chesscog', methods=['GET'])
 def test_chesscog():
     """Test chesscog functionality"""
@@ -566,7 +1531,6 @@ def test_chesscog():
                     test_image[i:i+50, j:j+50] = [255, 255, 255]
         
         # Convert to PIL Image
-        from PIL import Image
         test_pil_image = Image.fromarray(test_image)
         
         # Try to extract FEN
@@ -579,6 +1543,7 @@ def test_chesscog():
             'confidence': confidence,
             'chesscog_available': CHESSCOG_AVAILABLE,
             'chesscog_initialized': recognizer is not None,
+            'square_classifier_initialized': square_classifier is not None,
             'mock_chesscog_available': MOCK_CHESSCOG_AVAILABLE,
             'mock_chesscog_initialized': mock_detector is not None
         })
@@ -591,21 +1556,35 @@ def test_chesscog():
             'error': str(e)
         }), 500
 
+# Fork-safe engines load now so a preloading WSGI master shares them;
+# workers finish with init_models() (chesscog and warm-up)
+if MODEL_PRELOAD:
+    init_models(load_chesscog=False, warm_up=False)
+
 if __name__ == '__main__':
     logger.info("Starting Chess Vision Service...")
     logger.info("Available endpoints:")
     logger.info("  POST /detect-boards - Detect chess boards in PDF")
+    logger.info("  POST /detect-boards/stream - Stream per-page detection results")
+    logger.info("  POST /jobs - Queue background detection, GET/DELETE /jobs/<id> for progress/cancel")
     logger.info("  POST /extract_fen - Extract FEN from coordinates")
+    logger.info("  POST /extract_fen/batch - Extract FENs for many boxes of one PDF")
     logger.info("  GET  /health - Health check")
+    logger.info("  GET  /ready - Readiness (models loaded and warmed up)")
+    logger.info("  GET  /metrics - Prometheus metrics")
     logger.info("  GET  /test-chesscog - Test chesscog functionality")
     
-    # Initialize chesscog if available
-    init_chesscog()
+    # Load models (chesscog if available) and warm them up before serving
+    init_models()
     
     logger.info(f"Chesscog available: {CHESSCOG_AVAILABLE}")
     logger.info(f"Chesscog initialized: {recognizer is not None}")
+    logger.info(f"Square classifier initialized: {square_classifier is not None}")
+    logger.info(f"Active engine: {model_state['engine']}, warm-up {model_state['warmup_seconds']}s")
     logger.info(f"Mock chesscog available: {MOCK_CHESSCOG_AVAILABLE}")
     logger.info(f"Mock chesscog initialized: {mock_detector is not None}")
-    logger.info("\nService running on http://localhost:5000")
+    port = int(os.environ.get('PORT', 5000))
+    logger.info(f"\nDevelopment server running on http://localhost:{port}")
+    logger.info("For production use: gunicorn -c gunicorn.conf.py wsgi:application")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Per-page cost of finding board candidates in detect_chessboard_contours:
+tracing every contour (traced_board_candidates) vs connected component stats
+(component_board_candidates) vs find_board_candidates, which picks one of
+the two from the page's estimated blob count. Measured on two page types,
+both starting from the same thresholded page:
+- book: synthetic_books pages, diagrams set with chess glyphs as in a
+  digital book (clean unless --noise adds speckle)
+- scan: synthetic_pages pages with blob pieces, speckled like a poor scan
+
+    python benchmarks/bench_contour_filtering.py --pages 20 --noise 0 0.002 0.005 0.02 0.05 0.1
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from board_detection import (  # noqa: E402
+    CONTOUR_TRACE_MAX_BLOBS, component_board_candidates, count_blob_starts, find_board_candidates,
+    traced_board_candidates
+)
+from synthetic_books import render_page  # noqa: E402
+from synthetic_pages import make_page  # noqa: E402
+
+PAGE_TYPES = {
+    'book': lambda index, noise: render_page(index + 1, 4, 150, noise, seed=index)[0],
+    'scan': lambda index, noise: make_page(noise=noise, seed=index)[0]
+}
+
+
+def threshold_page(page):
+    """Same preprocessing as detect_chessboard_contours; returns (binary, min_area)"""
+    height, width = page.shape
+    scale_factor = min(1500 / width, 1500 / height, 1.0)
+    gray = cv2.resize(page, (int(width * scale_factor), int(height * scale_factor))) if scale_factor < 1 else page
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    binary = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2)
+    return binary, 5000 / scale_factor ** 2
+
+
+def time_candidates(find_fn, pages, repeats=3):
+    """Best of repeats, per page; returns (seconds, results)"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = [find_fn(binary, min_area) for binary, min_area in pages]
+        best = min(best, (time.perf_counter() - start) / len(pages))
+    return best, results
+
+
+def same_boxes(a, b):
+    return np.array_equal(np.unique(a, axis=0), np.unique(b, axis=0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0, 0.02, 0.05, 0.1])
+    parser.add_argument('--types', nargs='+', choices=sorted(PAGE_TYPES), default=sorted(PAGE_TYPES))
+    args = parser.parse_args()
+
+    print(f"{args.pages} synthetic pages per type and noise level, times are per page; "
+          f"'traced' counts pages at or under CONTOUR_TRACE_MAX_BLOBS ({CONTOUR_TRACE_MAX_BLOBS})")
+    print(f"{'type':>5}{'noise':>7}{'contours':>10}{'traced ms':>11}{'compon. ms':>12}{'chosen ms':>11}"
+          f"{'traced':>8}{'same':>6}")
+
+    for page_type in args.types:
+        for noise in args.noise:
+            pages = [threshold_page(PAGE_TYPES[page_type](i, noise)) for i in range(args.pages)]
+            contour_count = np.mean([
+                len(cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]) for binary, _ in pages
+            ])
+            traced_pages = sum(count_blob_starts(binary) <= CONTOUR_TRACE_MAX_BLOBS for binary, _ in pages)
+
+            traced_time, traced_rects = time_candidates(traced_board_candidates, pages)
+            component_time, component_rects = time_candidates(component_board_candidates, pages)
+            chosen_time, chosen_rects = time_candidates(find_board_candidates, pages)
+            same = all(same_boxes(a, b) and same_boxes(a, c)
+                       for a, b, c in zip(traced_rects, component_rects, chosen_rects))
+
+            print(f"{page_type:>5}{noise:>7.3f}{contour_count:>10.0f}{traced_time * 1000:>11.2f}"
+                  f"{component_time * 1000:>12.2f}{chosen_time * 1000:>11.2f}"
+                  f"{traced_pages:>5}/{args.pages:<2}{'yes' if same else 'no':>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Memory saved vs decode latency of the compressed page cache (page_codec).
+Synthetic book pages are rendered grayscale at the detection DPI and
+stored with every codec. The benchmark reports the bytes per page, the
+encode time (paid once when a page is cached), the full decode time (paid
+by re-detection) and the time to crop one diagram, which only decodes
+the bands the box overlaps (paid by every /extract_fen served from memory).
+
+    python benchmarks/bench_page_codec.py --pages 10 --dpi 100 --noise 0 0.01
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from page_codec import DEFAULT_BAND_ROWS, CompressedPage, available_codecs  # noqa: E402
+from synthetic_books import COORDINATE_DPI, render_page  # noqa: E402
+
+
+def best_of(function, repeats):
+    """Fastest of repeats calls, in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return 1000 * min(timings)
+
+
+def measure(pages, codec, band_rows, repeats):
+    """Mean bytes and timings per page for one codec ('raw' keeps the arrays)"""
+    sizes, encode, decode, crop = [], [], [], []
+    for page, boxes in pages:
+        if codec == 'raw':
+            stored = page
+            encode.append(0.0)
+            decode.append(0.0)
+        else:
+            encode.append(best_of(lambda: CompressedPage.encode(page, codec, band_rows), repeats))
+            stored = CompressedPage.encode(page, codec, band_rows)
+            decode.append(best_of(stored.decode, repeats))
+        sizes.append(stored.nbytes)
+        # The copy is what recognition ends up reading from the crop
+        crop.append(np.mean([
+            best_of(lambda: np.ascontiguousarray(stored[y:y + height, x:x + width]), repeats)
+            for x, y, width, height in boxes
+        ]))
+    return np.mean(sizes), np.mean(encode), np.mean(decode), np.mean(crop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--diagrams-per-page', type=int, default=2)
+    parser.add_argument('--dpi', type=int, default=100, help='Render resolution (DETECTION_DPI)')
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0, 0.01])
+    parser.add_argument('--band-rows', type=int, default=DEFAULT_BAND_ROWS)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = ['raw'] + available_codecs()
+    print(f"{args.pages} pages at {args.dpi} DPI, {args.diagrams_per_page} diagrams each, "
+          f"bands of {args.band_rows} rows")
+    for noise in args.noise:
+        pages = []
+        scale = args.dpi / COORDINATE_DPI
+        for page_num in range(1, args.pages + 1):
+            page, truth = render_page(page_num, args.diagrams_per_page, args.dpi, noise)
+            boxes = [tuple(int(round(box[key] * scale)) for key in ('x', 'y', 'width', 'height')) for box in truth]
+            pages.append((page, boxes))
+
+        print(f"\nnoise {noise}")
+        print(f"  {'codec':6s} {'KB/page':>9s} {'ratio':>6s} {'encode ms':>10s} {'decode ms':>10s} {'crop ms':>8s}")
+        raw_bytes = None
+        for codec in codecs:
+            size, encode, decode, crop = measure(pages, codec, args.band_rows, args.repeats)
+            raw_bytes = raw_bytes or size
+            print(f"  {codec:6s} {size / 1024:9.1f} {raw_bytes / size:5.1f}x {encode:10.2f} {decode:10.2f} {crop:8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Throughput of per-page board detection: serial vs thread pool vs process pool.
+
+    python benchmarks/bench_parallel_detection.py --pages 40 --workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from board_detection import create_detection_pool, detect_pages  # noqa: E402
+from synthetic_pages import make_book  # noqa: E402
+
+
+def run(mode, workers, book):
+    pool = create_detection_pool(mode, workers)
+    try:
+        if pool is not None:
+            # Start workers before timing so process spawn cost is not counted
+            list(detect_pages(enumerate(book[:workers]), pool, max_in_flight=2 * workers))
+        start = time.perf_counter()
+        boards = sum(len(boxes) for _, boxes in detect_pages(enumerate(book), pool, max_in_flight=2 * workers))
+        elapsed = time.perf_counter() - start
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return elapsed, boards
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--noise', type=float, default=0.0)
+    args = parser.parse_args()
+
+    book = make_book(args.pages, noise=args.noise)
+    print(f"{args.pages} synthetic pages, {args.workers} workers, {os.cpu_count()} CPUs")
+    print(f"{'mode':<10}{'seconds':>10}{'pages/s':>10}{'speedup':>10}{'boards':>8}")
+
+    baseline = None
+    for mode in ('serial', 'thread', 'process'):
+        elapsed, boards = run(mode, 1 if mode == 'serial' else args.workers, book)
+        baseline = baseline or elapsed
+        print(f"{mode:<10}{elapsed:>10.2f}{args.pages / elapsed:>10.1f}{baseline / elapsed:>9.2f}x{boards:>8}")
+
+
+if __name__ == '__main__':
+    main()
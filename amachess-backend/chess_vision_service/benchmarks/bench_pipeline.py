@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark on a synthetic chess book, in-process:
+rasterize (pdf2image) -> detect_chessboard_contours -> crop (region render
+at FEN_DPI) -> extract_fen_from_image. Reports pages/s, diagrams/s, peak
+RSS and time per stage, and saves everything as JSON so runs can be
+compared between commits.
+
+    python benchmarks/bench_pipeline.py --pages 20 --diagrams-per-page 2 --dpi 150 --noise 0.01
+    python benchmarks/bench_pipeline.py --compare results/before.json results/after.json
+
+Without poppler the generated page rasters stand in for rasterization and
+crops are cut from them; the report marks the rasterize stage as skipped.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, SERVICE_DIR)
+
+from board_detection import detect_chessboard_contours  # noqa: E402
+from synthetic_books import COORDINATE_DPI, render_page, write_book_pdf  # noqa: E402
+
+STAGES = ('rasterize', 'detect', 'crop', 'recognize')
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def generate_book(path, args):
+    """Write the book in a separate process so its page buffers don't count toward peak RSS"""
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(write_book_pdf, path, args.pages, args.diagrams_per_page,
+                           args.dpi, args.noise, args.seed).result()
+
+
+def run_pipeline(service, pdf_path, args):
+    """Run every page through the service's pipeline; returns stage times and counts"""
+    use_poppler = shutil.which('pdftoppm') is not None
+    detection_dpi, fen_dpi = service.DETECTION_DPI, service.FEN_DPI
+    seconds = defaultdict(float)
+    counts = defaultdict(int)
+    fens = []
+    untimed = 0.0
+
+    if use_poppler:
+        pages = service.iter_pdf_pages(pdf_path, 1, args.pages, dpi=detection_dpi)
+    else:
+        pages = ((page_num, None) for page_num in range(1, args.pages + 1))
+
+    start = time.perf_counter()
+    while True:
+        stage_start = time.perf_counter()
+        try:
+            page_num, image = next(pages)
+        except StopIteration:
+            break
+        if use_poppler:
+            seconds['rasterize'] += time.perf_counter() - stage_start
+            counts['rasterize'] += 1
+            source = None
+        else:
+            # Stand-in for rasterization, not timed: the generated page at its own DPI
+            source, _ = render_page(page_num, args.diagrams_per_page, args.dpi, args.noise, args.seed)
+            size = (round(source.shape[1] * detection_dpi / args.dpi), round(source.shape[0] * detection_dpi / args.dpi))
+            image = cv2.resize(source, size, interpolation=cv2.INTER_AREA)
+            untimed += time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        boxes = detect_chessboard_contours(service.to_gray_array(image))
+        seconds['detect'] += time.perf_counter() - stage_start
+        counts['detect'] += 1
+
+        for box in boxes:
+            stage_start = time.perf_counter()
+            if use_poppler:
+                region = service.scale_region(box['x'], box['y'], box['width'], box['height'],
+                                              fen_dpi / detection_dpi)
+                crop = service.render_pdf_region(pdf_path, page_num, *region, fen_dpi)
+            else:
+                x, y, width, height = service.scale_region(box['x'], box['y'], box['width'], box['height'],
+                                                           args.dpi / detection_dpi)
+                crop = service.crop_page_region(source, x, y, width, height)
+            seconds['crop'] += time.perf_counter() - stage_start
+            counts['crop'] += 1
+
+            stage_start = time.perf_counter()
+            fen, _ = service.extract_fen_from_image(crop)
+            seconds['recognize'] += time.perf_counter() - stage_start
+            counts['recognize'] += 1
+
+            page_box = service.scale_region(box['x'], box['y'], box['width'], box['height'],
+                                            COORDINATE_DPI / detection_dpi)
+            fens.append({'page': page_num, 'box': page_box, 'fen': fen.split(' ')[0]})
+
+    wall = time.perf_counter() - start - untimed
+    return wall, seconds, counts, fens, use_poppler
+
+
+def build_report(args, service, wall, seconds, counts, fens, truth, use_poppler):
+    pages, diagrams = args.pages, counts['recognize']
+    return {
+        'benchmark': 'pipeline',
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'engine': service.active_engine(),
+            'rasterizer': 'pdftoppm' if use_poppler else 'skipped (poppler not found)'
+        },
+        'config': {
+            'pages': pages,
+            'diagrams_per_page': args.diagrams_per_page,
+            'dpi': args.dpi,
+            'noise': args.noise,
+            'seed': args.seed,
+            'detection_dpi': service.DETECTION_DPI,
+            'fen_dpi': service.FEN_DPI
+        },
+        'wall_seconds': round(wall, 3),
+        'pages_per_second': round(pages / wall, 2),
+        'diagrams_per_second': round(diagrams / wall, 2),
+        'diagrams_expected': len(truth),
+        'diagrams_detected': diagrams,
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': {
+            stage: {
+                'seconds': round(seconds[stage], 4),
+                'count': counts[stage],
+                'ms_per_item': round(1000 * seconds[stage] / counts[stage], 2) if counts[stage] else None,
+                'share': round(seconds[stage] / sum(seconds.values()), 3) if seconds[stage] else 0.0
+            }
+            for stage in STAGES
+        },
+        'fens': fens
+    }
+
+
+def print_report(report):
+    print(f"{report['config']['pages']} pages, {report['diagrams_detected']}/{report['diagrams_expected']} "
+          f"diagrams detected, engine {report['environment']['engine']}, "
+          f"rasterizer {report['environment']['rasterizer']}")
+    print(f"  {report['pages_per_second']:.2f} pages/s, {report['diagrams_per_second']:.2f} diagrams/s, "
+          f"peak RSS {report['peak_rss_mb']} MB")
+    print(f"  {'stage':10s} {'seconds':>9s} {'items':>6s} {'ms/item':>9s} {'share':>6s}")
+    for stage, info in report['stages'].items():
+        per_item = f"{info['ms_per_item']:9.2f}" if info['ms_per_item'] is not None else f"{'-':>9s}"
+        print(f"  {stage:10s} {info['seconds']:9.3f} {info['count']:6d} {per_item} {100 * info['share']:5.1f}%")
+
+
+def compare(before_path, after_path):
+    """Print the change of the headline numbers between two saved runs"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    rows = [('pages/s', 'pages_per_second'), ('diagrams/s', 'diagrams_per_second'), ('peak RSS MB', 'peak_rss_mb')]
+    for label, key in rows:
+        print(f"  {label:14s} {before[key]:10.2f} {after[key]:10.2f} {_change(before[key], after[key])}")
+    for stage in STAGES:
+        old, new = before['stages'][stage]['ms_per_item'], after['stages'][stage]['ms_per_item']
+        if old is not None and new is not None:
+            print(f"  {stage + ' ms':14s} {old:10.2f} {new:10.2f} {_change(old, new)}")
+
+
+def _change(old, new):
+    return f"{100 * (new - old) / old:+.1f}%" if old else ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--diagrams-per-page', type=int, default=2)
+    parser.add_argument('--dpi', type=int, default=150, help='Resolution the book is generated at')
+    parser.add_argument('--noise', type=float, default=0.0, help='Share of pixels replaced by speckle')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON report path (default: benchmarks/results/pipeline-<commit>-<time>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Compare two saved reports')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    cwd = os.getcwd()
+    try:
+        pdf_path = os.path.join(workdir, 'book.pdf')
+        truth = generate_book(pdf_path, args)
+
+        # The service creates its upload/cache folders relative to the working directory
+        os.chdir(workdir)
+        import app as service
+        service.init_models()
+        # Per-page and per-FEN logging would otherwise drown the report
+        service.logger.setLevel('WARNING')
+
+        wall, seconds, counts, fens, use_poppler = run_pipeline(service, pdf_path, args)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = build_report(args, service, wall, seconds, counts, fens, truth, use_poppler)
+    print_report(report)
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', f"pipeline-{report['commit'] or 'local'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Saved {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Recognition accuracy and latency per engine, on diagrams with known FENs.
+A corpus of positions (a few classics plus seeded random games) is drawn
+in every style of synthetic_books.DIAGRAM_STYLES at several sizes, and each
+crop is passed to extract_fen_from_image with every available engine
+forced in turn. Reports per-square accuracy, exact board match rate and
+latency percentiles side by side, and saves them as JSON so a faster
+recognizer can't quietly become a worse one.
+
+    python benchmarks/bench_recognition.py --positions 30 --sizes 160 240 400
+    python benchmarks/bench_recognition.py --compare results/before.json results/after.json
+
+Only the piece placement is scored: diagrams don't show side to move or
+castling rights. The diagrams use the font the square classifier builds
+its templates from unless --font points elsewhere, which flatters it.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import chess
+import numpy as np
+from PIL import ImageFont
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from bench_pipeline import git_commit  # noqa: E402
+from square_classifier import find_chess_font  # noqa: E402
+from synthetic_books import DIAGRAM_STYLES, GLYPH_SCALE, draw_diagram, random_position  # noqa: E402
+
+CLASSIC_POSITIONS = (
+    chess.STARTING_BOARD_FEN,
+    'r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R',  # Ruy Lopez
+    'rnbqkb1r/pp2pppp/3p1n2/8/3NP3/8/PPP2PPP/RNBQKB1R',  # Sicilian
+    'r1bk3r/p2pBpNp/n4n2/1p1NP2P/6P1/3P4/P1P1K3/q5b1',  # The Immortal Game, final position
+    '8/8/8/4k3/8/8/3QK3/8',  # Queen endgame
+    '6k1/5ppp/8/8/8/8/8/R5K1',  # Back-rank mate pattern
+)
+PERCENTILES = (50, 95, 99)
+
+
+def build_corpus(positions, sizes, styles, seed, font_path):
+    """[(style, size, board_fen, grayscale array)] for every position, style and size"""
+    rng = np.random.default_rng(seed)
+    boards = [chess.Board(fen + ' w - - 0 1') for fen in CLASSIC_POSITIONS[:positions]]
+    while len(boards) < positions:
+        boards.append(random_position(rng))
+
+    corpus = []
+    for size in sizes:
+        square = size // 8
+        font = ImageFont.truetype(font_path, int(square * GLYPH_SCALE))
+        for style in styles:
+            for board in boards:
+                pixels = draw_diagram(board, square, font, style, rng)
+                # Crops come out of the service as grayscale arrays
+                corpus.append((style, size, board.board_fen(), pixels))
+    return corpus
+
+
+def expand_placement(fen):
+    """64 square symbols ('.' for empty) of a FEN's piece placement, or None if malformed"""
+    squares = []
+    for row in fen.split(' ')[0].split('/'):
+        for symbol in row:
+            squares.extend('.' * int(symbol) if symbol.isdigit() else symbol)
+    return squares if len(squares) == 64 else None
+
+
+def score(expected, predicted):
+    """(correct squares out of 64, exact placement match)"""
+    truth, guess = expand_placement(expected), expand_placement(predicted)
+    if guess is None:
+        return 0, False
+    correct = sum(a == b for a, b in zip(truth, guess))
+    return correct, correct == 64
+
+
+def run_engine(service, engine, corpus, repeats):
+    """Recognize the corpus with one engine; returns one record per crop"""
+    # One untimed pass so lazy initialization doesn't land in the first sample
+    service.extract_fen_from_image(corpus[0][3], engine=engine)
+    records = []
+    for style, size, expected, image in corpus:
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fen, _ = service.extract_fen_from_image(image, engine=engine)
+            latencies.append(time.perf_counter() - start)
+        correct, exact = score(expected, fen)
+        records.append({'style': style, 'size': size, 'squares': correct, 'exact': exact,
+                        'seconds': min(latencies)})
+    return records
+
+
+def summarize(records):
+    latencies = np.array([record['seconds'] for record in records]) * 1000
+    summary = {
+        'boards': len(records),
+        'square_accuracy': round(sum(record['squares'] for record in records) / (64 * len(records)), 4),
+        'exact_match': round(sum(record['exact'] for record in records) / len(records), 4),
+    }
+    for percentile in PERCENTILES:
+        summary[f'p{percentile}_ms'] = round(float(np.percentile(latencies, percentile)), 2)
+    return summary
+
+
+def build_report(args, service, results):
+    return {
+        'benchmark': 'recognition',
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'font': os.path.basename(args.font)
+        },
+        'config': {
+            'positions': args.positions,
+            'sizes': args.sizes,
+            'styles': args.styles,
+            'repeats': args.repeats,
+            'seed': args.seed
+        },
+        'engines': {
+            engine: {
+                'overall': summarize(records),
+                'by_style': {style: summarize([r for r in records if r['style'] == style])
+                             for style in args.styles},
+                'by_size': {str(size): summarize([r for r in records if r['size'] == size])
+                            for size in args.sizes}
+            }
+            for engine, records in results.items()
+        },
+        'unavailable': [engine for engine in service.metrics.ENGINES
+                        if engine != 'error' and engine not in results]
+    }
+
+
+def print_report(report):
+    config = report['config']
+    print(f"{config['positions']} positions x {len(config['styles'])} styles x {len(config['sizes'])} sizes, "
+          f"best of {config['repeats']}, font {report['environment']['font']}")
+    header = f"  {'':24s} {'squares':>8s} {'exact':>7s}" + ''.join(f" {f'p{p} ms':>8s}" for p in PERCENTILES)
+    for engine, results in report['engines'].items():
+        print(f"\n{engine}")
+        print(header)
+        rows = [('all', results['overall'])]
+        rows += [(f'style {style}', summary) for style, summary in results['by_style'].items()]
+        rows += [(f'size {size}px', summary) for size, summary in results['by_size'].items()]
+        for label, summary in rows:
+            print(f"  {label:24s} {100 * summary['square_accuracy']:7.1f}% {100 * summary['exact_match']:6.1f}%"
+                  + ''.join(f" {summary[f'p{p}_ms']:8.2f}" for p in PERCENTILES))
+    if report['unavailable']:
+        print(f"\nNot available here: {', '.join(report['unavailable'])}")
+
+
+def compare(before_path, after_path):
+    """Print accuracy and latency changes per engine between two saved runs"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    for engine in after['engines']:
+        if engine not in before['engines']:
+            continue
+        old, new = before['engines'][engine]['overall'], after['engines'][engine]['overall']
+        print(f"  {engine:18s} squares {100 * old['square_accuracy']:5.1f}% -> {100 * new['square_accuracy']:5.1f}%"
+              f"   exact {100 * old['exact_match']:5.1f}% -> {100 * new['exact_match']:5.1f}%"
+              f"   p50 {old['p50_ms']:.2f} -> {new['p50_ms']:.2f} ms"
+              f"   p95 {old['p95_ms']:.2f} -> {new['p95_ms']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--positions', type=int, default=30)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[160, 240, 400], help='Diagram sides in pixels')
+    parser.add_argument('--styles', nargs='+', default=list(DIAGRAM_STYLES), choices=DIAGRAM_STYLES)
+    parser.add_argument('--engines', nargs='+', help='Engines to run (default: every available one)')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per board, the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--font', help='Font to draw the diagrams with (default: the classifier\'s)')
+    parser.add_argument('--output', help='JSON report path (default: benchmarks/results/recognition-<commit>-<time>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Compare two saved reports')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    args.font = args.font or find_chess_font()
+    if args.font is None:
+        parser.error('No font with chess glyphs found; set CHESS_FONT_PATH or pass --font')
+    corpus = build_corpus(args.positions, args.sizes, args.styles, args.seed, args.font)
+
+    # The service creates its upload/cache folders relative to the working directory
+    workdir = tempfile.mkdtemp(prefix='bench_recognition_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import app as service
+        service.init_models(warm_up=False)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    # Recognizer logging would otherwise print every FEN
+    service.logger.setLevel('WARNING')
+
+    engines = args.engines or service.available_engines()
+    results = {}
+    for engine in engines:
+        if engine not in service.available_engines():
+            print(f"Skipping {engine}: not available")
+            continue
+        results[engine] = run_engine(service, engine, corpus, args.repeats)
+
+    report = build_report(args, service, results)
+    print_report(report)
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', f"recognition-{report['commit'] or 'local'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Saved {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+HTTP throughput of the development server (python app.py) vs gunicorn.
+
+    python benchmarks/bench_serving.py --pages 40 --concurrency 8
+
+Each server is started in a scratch directory whose page store is seeded
+with synthetic pages, so /extract_fen works without poppler or a PDF. Every
+request asks for a different board, so neither FEN cache layer can answer
+and each request pays for cropping and recognition.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SERVICE_DIR)
+
+from page_store import PageStore  # noqa: E402
+from synthetic_pages import make_page  # noqa: E402
+
+BOOK_HASH = 'b' * 32
+# Pages are stored as the detection render; at 150 DPI it shares the
+# coordinate space of the boxes, so no scaling is involved
+BENCH_DPI = 150
+
+
+def seed_book(root, pages, boards_per_page):
+    store = PageStore(os.path.join(root, 'pdf_cache'))
+    regions = []
+    for page_num in range(1, pages + 1):
+        page, boxes = make_page(boards=boards_per_page, seed=page_num)
+        store.save_page(BOOK_HASH, BENCH_DPI, page_num, page)
+        regions.extend({'pdf_hash': BOOK_HASH, 'page': page_num, **box} for box in boxes)
+    return regions
+
+
+def start_server(kind, root, port, workers, threads):
+    env = dict(os.environ, PORT=str(port), DETECTION_DPI=str(BENCH_DPI),
+               CLIENT_RATE_LIMIT='100000', CLIENT_BURST='100000', PYTHONUNBUFFERED='1')
+    if kind == 'dev':
+        command = [sys.executable, os.path.join(SERVICE_DIR, 'app.py')]
+    else:
+        env.update(WEB_CONCURRENCY=str(workers), WEB_THREADS=str(threads))
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(SERVICE_DIR, 'gunicorn.conf.py'),
+                   '--pythonpath', SERVICE_DIR, '--access-logfile', '/dev/null', 'wsgi:application']
+    log = open(os.path.join(root, f'{kind}.log'), 'w')
+    process = subprocess.Popen(command, cwd=root, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/ready', timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f'{kind} server did not become ready, see {log.name}')
+
+
+def load(port, regions, concurrency):
+    """POST every region once; returns (elapsed seconds, latencies, errors)"""
+    url = f'http://127.0.0.1:{port}/extract_fen'
+
+    def post(region):
+        start = time.perf_counter()
+        try:
+            ok = requests.post(url, json=region, timeout=60).status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(post, regions))
+    elapsed = time.perf_counter() - start
+    latencies = np.array([latency for latency, _ in outcomes])
+    return elapsed, latencies, sum(not ok for _, ok in outcomes)
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=150)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--boards-per-page', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=max(2, min(os.cpu_count() or 1, 8)))
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    print(f"{args.pages} pages x {args.boards_per_page} boards, {args.concurrency} concurrent clients, "
+          f"{os.cpu_count()} CPU(s); gunicorn {args.workers} workers x {args.threads} threads")
+    for kind in ('dev', 'gunicorn'):
+        root = tempfile.mkdtemp(prefix=f'bench_serving_{kind}_')
+        try:
+            regions = seed_book(root, args.pages, args.boards_per_page)
+            process = start_server(kind, root, args.port, args.workers, args.threads)
+            try:
+                load(args.port, regions[:args.concurrency], args.concurrency)  # connection warm-up
+                elapsed, latencies, errors = load(args.port, regions, args.concurrency)
+            finally:
+                stop_server(process)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+        print(f"  {kind:9s} {len(regions) / elapsed:7.1f} req/s   p50 {1000 * np.median(latencies):6.1f} ms   "
+              f"p95 {1000 * np.percentile(latencies, 95):6.1f} ms   errors {errors}")
+
+
+if __name__ == '__main__':
+    main()
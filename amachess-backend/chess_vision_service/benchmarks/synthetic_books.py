@@ -0,0 +1,150 @@
+"""
+Synthetic chess-book PDFs for offline benchmarks.
+Pages carry lines of text-like dashes and diagrams of random legal
+positions set with the Unicode chess glyphs of a system font, the way book
+diagrams are printed, and are saved as a multi-page PDF with Pillow. Text,
+diagram backgrounds and speckle come from synthetic_pages.
+The ground truth (diagram boxes in 150-DPI pixels and their FENs) is
+returned with every book.
+
+    python benchmarks/synthetic_books.py book.pdf --pages 20 --diagrams-per-page 2
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import chess
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from square_classifier import _FILLED_GLYPHS, _OUTLINE_GLYPHS, find_chess_font  # noqa: E402
+from synthetic_pages import add_speckle, blank_diagram, draw_text, place_diagram  # noqa: E402
+
+# Boxes are reported in the service's coordinate space
+COORDINATE_DPI = 150
+PAGE_INCHES = (8.27, 11.69)  # A4
+MARGIN_INCHES = 0.7
+DIAGRAM_INCHES = 2.6
+DIAGRAM_GAP_INCHES = 0.6
+GLYPH_SCALE = 0.85  # Glyph height as a share of the square
+# How dark squares are printed: hatching (most books), a flat grey tint, or
+# hatching degraded by a blurry, speckled scan
+DIAGRAM_STYLES = ('hatched', 'solid', 'scanned')
+
+
+def random_position(rng, min_plies=10, max_plies=60) -> chess.Board:
+    """Play random legal moves from the initial position"""
+    board = chess.Board()
+    for _ in range(int(rng.integers(min_plies, max_plies + 1))):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        board.push(moves[int(rng.integers(len(moves)))])
+    return board
+
+
+def draw_diagram(board: chess.Board, square: int, font, style: str = 'hatched', rng=None) -> np.ndarray:
+    """A framed diagram in one of DIAGRAM_STYLES, (8*square, 8*square) uint8"""
+    pixels = blank_diagram(8 * square, style, 190 if style == 'solid' else 110, max(2, square // 16))
+    image = Image.fromarray(pixels)
+    draw = ImageDraw.Draw(image)
+    for position, piece in board.piece_map().items():
+        file, row = chess.square_file(position), 7 - chess.square_rank(position)
+        filled = _FILLED_GLYPHS[piece.symbol().upper()]
+        left, top, right, bottom = draw.textbbox((0, 0), filled, font=font)
+        origin = (file * square + (square - (right - left)) / 2 - left,
+                  row * square + (square - (bottom - top)) / 2 - top)
+        if piece.color == chess.WHITE:
+            draw.text(origin, filled, font=font, fill=255)
+            draw.text(origin, _OUTLINE_GLYPHS[piece.symbol()], font=font, fill=0)
+        else:
+            draw.text(origin, filled, font=font, fill=0)
+    pixels = np.asarray(image)
+
+    if style == 'scanned':
+        rng = rng or np.random.default_rng(0)
+        pixels = cv2.GaussianBlur(pixels, (0, 0), max(0.6, square / 40))
+        add_speckle(pixels, rng, 0.01)
+    return pixels
+
+
+def diagram_slots(dpi: int):
+    """Top-left corners of the diagram positions of a page, two columns"""
+    width, height = (int(round(inches * dpi)) for inches in PAGE_INCHES)
+    margin = int(MARGIN_INCHES * dpi)
+    side = 8 * int(DIAGRAM_INCHES * dpi / 8)
+    step = side + int(DIAGRAM_GAP_INCHES * dpi)
+    return [(x, y)
+            for y in range(margin + dpi // 2, height - margin - side + 1, step)
+            for x in (margin, width // 2 + dpi // 5)]
+
+
+def render_page(page_num: int, diagrams: int = 2, dpi: int = 150, noise: float = 0.0,
+                seed: int = 0, font_path=None):
+    """
+    Render one page. Returns (page, truth) where page is uint8 grayscale at
+    dpi and truth lists {'page', 'x', 'y', 'width', 'height', 'fen'} per
+    diagram in COORDINATE_DPI pixels. Pages are reproducible from
+    (page_num, seed).
+    """
+    rng = np.random.default_rng([seed, page_num])
+    width, height = (int(round(inches * dpi)) for inches in PAGE_INCHES)
+    page = np.full((height, width), 255, dtype=np.uint8)
+    draw_text(page, rng, int(MARGIN_INCHES * dpi), int(0.19 * dpi), max(2, int(0.08 * dpi)),
+              words=(dpi // 8, dpi // 2), gaps=(dpi // 15, dpi // 8))
+
+    side = 8 * int(DIAGRAM_INCHES * dpi / 8)
+    font = ImageFont.truetype(font_path or find_chess_font(), int(side / 8 * GLYPH_SCALE))
+    scale = COORDINATE_DPI / dpi
+    truth = []
+    for x, y in diagram_slots(dpi)[:diagrams]:
+        board = random_position(rng)
+        place_diagram(page, x, y, draw_diagram(board, side // 8, font), dpi // 8)
+        truth.append({
+            'page': page_num,
+            'x': int(round(x * scale)), 'y': int(round(y * scale)),
+            'width': int(round(side * scale)), 'height': int(round(side * scale)),
+            'fen': board.board_fen()
+        })
+
+    if noise > 0:
+        add_speckle(page, rng, noise)
+    return page, truth
+
+
+def write_book_pdf(path: str, pages: int = 10, diagrams_per_page: int = 2, dpi: int = 150,
+                   noise: float = 0.0, seed: int = 0, font_path=None):
+    """Write a synthetic book to path; returns the ground truth of all pages"""
+    truth = []
+    images = []
+    for page_num in range(1, pages + 1):
+        page, page_truth = render_page(page_num, diagrams_per_page, dpi, noise, seed, font_path)
+        images.append(Image.fromarray(page))
+        truth.extend(page_truth)
+    images[0].save(path, 'PDF', resolution=dpi, save_all=True, append_images=images[1:])
+    return truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output')
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--diagrams-per-page', type=int, default=2)
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--noise', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    truth = write_book_pdf(args.output, args.pages, args.diagrams_per_page, args.dpi, args.noise, args.seed)
+    with open(os.path.splitext(args.output)[0] + '.truth.json', 'w') as f:
+        json.dump(truth, f, indent=1)
+    print(f"Wrote {args.output}: {args.pages} pages, {len(truth)} diagrams")
+
+
+if __name__ == '__main__':
+    main()
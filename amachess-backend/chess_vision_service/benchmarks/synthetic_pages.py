@@ -0,0 +1,93 @@
+"""
+Synthetic chess book pages for offline benchmarks.
+Pages are grayscale uint8 arrays with printed-style 8x8 diagrams placed
+among text-like noise, so no PDF or poppler install is needed.
+"""
+
+import numpy as np
+
+
+def blank_diagram(size, style='hatched', tone=120, frame=3):
+    """
+    An empty framed 8x8 diagram, (size, size) uint8. Dark squares are
+    hatched every third column (most books) or, with style 'solid', tinted.
+    """
+    board = np.full((size, size), 255, dtype=np.uint8)
+    square = size // 8
+    step = 1 if style == 'solid' else 3
+    for row in range(8):
+        for col in range(8):
+            if (row + col) % 2 == 1:
+                y0, x0 = row * square, col * square
+                board[y0:y0 + square, x0:x0 + square:step] = tone
+    board[:frame, :] = board[-frame:, :] = 0
+    board[:, :frame] = board[:, -frame:] = 0
+    return board
+
+
+def draw_board(size, rng=None):
+    """A bordered 8x8 diagram with hatched dark squares and a few blobs as pieces"""
+    rng = rng or np.random.default_rng(0)
+    board = blank_diagram(size)
+    square = size // 8
+    pad = square // 4
+    for row in range(8):
+        for col in range(8):
+            if rng.random() < 0.3:
+                y0, x0 = row * square, col * square
+                board[y0 + pad:y0 + square - pad, x0 + pad:x0 + square - pad] = 0 if rng.random() < 0.5 else 200
+    return board
+
+
+def draw_text(page, rng, margin, line_step, line_height, words, gaps, right_margin=None):
+    """Lines of "text": short dark dashes laid out in rows inside the margins"""
+    height, width = page.shape
+    right = width - (margin if right_margin is None else right_margin)
+    for y in range(margin, height - margin, line_step):
+        x = margin
+        while x < right:
+            word = int(rng.integers(*words))
+            page[y:y + line_height, x:min(x + word, right)] = 30
+            x += word + int(rng.integers(*gaps))
+
+
+def place_diagram(page, x, y, diagram, pad):
+    """Paste a diagram with its top-left corner at (x, y), clearing pad pixels of white around it"""
+    height, width = diagram.shape
+    page[y - pad:y + height + pad, x - pad:x + width + pad] = 255
+    page[y:y + height, x:x + width] = diagram
+
+
+def add_speckle(page, rng, noise):
+    """Salt-and-pepper speckle like a poor scan: a share noise of the pixels get random values"""
+    mask = rng.random(page.shape) < noise
+    page[mask] = rng.integers(0, 256, size=int(mask.sum()), dtype=np.uint8)
+
+
+def make_page(width=1240, height=1754, boards=2, noise=0.0, seed=0):
+    """
+    Render one synthetic page (150 DPI A4 by default).
+    Returns (page, boxes) where boxes are the true diagram rectangles.
+    """
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width), 255, dtype=np.uint8)
+    draw_text(page, rng, 80, 28, 12, words=(20, 90), gaps=(10, 20), right_margin=120)
+
+    boxes = []
+    board_size = min(width, height) // 3
+    for index in range(boards):
+        x = 100 + (index % 2) * (width // 2)
+        y = 150 + (index // 2) * (board_size + 120)
+        if y + board_size > height - 50 or x + board_size > width - 50:
+            break
+        place_diagram(page, x, y, draw_board(board_size, rng), 20)
+        boxes.append({'x': x, 'y': y, 'width': board_size, 'height': board_size})
+
+    if noise > 0:
+        add_speckle(page, rng, noise)
+
+    return page, boxes
+
+
+def make_book(pages=20, boards_per_page=2, noise=0.0, width=1240, height=1754):
+    return [make_page(width, height, boards_per_page, noise, seed=i)[0] for i in range(pages)]
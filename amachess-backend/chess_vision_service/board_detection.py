@@ -0,0 +1,297 @@
+"""
+Chess board detection on rendered PDF pages.
+Kept free of Flask and model state so pages can be fanned out to worker
+processes, which only need to import this module.
+"""
+
+import hashlib
+import json
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DETECTION_MODES = ('serial', 'thread', 'process')
+
+# Candidates are resampled to this size (8 cells of 16px) for grid verification
+GRID_SAMPLE_SIZE = 128
+# Minimum grid score for a candidate to be reported as a board
+GRID_MIN_SCORE = 0.5
+# Boards reported per page at most
+MAX_CANDIDATES = 10
+# Smallest candidate blob in pixels at the working size (pages are shrunk to 1500px)
+MIN_CANDIDATE_AREA = 5000
+# Estimated blobs (count_blob_starts) up to which tracing contours is faster
+# than connected component stats when looking for candidates
+CONTOUR_TRACE_MAX_BLOBS = 6000
+# Bump whenever detection changes in a way the parameters above don't show,
+# so detections stored in the page store are recomputed (detector_fingerprint)
+DETECTOR_VERSION = 2
+
+# Left, up-left, up and up-right neighbours of the anchor (centre)
+_BLOB_START_KERNEL = np.array([[1, 1, 1], [1, 0, 0], [0, 0, 0]], dtype=np.uint8)
+_CHECKER_PARITY = (np.add.outer(np.arange(8), np.arange(8)) % 2).astype(bool)
+# 8, 16, 24 and 32 cycles per board, +/-1 bin for slightly loose crops
+_GRID_HARMONIC_BINS = [h + d for h in (8, 16, 24, 32) for d in (-1, 0, 1)]
+
+def detect_chessboard_contours(image):
+    """
+    Detect chessboard-like contours in an image using OpenCV
+    Returns list of bounding boxes with confidence scores
+    """
+    try:
+        # Convert to grayscale (pages may already be single-channel)
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+        
+        # Resize image if too large for faster processing
+        height, width = gray.shape
+        if width > 1500 or height > 1500:
+            scale_factor = min(1500/width, 1500/height)
+            new_width = int(width * scale_factor)
+            new_height = int(height * scale_factor)
+            gray = cv2.resize(gray, (new_width, new_height))
+            scale_back = 1 / scale_factor
+        else:
+            scale_back = 1
+        
+        # Apply Gaussian blur to reduce noise
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        
+        # Apply adaptive thresholding to handle different lighting conditions
+        adaptive_thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                                               cv2.THRESH_BINARY_INV, 11, 2)
+        
+        # Bounding boxes of large, roughly square blobs (working resolution)
+        min_area = MIN_CANDIDATE_AREA * (scale_back ** 2)  # Adjust for scaling
+        rects = find_board_candidates(adaptive_thresh, min_area)
+        if not len(rects):
+            return []
+
+        # Verify the 8x8 grid on all candidates of the page in one pass
+        scores = grid_scores(gray, rects)
+        keep = np.flatnonzero(scores >= GRID_MIN_SCORE)
+
+        # Top candidates by confidence, highest first
+        if len(keep) > MAX_CANDIDATES:
+            keep = keep[np.argpartition(-scores[keep], MAX_CANDIDATES - 1)[:MAX_CANDIDATES]]
+        keep = keep[np.argsort(-scores[keep], kind='stable')]
+
+        # Scale coordinates back to original size
+        boxes = (rects[keep] * scale_back).astype(int)
+        return [
+            {
+                'x': int(x),
+                'y': int(y),
+                'width': int(w),
+                'height': int(h),
+                'confidence': round(float(score), 2)
+            }
+            for (x, y, w, h), score in zip(boxes, scores[keep])
+        ]
+
+    except Exception as e:
+        logger.error(f"Error in detect_chessboard_contours: {str(e)}")
+        return []
+
+
+def detector_fingerprint():
+    """Short hash of the detector version and parameters; stored detections are reused only under the same one"""
+    parameters = {
+        'version': DETECTOR_VERSION,
+        'grid_sample_size': GRID_SAMPLE_SIZE,
+        'grid_min_score': GRID_MIN_SCORE,
+        'max_candidates': MAX_CANDIDATES,
+        'min_candidate_area': MIN_CANDIDATE_AREA
+    }
+    return hashlib.sha1(json.dumps(parameters, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def find_board_candidates(binary, min_area, aspect_range=(0.6, 1.4)):
+    """
+    Bounding rectangles (N, 4 int array of x, y, w, h) of the ink blobs in a
+    thresholded page that are large and roughly square enough to be boards.
+    Clean pages have a few hundred blobs, and tracing their outer contours
+    is cheapest. Noisy scans have tens of thousands, so past
+    CONTOUR_TRACE_MAX_BLOBS (estimated by count_blob_starts) the blobs are
+    measured with connected component stats instead. Both give the same boxes.
+    """
+    if count_blob_starts(binary) <= CONTOUR_TRACE_MAX_BLOBS:
+        return traced_board_candidates(binary, min_area, aspect_range)
+    return component_board_candidates(binary, min_area, aspect_range)
+
+
+def count_blob_starts(binary):
+    """
+    Rough blob count of a binary page: ink pixels with no ink to their left
+    or in the row above. A compact blob has one; outlines and glyphs have a
+    few. One dilation, under a millisecond for a working-size page.
+    """
+    covered = cv2.dilate(binary, _BLOB_START_KERNEL)
+    return cv2.countNonZero(cv2.bitwise_and(binary, cv2.bitwise_not(covered)))
+
+
+def traced_board_candidates(binary, min_area, aspect_range=(0.6, 1.4)):
+    """find_board_candidates by tracing every outer contour and measuring it in a loop"""
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    rects = []
+    for contour in contours:
+        if cv2.contourArea(contour) < min_area:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        if aspect_range[0] <= w / h <= aspect_range[1]:
+            rects.append((x, y, w, h))
+    return np.array(rects, dtype=np.int64).reshape(-1, 4)
+
+
+def component_board_candidates(binary, min_area, aspect_range=(0.6, 1.4)):
+    """
+    find_board_candidates without tracing every blob: connected component
+    stats give every blob's bounding box as arrays, which are filtered with
+    boolean masks. Only the few survivors have their outline traced to check
+    the enclosed area (cv2.contourArea of the outer contour, as when tracing).
+    """
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    # Label 0 is the background
+    rects = stats[1:, :4].astype(np.int64)
+    widths, heights = rects[:, 2], rects[:, 3]
+    aspect = widths / heights
+
+    # The bounding box bounds the enclosed area from above
+    candidates = np.flatnonzero(
+        (widths * heights >= min_area) &
+        (aspect >= aspect_range[0]) & (aspect <= aspect_range[1])
+    )
+
+    areas = np.zeros(len(candidates))
+    for i, index in enumerate(candidates):
+        x, y, w, h = rects[index]
+        blob = (labels[y:y + h, x:x + w] == index + 1).astype(np.uint8)
+        contours, _ = cv2.findContours(blob, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        areas[i] = max(cv2.contourArea(contour) for contour in contours)
+
+    rects = rects[candidates[areas >= min_area]]
+
+    # Blobs inside a larger candidate (bits of a diagram between its lines)
+    # are not boards of their own; outer contours never reported them either
+    x0, y0 = rects[:, 0], rects[:, 1]
+    x1, y1 = x0 + rects[:, 2], y0 + rects[:, 3]
+    inside = ((x0[:, None] >= x0) & (y0[:, None] >= y0) &
+              (x1[:, None] <= x1) & (y1[:, None] <= y1))
+    np.fill_diagonal(inside, False)
+    return rects[~inside.any(axis=1)]
+
+
+def grid_scores(gray, rects):
+    """
+    Score how much each candidate crop looks like an 8x8 chess grid, 0..1.
+    All crops are resampled to GRID_SAMPLE_SIZE and scored together as one
+    (N, S, S) array using two signals:
+    - checker contrast: dark and light squares alternate, so the shade of
+      every cell is compared against cells of the other colour. Shades are
+      read in the corners of the cells: on busy positions the centres are
+      mostly piece glyphs, which pull the two medians together
+    - rhythm: share of the edge projection spectrum at 8 cycles per board
+      and its harmonics (square borders repeat eight times along each axis)
+    Text blocks, tables and photos have little of either.
+    """
+    size = GRID_SAMPLE_SIZE
+    cell = size // 8
+    crops = np.stack([
+        cv2.resize(gray[y:y + h, x:x + w], (size, size), interpolation=cv2.INTER_AREA)
+        for x, y, w, h in rects
+    ]).astype(np.float32)
+
+    # Checker contrast: median corner-patch intensity of each square colour,
+    # one pixel in from the cell edges
+    patch = cell // 4
+    near, far = slice(1, 1 + patch), slice(cell - 1 - patch, cell - 1)
+    cells = crops.reshape(len(crops), 8, cell, 8, cell)
+    cell_means = np.mean([cells[:, :, rows, :, cols].mean(axis=(2, 4))
+                          for rows in (near, far) for cols in (near, far)], axis=0)
+    dark = _CHECKER_PARITY
+    contrast = np.abs(np.median(cell_means[:, dark], axis=1) -
+                      np.median(cell_means[:, ~dark], axis=1)) / 255.0
+    contrast_score = np.clip((contrast - 0.04) / 0.10, 0.0, 1.0)
+
+    # Rhythm: periodicity of column and row edge profiles, weaker axis counts
+    columns = np.abs(np.diff(crops, axis=2)).sum(axis=1)
+    rows = np.abs(np.diff(crops, axis=1)).sum(axis=2)
+    rhythm = np.minimum(_grid_periodicity(columns), _grid_periodicity(rows))
+    rhythm_score = np.clip(rhythm / 0.4, 0.0, 1.0)
+
+    return 0.7 * contrast_score + 0.3 * rhythm_score
+
+
+def _grid_periodicity(profiles):
+    """Fraction of each profile's spectral energy at 8 cycles and harmonics"""
+    profiles = profiles - profiles.mean(axis=1, keepdims=True)
+    profiles = profiles * np.hanning(profiles.shape[1])
+    spectrum = np.abs(np.fft.rfft(profiles, n=GRID_SAMPLE_SIZE, axis=1)) ** 2
+    total = spectrum[:, 1:GRID_SAMPLE_SIZE // 2].sum(axis=1) + 1e-9
+    return spectrum[:, _GRID_HARMONIC_BINS].sum(axis=1) / total
+
+
+def create_detection_pool(mode, workers):
+    """
+    Create the executor used to fan pages out to workers.
+    'thread' relies on OpenCV releasing the GIL, 'process' uses spawned
+    worker processes; 'serial' (or a single worker) returns None.
+    """
+    if mode not in DETECTION_MODES:
+        raise ValueError(f"Unknown detection mode '{mode}', expected one of {DETECTION_MODES}")
+    if mode == 'serial' or workers <= 1:
+        return None
+    if mode == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='detect')
+    # Spawn rather than fork: forking a threaded Flask/OpenCV process can deadlock
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+def timed_detection(image_array):
+    """
+    detect_chessboard_contours plus when it started (epoch seconds), how
+    long it ran and where (process:thread), measured where it runs
+    """
+    started_at = time.time()
+    start = time.perf_counter()
+    bounding_boxes = detect_chessboard_contours(image_array)
+    worker = f'{os.getpid()}:{threading.current_thread().name}'
+    return bounding_boxes, (started_at, time.perf_counter() - start, worker)
+
+def detect_pages(pages, pool=None, max_in_flight=4, observe=None):
+    """
+    Run detect_chessboard_contours over an iterable of (page_num, image_array).
+    Yields (page_num, bounding_boxes) in page order. With a pool, up to
+    max_in_flight pages are submitted ahead of the one being yielded, which
+    bounds how many rendered pages are held in memory at once.
+    observe(page_num, started_at, seconds, worker), if given, receives the
+    timing of each page's detection.
+    """
+    def finish(page_num, outcome):
+        bounding_boxes, timing = outcome
+        if observe is not None:
+            observe(page_num, *timing)
+        return page_num, bounding_boxes
+
+    if pool is None:
+        for page_num, image_array in pages:
+            yield finish(page_num, timed_detection(image_array))
+        return
+
+    in_flight = deque()
+    for page_num, image_array in pages:
+        in_flight.append((page_num, pool.submit(timed_detection, image_array)))
+        if len(in_flight) >= max_in_flight:
+            done_page, future = in_flight.popleft()
+            yield finish(done_page, future.result())
+
+    while in_flight:
+        done_page, future = in_flight.popleft()
+        yield finish(done_page, future.result())
@@ -0,0 +1,38 @@
+"""
+Cache of recognized positions for board crops, keyed by region:
+(pdf_hash, page, x, y, width, height) as requested, which skips
+re-rendering as well as recognition when a book is reopened.
+There is no layer keyed by the crop's pixels. Two crops of one diagram
+taken a pixel or two apart differ on some square by more than two
+different pieces do, so such a key either misses or returns the wrong
+position. Glyphs repeated across a book are still recognized only once
+through the square classifier's glyph cache.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from page_cache import PageCache
+
+# Approximate bookkeeping cost of one region entry besides the FEN text
+ENTRY_OVERHEAD_BYTES = 256
+
+Result = Tuple[str, float]
+
+
+class FenCache:
+    """Recognition results by request region, in a byte-budgeted PageCache (LRU, TTL)"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.by_region = PageCache(max_bytes, ttl_seconds)
+
+    def get_region(self, region_key: Tuple) -> Optional[Result]:
+        return self.by_region.get(region_key)
+
+    def put(self, region_key: Tuple, fen: str, confidence: float):
+        self.by_region.put(region_key, (fen, confidence), ENTRY_OVERHEAD_BYTES + len(fen))
+
+    def clear(self):
+        self.by_region.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'by_region': self.by_region.stats()}
@@ -0,0 +1,132 @@
+"""
+Memoized square classifications for the glyphs of a book.
+A book is printed in one diagram font, so the same few dozen piece and
+square images repeat across all of its diagrams. Normalized squares are
+keyed by a 64-bit DCT perceptual hash; repeated glyphs resolve from an LRU
+table instead of being matched against the templates again. Hit rates are
+kept per book (pdf_hash).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+# Low-frequency DCT block used for the hash (8x8 -> 64 bits, DC dropped)
+HASH_FREQUENCIES = 8
+
+_dct_bases: Dict[int, np.ndarray] = {}
+
+
+def _dct_basis(size: int) -> np.ndarray:
+    """First HASH_FREQUENCIES rows of the orthonormal DCT-II matrix"""
+    basis = _dct_bases.get(size)
+    if basis is None:
+        k = np.arange(HASH_FREQUENCIES)[:, None]
+        n = np.arange(size)[None, :]
+        basis = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2.0 / size)
+        basis[0] /= np.sqrt(2.0)
+        basis = _dct_bases[size] = basis.astype(np.float32)
+    return basis
+
+
+def perceptual_hash(cells: np.ndarray) -> np.ndarray:
+    """
+    pHash of (N, S, S) squares as (N,) uint64: the sign of each low-frequency
+    DCT coefficient relative to their median. All squares are transformed
+    together as two batched matrix products.
+    """
+    basis = _dct_basis(cells.shape[-1])
+    coefficients = basis @ cells.astype(np.float32) @ basis.T
+    coefficients = coefficients.reshape(len(cells), -1)[:, 1:]
+    bits = coefficients > np.median(coefficients, axis=1, keepdims=True)
+    packed = np.packbits(bits, axis=1)  # 63 bits -> 8 bytes
+    return np.ascontiguousarray(packed).view('>u8').ravel()
+
+
+class GlyphCache:
+    """Thread-safe LRU of per-square results keyed by (book, perceptual hash)"""
+
+    def __init__(self, max_entries: int, max_books: int = 100):
+        self.max_entries = max_entries
+        self.max_books = max_books
+        self._entries = OrderedDict()
+        self._books = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get_many(self, book: Hashable, hashes: np.ndarray) -> List[Optional[Any]]:
+        """Look up every hash; returns the cached value or None for each"""
+        with self._lock:
+            values = []
+            for value_hash in hashes.tolist():
+                key = (book, value_hash)
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                values.append(value)
+            return values
+
+    def record(self, book: Hashable, hits: int, misses: int):
+        """
+        Count squares resolved without (hits) and with (misses) running the
+        recognizer; repeats of a new glyph within one batch count as hits
+        """
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            counts = self._book_counts(book)
+            counts['hits'] += hits
+            counts['misses'] += misses
+
+    def put_many(self, book: Hashable, hashes: np.ndarray, values):
+        with self._lock:
+            for value_hash, value in zip(hashes.tolist(), values):
+                key = (book, value_hash)
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._books.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': _ratio(self.hits, self.misses),
+                'evictions': self.evictions,
+                'books': {
+                    str(book): {**counts, 'hit_ratio': _ratio(counts['hits'], counts['misses'])}
+                    for book, counts in self._books.items()
+                }
+            }
+
+    def _book_counts(self, book: Hashable) -> Dict[str, int]:
+        """Per-book counters, keeping only the most recently used books"""
+        counts = self._books.get(book)
+        if counts is None:
+            counts = self._books[book] = {'hits': 0, 'misses': 0}
+            if len(self._books) > self.max_books:
+                self._books.popitem(last=False)
+        self._books.move_to_end(book)
+        return counts
+
+
+def _ratio(hits: int, misses: int) -> float:
+    lookups = hits + misses
+    return round(hits / lookups, 4) if lookups else 0.0
@@ -0,0 +1,73 @@
+"""
+Gunicorn settings for the Chess Vision Service.
+Every value can be overridden from the environment; see the README section
+"Production serving".
+"""
+
+import os
+import shutil
+import tempfile
+
+_cores = os.cpu_count() or 1
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Detection and recognition are CPU-bound, so one process per core; a few
+# threads per process overlap uploads, pdftoppm subprocesses and disk reads.
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, min(_cores, 8))))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+
+# Import app (and the NumPy engines) once in the master, shared copy-on-write
+preload_app = True
+
+# Worker heartbeat timeout. gthread workers keep beating while requests run
+# on their threads, so a whole book on /detect-boards (minutes) is never cut
+# off; this catches a worker that hangs, e.g. loading chesscog after fork.
+# Per-render limits are REGION_RENDER_TIMEOUT in app.py.
+timeout = int(os.environ.get('WEB_TIMEOUT', 300))
+# Shutdown: in-flight requests first, then background jobs drain in worker_exit
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 120))
+keepalive = 5
+
+# Recycle workers now and then to cap fragmentation from large page buffers
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+# Per-process resources are sized for one process per core unless set:
+# page detection threads split the cores, page caches split the memory
+_detection_workers = max(1, _cores // workers)
+os.environ.setdefault('DETECTION_WORKERS', str(_detection_workers))
+if _detection_workers == 1:
+    os.environ.setdefault('DETECTION_MODE', 'serial')
+os.environ.setdefault('PDF_CACHE_MAX_BYTES', str(1024 * 1024 * 1024 // workers))
+# chesscog and the warm-up are left to post_fork, not done on import of wsgi.py
+os.environ.setdefault('MODEL_INIT_POST_FORK', '1')
+# Job drain must end before the master's graceful timeout kills the worker
+os.environ.setdefault('SHUTDOWN_DRAIN_SECONDS', str(max(graceful_timeout - 20, 0)))
+
+# Workers record metrics into shared files so /metrics on any worker covers
+# all of them. Start from an empty directory: this file is read by the
+# master before the app is imported.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'chess_vision_metrics'))
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def post_fork(server, worker):
+    # chesscog (torch) and the warm-up inference are not fork-safe
+    from app import init_models
+    init_models()
+
+
+def worker_exit(server, worker):
+    from app import shutdown_service
+    shutdown_service()
+
+
+def child_exit(server, worker):
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -0,0 +1,327 @@
+"""
+Background job queue for long-running whole-book detection.
+A job is submitted with a runner function and executed on a small worker
+pool; the runner reports progress and partial results through the Job
+object and checks job.cancelled between units of work.
+
+With a state directory, job state is also written there as JSON snapshots
+so every process of a preforking server (gunicorn workers) can report on and
+cancel jobs another process runs; cancellation crosses processes as a marker
+file the owning runner notices at its next check.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+SNAPSHOT_INTERVAL = 1.0  # Seconds between progress snapshots of a running job
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobCancelled(Exception):
+    """Raised by a runner to stop a job that was cancelled mid-way"""
+
+
+class Job:
+    """State of one background job; mutated only by its runner and the manager"""
+
+    def __init__(self, total: int = 0, metadata: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.total = total
+        self.done = 0
+        self.metadata = metadata or {}
+        self.partial_results = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._cancel_marker = None
+        self._on_progress = None
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_snapshot(cls, info: Dict[str, Any]) -> 'Job':
+        """Rebuild a read-only view of a job from to_dict(include_results=True)"""
+        standard = ('job_id', 'status', 'progress', 'created_at', 'started_at', 'finished_at',
+                    'error', 'partial_results', 'result', 'owner_pid')
+        job = cls(info['progress']['total'], {k: v for k, v in info.items() if k not in standard})
+        job.id = info['job_id']
+        job.status = info['status']
+        job.done = info['progress']['done']
+        job.created_at = info['created_at']
+        job.started_at = info['started_at']
+        job.finished_at = info['finished_at']
+        job.error = info.get('error')
+        job.partial_results = info.get('partial_results', [])
+        job.result = info.get('result')
+        return job
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._cancel_event.is_set() and self._cancel_marker and os.path.exists(self._cancel_marker):
+            self._cancel_event.set()
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def add_progress(self, results=None, done: int = 1):
+        """Record finished units of work and their partial results"""
+        with self._lock:
+            self.done += done
+            if results:
+                self.partial_results.extend(results)
+        if self._on_progress is not None:
+            self._on_progress(self)
+
+    def to_dict(self, include_results: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            info = {
+                'job_id': self.id,
+                'status': self.status,
+                'progress': {
+                    'done': self.done,
+                    'total': self.total,
+                    'percent': round(100.0 * self.done / self.total, 1) if self.total else 0.0
+                },
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                **self.metadata
+            }
+            if self.error:
+                info['error'] = self.error
+            if include_results:
+                info['partial_results'] = list(self.partial_results)
+                info['result'] = self.result
+            return info
+
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and keeps finished jobs for a while"""
+
+    def __init__(self, workers: int, retention_seconds: float, max_jobs: int = 1000,
+                 state_dir: Optional[str] = None):
+        self.retention_seconds = retention_seconds
+        self.max_jobs = max_jobs
+        self.state_dir = state_dir
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    @property
+    def accepting(self) -> bool:
+        return not self._closed
+
+    def submit(self, runner: Callable[[Job], Any], total: int = 0,
+               metadata: Optional[Dict[str, Any]] = None,
+               on_finish: Optional[Callable[[Job], None]] = None) -> Job:
+        """
+        Queue runner(job). Its return value becomes job.result.
+        on_finish runs after the job ends in any state, e.g. to remove temp files.
+        """
+        if self._closed:
+            raise RuntimeError('Job manager is shutting down')
+        job = Job(total, metadata)
+        if self.state_dir:
+            job._cancel_marker = self._state_path(job.id, '.cancel')
+            job._on_progress = self._save_throttled
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._save(job)
+        self._executor.submit(self._run, job, runner, on_finish)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """A job of this process, else the latest snapshot of another process's job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None else self._load(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Request cancellation; queued jobs never start, running jobs stop at the next check"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            job = self._load(job_id)
+            if job is not None and job.status not in FINISHED_STATES:
+                # Owned by another process: leave a marker for its runner
+                open(self._state_path(job_id, '.cancel'), 'a').close()
+            return job
+        job._cancel_event.set()
+        with job._lock:
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        self._save(job)
+        return job
+
+    def drain(self, timeout: float):
+        """
+        Graceful shutdown: stop accepting jobs, give queued and running ones
+        up to timeout seconds to finish, then cancel what is left (partial
+        results stay in the snapshots) and wait for the runners to stop.
+        """
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and self._unfinished():
+            time.sleep(0.2)
+        remaining = self._unfinished()
+        if remaining:
+            logger.warning(f"Cancelling {len(remaining)} unfinished job(s) at shutdown")
+        for job in remaining:
+            self.cancel(job.id)
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job: Job, runner: Callable[[Job], Any], on_finish):
+        try:
+            with job._lock:
+                if job.status == CANCELLED or job.cancelled:
+                    job.status = CANCELLED
+                    return
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            result = runner(job)
+
+            with job._lock:
+                job.result = result
+                job.status = CANCELLED if job.cancelled else COMPLETED
+        except JobCancelled:
+            with job._lock:
+                job.status = CANCELLED
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            with job._lock:
+                job.status = FAILED
+                job.error = str(e)
+        finally:
+            with job._lock:
+                job.finished_at = job.finished_at or time.time()
+            self._save(job)
+            if job._cancel_marker and os.path.exists(job._cancel_marker):
+                os.remove(job._cancel_marker)
+            if on_finish is not None:
+                try:
+                    on_finish(job)
+                except Exception as e:
+                    logger.warning(f"Job {job.id} cleanup failed: {str(e)}")
+
+    def _prune(self):
+        """Drop finished jobs past their retention time, oldest first beyond max_jobs"""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.status in FINISHED_STATES and job.finished_at and now - job.finished_at > self.retention_seconds:
+                del self._jobs[job_id]
+                self._remove_snapshot(job_id)
+
+        finished = sorted(
+            (job for job in self._jobs.values() if job.status in FINISHED_STATES),
+            key=lambda job: job.finished_at or 0
+        )
+        while len(self._jobs) >= self.max_jobs and finished:
+            job_id = finished.pop(0).id
+            del self._jobs[job_id]
+            self._remove_snapshot(job_id)
+
+    def _unfinished(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if job.status not in FINISHED_STATES]
+
+    def _state_path(self, job_id: str, suffix: str = '.json') -> str:
+        return os.path.join(self.state_dir, job_id + suffix)
+
+    def _save(self, job: Job):
+        """Write the job's snapshot atomically so other processes never read a partial file"""
+        if not self.state_dir:
+            return
+        info = job.to_dict(include_results=True)
+        info['owner_pid'] = os.getpid()
+        job._saved_at = time.monotonic()
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(info, f)
+            os.replace(tmp_path, self._state_path(job.id))
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not save snapshot of job {job.id}: {str(e)}")
+
+    def _save_throttled(self, job: Job):
+        if time.monotonic() - job._saved_at >= SNAPSHOT_INTERVAL:
+            self._save(job)
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        if not self.state_dir or not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._state_path(job_id)) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        job = Job.from_snapshot(info)
+        if job.status in FINISHED_STATES:
+            if job.finished_at and time.time() - job.finished_at > self.retention_seconds:
+                self._remove_snapshot(job_id)
+                return None
+        elif not _process_alive(info.get('owner_pid')):
+            # The owning worker was killed before it could finish or drain
+            job.status = FAILED
+            job.error = 'Worker process exited before the job finished'
+        return job
+
+    def _remove_snapshot(self, job_id: str):
+        if not self.state_dir:
+            return
+        for suffix in ('.json', '.cancel'):
+            try:
+                os.remove(self._state_path(job_id, suffix))
+            except OSError:
+                pass
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,140 @@
+"""
+Prometheus metrics for capacity planning, served as text on /metrics:
+- per-stage latency histograms (page and region rasterization, contour
+  detection, cropping, FEN recognition)
+- which recognition engine answered each board
+- page and diagram throughput
+- cache lookups, hit ratios, entries and resident bytes
+
+Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(set up by gunicorn.conf.py) and a scrape of any worker aggregates them all;
+the development server uses the in-process registry.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Stages run from ~1 ms (a crop from a stored page) to seconds (a window of pages)
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGES = ('rasterize_page', 'rasterize_region', 'detect', 'crop', 'recognize')
+ENGINES = ('chesscog', 'square_classifier', 'mock', 'basic', 'error')
+# In-memory caches are re-read at most this often outside of scrapes
+CACHE_REFRESH_SECONDS = 1.0
+
+STAGE_SECONDS = Histogram(
+    'chess_vision_stage_seconds', 'Time spent in one pipeline stage per page or board',
+    ['stage'], buckets=STAGE_BUCKETS
+)
+RECOGNITIONS = Counter(
+    'chess_vision_recognitions_total', 'Boards recognized, by the engine that produced the FEN', ['engine']
+)
+PAGES_RENDERED = Counter('chess_vision_pages_rendered_total', 'PDF pages rasterized for detection')
+PAGES_DETECTED = Counter('chess_vision_pages_detected_total', 'Pages run through board detection')
+DIAGRAMS_DETECTED = Counter('chess_vision_diagrams_detected_total', 'Chess diagrams found by detection')
+
+# Cache figures are per process; live workers are summed, hit ratios kept per worker
+CACHE_LOOKUPS = Gauge(
+    'chess_vision_cache_lookups', 'Cache lookups since the process started',
+    ['cache', 'result'], multiprocess_mode='livesum'
+)
+CACHE_HIT_RATIO = Gauge(
+    'chess_vision_cache_hit_ratio', 'Hits / lookups since the process started',
+    ['cache'], multiprocess_mode='liveall'
+)
+CACHE_ENTRIES = Gauge('chess_vision_cache_entries', 'Entries held', ['cache'], multiprocess_mode='livesum')
+CACHE_RESIDENT_BYTES = Gauge(
+    'chess_vision_cache_resident_bytes', 'Memory held by cached data', ['cache'], multiprocess_mode='livesum'
+)
+# The page store is one directory shared by all workers
+PAGE_STORE_BYTES = Gauge('chess_vision_page_store_bytes', 'Disk used by the page store', multiprocess_mode='max')
+PAGE_STORE_PAGES = Gauge('chess_vision_page_store_pages', 'Pages in the page store', multiprocess_mode='max')
+
+for _stage in STAGES:
+    STAGE_SECONDS.labels(_stage)
+for _engine in ENGINES:
+    RECOGNITIONS.labels(_engine)
+
+_refresh_lock = threading.Lock()
+_refreshed_at = 0.0
+
+
+def stage_timer(stage: str):
+    """Context manager or decorator observing the duration of one stage"""
+    return STAGE_SECONDS.labels(stage).time()
+
+
+def observe_stage(stage: str, seconds: float, count: int = 1):
+    """Record seconds spent on count items, e.g. a batch of boards, as count samples"""
+    if count > 0:
+        histogram = STAGE_SECONDS.labels(stage)
+        for _ in range(count):
+            histogram.observe(seconds / count)
+
+
+def count_recognition(engine: str, boards: int = 1):
+    RECOGNITIONS.labels(engine).inc(boards)
+
+
+def count_rendered(pages: int):
+    PAGES_RENDERED.inc(pages)
+
+
+def count_detection(diagrams: int):
+    PAGES_DETECTED.inc()
+    DIAGRAMS_DETECTED.inc(diagrams)
+
+
+def update_cache_metrics(caches: Dict[str, Dict[str, Any]], force: bool = False):
+    """
+    Copy stats() of the in-memory caches into gauges. Called after requests
+    (throttled to CACHE_REFRESH_SECONDS) and on every scrape.
+    """
+    global _refreshed_at
+    now = time.monotonic()
+    with _refresh_lock:
+        if not force and now - _refreshed_at < CACHE_REFRESH_SECONDS:
+            return
+        _refreshed_at = now
+
+    for name, stats in caches.items():
+        CACHE_LOOKUPS.labels(name, 'hit').set(stats.get('hits', 0))
+        CACHE_LOOKUPS.labels(name, 'miss').set(stats.get('misses', 0))
+        CACHE_HIT_RATIO.labels(name).set(stats.get('hit_ratio', 0.0))
+        CACHE_ENTRIES.labels(name).set(stats.get('entries', 0))
+        if 'resident_bytes' in stats:
+            CACHE_RESIDENT_BYTES.labels(name).set(stats['resident_bytes'])
+
+
+def update_page_store_metrics(stats: Dict[str, Any]):
+    PAGE_STORE_BYTES.set(stats['disk_bytes'])
+    PAGE_STORE_PAGES.set(stats['pages'])
+
+
+def render() -> bytes:
+    """Exposition text for all workers when running multi-process, else this process"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead(pid: int):
+    """Drop a dead worker's live gauges; its counters and histograms are kept"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,158 @@
+"""
+In-memory cache for rendered PDF pages.
+Entries are bounded by an approximate byte budget (least recently used
+entries are evicted first) and expire after a fixed time-to-live. Entries
+are also kept in insertion order, so expiry only looks at the oldest ones.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate resident size in bytes of a cached value"""
+    if value is None:
+        return 0
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    # Compressed pages (page_codec.CompressedPage) report their compressed size
+    if hasattr(value, 'nbytes') and hasattr(value, 'codec'):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_size(item) for item in value.values())
+    # PIL images: width * height * bytes per pixel
+    if hasattr(value, 'size') and hasattr(value, 'getbands'):
+        width, height = value.size
+        return width * height * len(value.getbands())
+    return 0
+
+
+class PageCache:
+    """Thread-safe LRU cache with a byte budget and TTL expiry"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        # Keys by creation time, oldest first (a re-put moves a key to the end)
+        self._by_age = OrderedDict()
+        self._lock = threading.RLock()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        """Membership check that neither refreshes recency nor counts a lookup"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._is_expired(entry)
+
+    def get(self, key: Hashable, count: bool = True) -> Optional[Any]:
+        """Return the cached value for key and mark it as recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry):
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry['value']
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None):
+        """
+        Store a value, then evict expired and least recently used entries
+        until the cache is back under its byte budget. The entry being
+        stored is never evicted by its own insertion.
+        """
+        if size is None:
+            size = estimate_size(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = {
+                'value': value,
+                'size': size,
+                'created': time.monotonic()
+            }
+            self._by_age[key] = None
+            self.resident_bytes += size
+
+            self._expire()
+            while self.resident_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest_key = next(iter(self._entries))
+                if oldest_key == key:
+                    break
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._remove(key)
+            return entry['value'] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_age.clear()
+            self.resident_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire()
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'resident_bytes': self.resident_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def _is_expired(self, entry) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - entry['created'] > self.ttl_seconds
+
+    def _expire(self):
+        """Drop expired entries, stopping at the first one still alive"""
+        if self.ttl_seconds <= 0:
+            return
+        while self._by_age:
+            oldest_key = next(iter(self._by_age))
+            if not self._is_expired(self._entries[oldest_key]):
+                break
+            self._remove(oldest_key)
+            self.expirations += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._by_age.pop(key, None)
+            self.resident_bytes -= entry['size']
+        return entry
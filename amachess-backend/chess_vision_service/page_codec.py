@@ -0,0 +1,120 @@
+"""
+Lossless in-memory compression for cached page rasters.
+Book pages are mostly white, so a grayscale page compresses several times
+over. A page is cut into horizontal bands of band_rows rows and every band
+is compressed on its own, so a crop only decodes the bands it overlaps:
+
+    page = CompressedPage.encode(array, 'zstd')
+    crop = page[y:y + height, x:x + width]  # decodes the overlapping bands
+    full = page.decode()                    # for detection
+
+Codecs: 'png' (OpenCV), 'zlib' (standard library) and 'zstd' (needs the
+optional zstandard package).
+"""
+
+import zlib
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+CODECS = ('png', 'zlib', 'zstd')
+DEFAULT_BAND_ROWS = 128
+# Fast levels: pages are compressed on the request path
+PNG_COMPRESSION = 1
+ZLIB_LEVEL = 1
+ZSTD_LEVEL = 3
+
+
+def available_codecs() -> List[str]:
+    return [codec for codec in CODECS if codec != 'zstd' or ZSTD_AVAILABLE]
+
+
+def _compress(band: np.ndarray, codec: str) -> bytes:
+    if codec == 'png':
+        ok, encoded = cv2.imencode('.png', band, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION])
+        if not ok:
+            raise RuntimeError('PNG encoding failed')
+        return encoded.tobytes()
+    if codec == 'zlib':
+        return zlib.compress(np.ascontiguousarray(band).data, ZLIB_LEVEL)
+    # zstd contexts are not thread-safe, so each call makes its own (cheap)
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(np.ascontiguousarray(band).data)
+
+
+def _decompress(data: bytes, codec: str, shape: Tuple[int, ...]) -> np.ndarray:
+    if codec == 'png':
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED).reshape(shape)
+    if codec == 'zlib':
+        raw = zlib.decompress(data)
+    else:
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    return np.frombuffer(raw, dtype=np.uint8).reshape(shape)
+
+
+class CompressedPage:
+    """A uint8 page raster held as independently compressed row bands"""
+
+    def __init__(self, shape: Tuple[int, ...], codec: str, band_rows: int, bands: List[bytes]):
+        self.shape = shape
+        self.codec = codec
+        self.band_rows = band_rows
+        self.bands = bands
+        self.dtype = np.dtype(np.uint8)
+        # What the cache budget counts: the compressed size
+        self.nbytes = sum(len(band) for band in bands)
+
+    @classmethod
+    def encode(cls, array: np.ndarray, codec: str, band_rows: int = DEFAULT_BAND_ROWS) -> 'CompressedPage':
+        if codec not in available_codecs():
+            raise ValueError(f'Unsupported page codec: {codec}')
+        array = np.asarray(array, dtype=np.uint8)
+        bands = [_compress(array[top:top + band_rows], codec) for top in range(0, array.shape[0], band_rows)]
+        return cls(array.shape, codec, band_rows, bands)
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def rows(self, top: int, bottom: int) -> np.ndarray:
+        """Rows top..bottom-1, decoding only the bands they fall in"""
+        top, bottom = max(0, top), min(self.shape[0], bottom)
+        if bottom <= top:
+            return np.empty((0,) + tuple(self.shape[1:]), dtype=np.uint8)
+        first, last = top // self.band_rows, (bottom - 1) // self.band_rows
+        decoded = [self._band(index) for index in range(first, last + 1)]
+        block = decoded[0] if len(decoded) == 1 else np.concatenate(decoded)
+        offset = first * self.band_rows
+        return block[top - offset:bottom - offset]
+
+    def decode(self) -> np.ndarray:
+        return self.rows(0, self.shape[0])
+
+    def __getitem__(self, key):
+        """page[rows, cols] decodes only the bands of the row slice"""
+        rows, rest = (key[0], key[1:]) if isinstance(key, tuple) else (key, ())
+        if not isinstance(rows, slice) or rows.step not in (None, 1):
+            return self.decode()[key]
+        top, bottom, _ = rows.indices(self.shape[0])
+        return self.rows(top, bottom)[(slice(None),) + rest]
+
+    def ratio(self) -> float:
+        """Raw size over compressed size"""
+        return int(np.prod(self.shape)) / self.nbytes if self.nbytes else 0.0
+
+    def _band(self, index: int) -> np.ndarray:
+        top = index * self.band_rows
+        height = min(self.band_rows, self.shape[0] - top)
+        return _decompress(self.bands[index], self.codec, (height,) + tuple(self.shape[1:]))
+
+
+def decode_page(page) -> np.ndarray:
+    """Full raster of a cached page, compressed or not"""
+    return page.decode() if isinstance(page, CompressedPage) else page
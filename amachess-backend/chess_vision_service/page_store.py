@@ -0,0 +1,302 @@
+"""
+Persistent on-disk store for rendered PDF pages.
+Pages are kept as raw uint8 rasters in .npy files under CACHE_FOLDER so they
+can be memory-mapped back without decoding and survive service restarts:
+
+    <root>/<pdf_hash>/manifest.json
+    <root>/<pdf_hash>/source.pdf
+    <root>/<pdf_hash>/dpi<dpi>/page_<page>.npy
+
+The source PDF is kept so regions can be re-rendered at other resolutions,
+and so a book can be detected again by its hash without another upload.
+Detection results are recorded in the manifest per detection DPI, with the
+fingerprint of the detector that produced them.
+
+Disk usage is counted per book from one scan at startup and kept up to
+date on every write and delete, so stats() never walks the tree. Other
+worker processes write to the same root, so the counts are refreshed by a
+rescan every rescan_seconds. With max_bytes set, the least recently used
+books are deleted whole once the store grows past it. Manifest updates take
+an fcntl lock on the book so concurrent workers don't lose each other's
+changes (where fcntl is unavailable only threads are serialized).
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = 'manifest.lock'
+SOURCE_NAME = 'source.pdf'
+# A book's last use (its directory mtime) is refreshed at most this often per process
+TOUCH_INTERVAL_SECONDS = 60
+
+
+class PageStore:
+    """Memory-mapped page rasters keyed by (pdf_hash, dpi, page)"""
+
+    def __init__(self, root: str, max_bytes: int = 0, rescan_seconds: float = 300):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.rescan_seconds = rescan_seconds
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._usage_lock = threading.Lock()
+        # pdf_hash -> {'bytes': ..., 'pages': ...} of stored pages and sources
+        self._usage: Dict[str, Dict[str, int]] = {}
+        self._scanned_at = 0.0
+        self._touched: Dict[str, float] = {}
+        os.makedirs(root, exist_ok=True)
+        self._rescan()
+
+    def _book_dir(self, pdf_hash: str) -> str:
+        return os.path.join(self.root, pdf_hash)
+
+    def _page_path(self, pdf_hash: str, dpi: int, page: int) -> str:
+        return os.path.join(self._book_dir(pdf_hash), f'dpi{dpi}', f'page_{page}.npy')
+
+    def has_page(self, pdf_hash: str, dpi: int, page: int) -> bool:
+        return os.path.exists(self._page_path(pdf_hash, dpi, page))
+
+    def load_page(self, pdf_hash: str, dpi: int, page: int) -> Optional[np.ndarray]:
+        """Return a read-only memory-mapped page raster, or None if not stored"""
+        path = self._page_path(pdf_hash, dpi, page)
+        try:
+            page_raster = np.load(path, mmap_mode='r')
+            self._touch(pdf_hash)
+            return page_raster
+        except FileNotFoundError:
+            return None
+        except (ValueError, OSError) as e:
+            logger.warning(f"Discarding unreadable page file {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def save_page(self, pdf_hash: str, dpi: int, page: int, image: Any):
+        """Persist a rendered page (PIL image or array) as a uint8 raster"""
+        array = np.asarray(image, dtype=np.uint8)
+        path = self._page_path(pdf_hash, dpi, page)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file first so readers never see a partial page
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array)
+            replaced = _file_size(path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._account(pdf_hash, _file_size(path) - (replaced or 0), 0 if replaced is not None else 1)
+
+        page_info = {'shape': list(array.shape), 'dtype': str(array.dtype)}
+        self._update_manifest(
+            pdf_hash,
+            lambda manifest: manifest['pages'].setdefault(str(dpi), {}).update({str(page): page_info})
+        )
+        self._enforce_budget(keep=pdf_hash)
+
+    def save_source(self, pdf_hash: str, pdf_path: str, page_count: Optional[int] = None):
+        """Keep a copy of the source PDF (once per book) and record its page count"""
+        path = os.path.join(self._book_dir(pdf_hash), SOURCE_NAME)
+        if not os.path.exists(path):
+            os.makedirs(self._book_dir(pdf_hash), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._book_dir(pdf_hash), suffix='.tmp')
+            os.close(fd)
+            try:
+                shutil.copyfile(pdf_path, tmp_path)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._account(pdf_hash, _file_size(path) or 0, 0)
+
+        if page_count is not None:
+            self._update_manifest(pdf_hash, lambda manifest: manifest.update(page_count=page_count))
+        self._enforce_budget(keep=pdf_hash)
+
+    def save_detections(self, pdf_hash: str, dpi: int, boxes_by_page: Dict[int, List[Dict[str, Any]]],
+                        detector: str):
+        """
+        Record the bounding boxes found on some pages of a book (one manifest
+        write). Results of another detector (fingerprint) at this DPI are dropped.
+        """
+        if not boxes_by_page:
+            return
+
+        def update(manifest):
+            detections = manifest.setdefault('detections', {})
+            entry = detections.get(str(dpi))
+            if not isinstance(entry, dict) or entry.get('detector') != detector:
+                entry = detections[str(dpi)] = {'detector': detector, 'pages': {}}
+            entry['pages'].update({str(page): boxes for page, boxes in boxes_by_page.items()})
+
+        self._update_manifest(pdf_hash, update)
+
+    def load_detections(self, pdf_hash: str, dpi: int, detector: str) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Bounding boxes recorded per page for a detection DPI by this detector;
+        pages never detected, or detected by another detector, are absent
+        """
+        entry = ((self.manifest(pdf_hash) or {}).get('detections') or {}).get(str(dpi))
+        if not isinstance(entry, dict) or entry.get('detector') != detector:
+            return {}
+        return {int(page): boxes for page, boxes in entry.get('pages', {}).items()}
+
+    def source_path(self, pdf_hash: str) -> Optional[str]:
+        path = os.path.join(self._book_dir(pdf_hash), SOURCE_NAME)
+        if not os.path.exists(path):
+            return None
+        self._touch(pdf_hash)
+        return path
+
+    def manifest(self, pdf_hash: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._book_dir(pdf_hash), MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def delete(self, pdf_hash: str):
+        shutil.rmtree(self._book_dir(pdf_hash), ignore_errors=True)
+        with self._usage_lock:
+            self._usage.pop(pdf_hash, None)
+            self._touched.pop(pdf_hash, None)
+
+    def stats(self) -> Dict[str, Any]:
+        if time.monotonic() - self._scanned_at > self.rescan_seconds:
+            self._rescan()
+        with self._usage_lock:
+            return {
+                'books': len(self._usage),
+                'pages': sum(usage['pages'] for usage in self._usage.values()),
+                'disk_bytes': sum(usage['bytes'] for usage in self._usage.values()),
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
+
+    def _update_manifest(self, pdf_hash: str, update):
+        """Apply update(manifest) and rewrite the manifest atomically"""
+        with self._manifest_lock(pdf_hash):
+            manifest = self.manifest(pdf_hash) or {
+                'pdf_hash': pdf_hash,
+                'created': time.time(),
+                'pages': {}
+            }
+            update(manifest)
+            manifest['updated'] = time.time()
+
+            path = os.path.join(self._book_dir(pdf_hash), MANIFEST_NAME)
+            fd, tmp_path = tempfile.mkstemp(dir=self._book_dir(pdf_hash), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, path)
+
+    @contextmanager
+    def _manifest_lock(self, pdf_hash: str):
+        """Hold the book's manifest against other threads and other processes"""
+        with self._lock:
+            os.makedirs(self._book_dir(pdf_hash), exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self._book_dir(pdf_hash), LOCK_NAME), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _account(self, pdf_hash: str, size_delta: int, page_delta: int):
+        with self._usage_lock:
+            usage = self._usage.setdefault(pdf_hash, {'bytes': 0, 'pages': 0})
+            usage['bytes'] += size_delta
+            usage['pages'] += page_delta
+
+    def _touch(self, pdf_hash: str):
+        """Mark a book as recently used; eviction goes by book directory mtime"""
+        now = time.monotonic()
+        if now - self._touched.get(pdf_hash, float('-inf')) < TOUCH_INTERVAL_SECONDS:
+            return
+        self._touched[pdf_hash] = now
+        try:
+            os.utime(self._book_dir(pdf_hash))
+        except OSError:
+            pass
+
+    def _rescan(self):
+        """Recount every book from disk, picking up other processes' writes and deletions"""
+        usage = {}
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            book = {'bytes': 0, 'pages': 0}
+            for dirpath, _, filenames in os.walk(entry.path):
+                for filename in filenames:
+                    if filename.endswith('.npy'):
+                        book['pages'] += 1
+                    elif filename != SOURCE_NAME:
+                        continue
+                    book['bytes'] += _file_size(os.path.join(dirpath, filename)) or 0
+            usage[entry.name] = book
+        with self._usage_lock:
+            self._usage = usage
+            self._scanned_at = time.monotonic()
+
+    def _enforce_budget(self, keep: str):
+        """Delete least recently used books, never keep, until the store fits max_bytes"""
+        if self.max_bytes <= 0:
+            return
+        with self._usage_lock:
+            total = sum(usage['bytes'] for usage in self._usage.values())
+            if total <= self.max_bytes:
+                return
+            last_used = {}
+            for pdf_hash in self._usage:
+                if pdf_hash == keep:
+                    continue
+                try:
+                    last_used[pdf_hash] = os.stat(self._book_dir(pdf_hash)).st_mtime
+                except OSError:
+                    last_used[pdf_hash] = 0.0
+            victims = []
+            for pdf_hash in sorted(last_used, key=last_used.get):
+                if total <= self.max_bytes:
+                    break
+                total -= self._usage.pop(pdf_hash)['bytes']
+                self._touched.pop(pdf_hash, None)
+                victims.append(pdf_hash)
+            self.evictions += len(victims)
+
+        for pdf_hash in victims:
+            logger.info(f"Page store over {self.max_bytes} bytes, evicting book {pdf_hash[:8]}")
+            shutil.rmtree(self._book_dir(pdf_hash), ignore_errors=True)
+
+
+def _file_size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
@@ -0,0 +1,262 @@
+"""
+Lightweight CPU recognizer for printed book diagrams.
+A board crop is warped to a square and split into 64 cells; all cells are
+matched against rendered piece glyph templates with a single matrix
+product (normalized cross-correlation nearest neighbour) and the best
+matches are turned into a legal FEN with python-chess. No model weights,
+no torch: a board takes a few milliseconds.
+"""
+
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import chess
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from glyph_cache import GlyphCache, perceptual_hash
+
+# Side of one normalized square in pixels
+CELL_SIZE = 32
+# Pixels dropped around each square so grid lines and the frame don't count
+CELL_MARGIN = CELL_SIZE // 8
+# Squares flatter than this (std of gray levels after smoothing) are empty
+EMPTY_STD = 14.0
+# Occupied squares whose best template correlation is below this are empty too
+MIN_MATCH = 0.45
+
+PIECE_SYMBOLS = 'KQRBNPkqrbnp'
+# Unicode chess glyphs: U+2654..2659 are the outlined (white) pieces and
+# U+265A..265F the filled (black) ones, in the order K Q R B N P
+_OUTLINE_GLYPHS = dict(zip('KQRBNP', '\u2654\u2655\u2656\u2657\u2658\u2659'))
+_FILLED_GLYPHS = dict(zip('KQRBNP', '\u265a\u265b\u265c\u265d\u265e\u265f'))
+
+# Square tones the templates are rendered on: white squares, hatched dark
+# squares once smoothed, and solid grey dark squares
+TEMPLATE_BACKGROUNDS = (255, 205, 160)
+# Glyph height as a share of the square
+TEMPLATE_SCALES = (0.8, 0.92)
+
+# Fonts with the chess glyphs, tried in order after CHESS_FONT_PATH
+FONT_CANDIDATES = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/Library/Fonts/DejaVuSans.ttf',
+    'C:\\Windows\\Fonts\\seguisym.ttf',
+)
+
+
+def find_chess_font(font_path: Optional[str] = None) -> Optional[str]:
+    """Locate a TrueType font that has the Unicode chess glyphs"""
+    candidates = [font_path, os.environ.get('CHESS_FONT_PATH'), *FONT_CANDIDATES]
+    try:
+        # matplotlib (a chesscog dependency) bundles DejaVu Sans
+        import matplotlib
+        candidates.append(os.path.join(os.path.dirname(matplotlib.__file__),
+                                       'mpl-data', 'fonts', 'ttf', 'DejaVuSans.ttf'))
+    except ImportError:
+        pass
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def _prepare_cells(cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Drop the margins of smoothed (N, S, S) squares and return
+    (zero-mean unit-norm feature rows, per-square std)
+    """
+    inner = cells.astype(np.float32)[:, CELL_MARGIN:-CELL_MARGIN, CELL_MARGIN:-CELL_MARGIN].reshape(len(cells), -1)
+    inner = inner - inner.mean(axis=1, keepdims=True)
+    std = np.sqrt((inner ** 2).mean(axis=1))
+    features = inner / (np.linalg.norm(inner, axis=1, keepdims=True) + 1e-6)
+    return features, std
+
+
+def render_glyph_templates(font_path: str, cell_size: int = CELL_SIZE) -> np.ndarray:
+    """
+    Render every piece on every template background and scale, smoothed
+    like board squares. Returns (12, variants, S, S) uint8 in PIECE_SYMBOLS order.
+    """
+    supersample = 4
+    side = cell_size * supersample
+    templates = []
+    for symbol in PIECE_SYMBOLS:
+        variants = []
+        for scale in TEMPLATE_SCALES:
+            font = ImageFont.truetype(font_path, int(side * scale))
+            for background in TEMPLATE_BACKGROUNDS:
+                image = Image.new('L', (side, side), background)
+                draw = ImageDraw.Draw(image)
+                filled = _FILLED_GLYPHS[symbol.upper()]
+                left, top, right, bottom = draw.textbbox((0, 0), filled, font=font)
+                origin = ((side - (right - left)) / 2 - left, (side - (bottom - top)) / 2 - top)
+                if symbol.isupper():
+                    # White piece: white body inside a black outline
+                    draw.text(origin, filled, font=font, fill=255)
+                    draw.text(origin, _OUTLINE_GLYPHS[symbol], font=font, fill=0)
+                else:
+                    draw.text(origin, filled, font=font, fill=0)
+                cell = cv2.resize(np.asarray(image), (cell_size, cell_size), interpolation=cv2.INTER_AREA)
+                variants.append(cv2.GaussianBlur(cell, (3, 3), 0))
+        templates.append(variants)
+    return np.array(templates, dtype=np.uint8)
+
+
+def _order_corners(points: np.ndarray) -> np.ndarray:
+    """Top-left, top-right, bottom-right, bottom-left"""
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([points[np.argmin(sums)], points[np.argmin(diffs)],
+                     points[np.argmax(sums)], points[np.argmax(diffs)]], dtype=np.float32)
+
+
+def board_cells(image, cell_size: int = CELL_SIZE) -> np.ndarray:
+    """
+    Warp a board crop (PIL image or array) onto an 8x8 grid of
+    cell_size squares, smooth it and return the squares as (64, S, S)
+    uint8, a8 first, rank by rank down to h1.
+    """
+    array = np.asarray(image)
+    gray = cv2.cvtColor(array, cv2.COLOR_RGB2GRAY) if array.ndim == 3 else array
+    height, width = gray.shape
+    side = 8 * cell_size
+
+    # Straighten the board along its outer frame when one is visible;
+    # otherwise the detection box is taken to be the board
+    corners = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if contours:
+        frame = max(contours, key=cv2.contourArea)
+        quad = cv2.approxPolyDP(frame, 0.02 * cv2.arcLength(frame, True), True)
+        if len(quad) == 4 and cv2.contourArea(quad) > 0.5 * width * height:
+            corners = _order_corners(quad.reshape(4, 2).astype(np.float32))
+
+    # Shrink with area averaging first (keeps hatching from aliasing), then
+    # warp at the final size, which is much cheaper than warping full size
+    scale = side / min(height, width)
+    small = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                       interpolation=cv2.INTER_AREA)
+    target = np.array([[0, 0], [side - 1, 0], [side - 1, side - 1], [0, side - 1]], dtype=np.float32)
+    board = cv2.warpPerspective(small, cv2.getPerspectiveTransform(corners * scale, target), (side, side),
+                                borderMode=cv2.BORDER_REPLICATE)
+    board = cv2.GaussianBlur(board, (3, 3), 0)
+
+    # (8*S, 8*S) -> (8 ranks, 8 files, S, S) -> (64, S, S)
+    return board.reshape(8, cell_size, 8, cell_size).swapaxes(1, 2).reshape(64, cell_size, cell_size)
+
+
+class SquareClassifier:
+    """Nearest-neighbour square classifier over rendered glyph templates"""
+
+    def __init__(self, font_path: Optional[str] = None, cell_size: int = CELL_SIZE,
+                 glyph_cache: Optional[GlyphCache] = None):
+        font = find_chess_font(font_path)
+        if font is None:
+            raise RuntimeError('No font with chess glyphs found; set CHESS_FONT_PATH')
+        self.font_path = font
+        self.cell_size = cell_size
+        self.glyph_cache = glyph_cache
+        templates = render_glyph_templates(font, cell_size)
+        self.variants = templates.shape[1]
+        features, _ = _prepare_cells(templates.reshape(-1, cell_size, cell_size))
+        # (features, 12 * variants), piece-major
+        self._templates = features.T.copy()
+
+    def classify_cells(self, cells: np.ndarray, book: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score (N, S, S) squares against every piece in one pass.
+        With a book and a glyph cache, squares whose glyph was seen before in
+        that book reuse its scores and only new glyphs are matched.
+        Returns (piece scores (N, 12) in PIECE_SYMBOLS order, occupied mask (N,)).
+        """
+        features, std = _prepare_cells(cells)
+        scores = np.zeros((len(cells), len(PIECE_SYMBOLS)), dtype=np.float32)
+
+        # Flat squares are empty whatever they would match
+        inked = np.flatnonzero(std >= EMPTY_STD)
+        if self.glyph_cache is not None and book is not None and len(inked):
+            hashes = perceptual_hash(cells[inked])
+            cached = self.glyph_cache.get_many(book, hashes)
+            hit = np.array([value is not None for value in cached])
+            if hit.any():
+                scores[inked[hit]] = np.stack([value for value in cached if value is not None])
+            new_glyphs = 0
+            if not hit.all():
+                # Match each new glyph once, even if it repeats within the batch
+                pending = inked[~hit]
+                glyphs, first, inverse = np.unique(hashes[~hit], return_index=True, return_inverse=True)
+                glyph_scores = self._match(features[pending[first]])
+                scores[pending] = glyph_scores[inverse.ravel()]
+                self.glyph_cache.put_many(book, glyphs, glyph_scores)
+                new_glyphs = len(glyphs)
+            self.glyph_cache.record(book, hits=len(inked) - new_glyphs, misses=new_glyphs)
+        elif len(inked):
+            scores[inked] = self._match(features[inked])
+
+        occupied = (std >= EMPTY_STD) & (scores.max(axis=1) >= MIN_MATCH)
+        return scores, occupied
+
+    def _match(self, features: np.ndarray) -> np.ndarray:
+        """Best template correlation per piece for (N, F) feature rows"""
+        similarity = features @ self._templates
+        return similarity.reshape(len(features), len(PIECE_SYMBOLS), self.variants).max(axis=2)
+
+    def predict(self, image, book: Optional[str] = None) -> Tuple[str, float]:
+        return self.predict_batch([image], book)[0]
+
+    def predict_batch(self, images: Sequence, book: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Recognize several board crops; all squares are classified together"""
+        if not images:
+            return []
+        cells = np.concatenate([board_cells(image, self.cell_size) for image in images])
+        scores, occupied = self.classify_cells(cells, book)
+        return [
+            build_position(scores[i * 64:(i + 1) * 64], occupied[i * 64:(i + 1) * 64])
+            for i in range(len(images))
+        ]
+
+
+def build_position(scores: np.ndarray, occupied: np.ndarray) -> Tuple[str, float]:
+    """
+    Turn per-square piece scores (64, 12) into a FEN and a confidence.
+    Impossible readings are repaired with the next best piece: pawns on the
+    first or last rank, and extra kings (the best scoring king is kept).
+    """
+    scores = scores.copy()
+    ranks = np.arange(64) // 8
+    pawn_columns = [PIECE_SYMBOLS.index('P'), PIECE_SYMBOLS.index('p')]
+    back_rank = (ranks == 0) | (ranks == 7)
+    scores[np.ix_(back_rank, pawn_columns)] = -np.inf
+
+    labels = scores.argmax(axis=1)
+    for king in (PIECE_SYMBOLS.index('K'), PIECE_SYMBOLS.index('k')):
+        squares = np.flatnonzero(occupied & (labels == king))
+        if len(squares) > 1:
+            extra = squares[np.argsort(-scores[squares, king])[1:]]
+            scores[extra, king] = -np.inf
+            labels[extra] = scores[extra].argmax(axis=1)
+
+    best = scores[np.arange(64), labels]
+    occupied = occupied & (best >= MIN_MATCH)
+
+    board = chess.Board(None)
+    for index in np.flatnonzero(occupied):
+        # Cells run a8..h8, a7..h7, ...; python-chess squares run a1..h1, a2..
+        square = chess.square(index % 8, 7 - index // 8)
+        board.set_piece_at(square, chess.Piece.from_symbol(PIECE_SYMBOLS[labels[index]]))
+
+    # Side to move is not printed; assume White unless Black is in check
+    board.turn = chess.WHITE
+    if board.was_into_check():
+        board.turn = chess.BLACK
+    board.set_castling_fen('KQkq')
+    board.castling_rights = board.clean_castling_rights()
+
+    confidence = float(best[occupied].mean()) if occupied.any() else 0.0
+    if not board.is_valid():
+        confidence *= 0.5
+    return board.fen(), round(min(confidence, 1.0), 2)
@@ -0,0 +1,26 @@
+"""
+Unit tests for the service's self-contained modules; they import the
+modules directly and need no running server (test_service.py and
+test_simple.py next to app.py are the live-server checks).
+
+    cd chess_vision_service && python -m pytest tests -q
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+@pytest.fixture(scope='session')
+def service(tmp_path_factory):
+    """The app module, imported from a scratch directory: it creates its folders in the working directory"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('service'))
+    try:
+        yield importlib.import_module('app')
+    finally:
+        os.chdir(cwd)
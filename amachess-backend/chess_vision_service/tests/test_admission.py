@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+import admission
+from admission import AdmissionController, AdmissionRejected, TokenBucketLimiter
+
+
+def wait_for_stat(controller, name, value, timeout=5):
+    """Poll controller.stats()[name] until it equals value; threads may take a while to start"""
+    deadline = time.monotonic() + timeout
+    while controller.stats()[name] != value and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return controller.stats()[name]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_burst_then_refill(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, 'monotonic', clock)
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+
+    for _ in range(3):
+        limiter.consume('client')
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.consume('client')
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after == 1
+
+    # Other clients have their own bucket
+    limiter.consume('other')
+
+    clock.now += 0.5
+    limiter.consume('client')
+    with pytest.raises(AdmissionRejected):
+        limiter.consume('client')
+
+    # Refill is capped at the burst size
+    clock.now += 100
+    for _ in range(3):
+        limiter.consume('client')
+    with pytest.raises(AdmissionRejected):
+        limiter.consume('client')
+    assert limiter.stats()['rejected'] == 3
+
+
+def test_token_bucket_prunes_refilled_clients(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, 'monotonic', clock)
+    limiter = TokenBucketLimiter(rate=1, burst=2, max_clients=2)
+    limiter.consume('a')
+    limiter.consume('b')
+    clock.now += 5
+    limiter.consume('c')
+    assert limiter.stats()['clients'] == 1
+
+
+def test_full_queue_rejects_immediately():
+    controller = AdmissionController('test', max_active=1, max_waiting=0, wait_timeout=5)
+    acquired_at = controller.acquire()
+
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire()
+    assert time.monotonic() - start < 1
+    assert rejected.value.status_code == 503
+    assert controller.stats()['rejected_queue_full'] == 1
+
+    controller.release(acquired_at)
+    with controller.slot():
+        assert controller.stats()['active'] == 1
+    assert controller.stats()['active'] == 0
+
+
+def test_queue_timeout():
+    controller = AdmissionController('test', max_active=1, max_waiting=1, wait_timeout=0.1)
+    controller.acquire()
+    with pytest.raises(AdmissionRejected):
+        controller.acquire()
+    stats = controller.stats()
+    assert stats['rejected_timeout'] == 1
+    assert stats['queue_depth'] == 0
+
+
+def test_waiter_gets_released_slot():
+    controller = AdmissionController('test', max_active=1, max_waiting=1, wait_timeout=5)
+    acquired_at = controller.acquire()
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(controller.acquire()))
+    waiter.start()
+    assert wait_for_stat(controller, 'queue_depth', 1) == 1
+
+    controller.release(acquired_at)
+    waiter.join(2)
+    assert admitted
+    assert controller.stats()['active'] == 1
+
+
+def test_background_wait_stays_outside_request_queue():
+    controller = AdmissionController('test', max_active=1, max_waiting=0, wait_timeout=0.1)
+    acquired_at = controller.acquire()
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(controller.acquire_background(poll_seconds=0.01)))
+    waiter.start()
+    assert wait_for_stat(controller, 'background_waiting', 1) == 1
+    assert controller.stats()['queue_depth'] == 0
+
+    controller.release(acquired_at)
+    waiter.join(2)
+    assert admitted
+    assert controller.stats()['active'] == 1
+
+
+def test_background_wait_can_be_interrupted():
+    controller = AdmissionController('test', max_active=1, max_waiting=0, wait_timeout=0.1)
+    controller.acquire()
+
+    class Stop(Exception):
+        pass
+
+    def interrupt():
+        raise Stop()
+
+    with pytest.raises(Stop):
+        controller.acquire_background(interrupt, poll_seconds=0.01)
+    assert controller.stats()['active'] == 1
+    assert controller.stats()['background_waiting'] == 0
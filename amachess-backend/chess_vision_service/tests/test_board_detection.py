@@ -0,0 +1,205 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+import cv2
+import numpy as np
+import pytest
+from PIL import ImageFont
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from board_detection import (  # noqa: E402
+    CONTOUR_TRACE_MAX_BLOBS, GRID_MIN_SCORE, component_board_candidates, count_blob_starts,
+    detect_chessboard_contours, detect_pages, find_board_candidates, grid_scores, traced_board_candidates
+)
+from bench_contour_filtering import threshold_page  # noqa: E402
+from square_classifier import find_chess_font  # noqa: E402
+from synthetic_books import (  # noqa: E402
+    COORDINATE_DPI, DIAGRAM_INCHES, DIAGRAM_STYLES, GLYPH_SCALE, draw_diagram, random_position, render_page
+)
+from synthetic_pages import draw_text, make_page, place_diagram  # noqa: E402
+
+FONT_PATH = find_chess_font()
+
+needs_font = pytest.mark.skipif(FONT_PATH is None, reason='no font with chess glyphs (set CHESS_FONT_PATH)')
+
+# Positions with many occupied light squares, where the centres of both
+# square colours are mostly piece and their medians nearly meet
+BUSY_POSITIONS = [
+    'r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R',  # Ruy Lopez, 3.Bb5
+    'r1bq1rk1/pp1nbppp/2p1pn2/3p2B1/2PP4/2NBPN2/PP3PPP/R2QK2R',  # Queen's Gambit Declined
+    'r1bqk2r/pp2bppp/2nppn2/8/3NP3/2N1B3/PPPQ1PPP/R3KB1R',  # Sicilian Scheveningen
+    chess.STARTING_BOARD_FEN
+]
+
+
+def book_page(board, style, dpi):
+    """An A4 page of text with one diagram at the left margin; returns (page, (x, y, side))"""
+    rng = np.random.default_rng(0)
+    margin = int(0.7 * dpi)
+    page = np.full((int(11.69 * dpi), int(8.27 * dpi)), 255, dtype=np.uint8)
+    draw_text(page, rng, margin, int(0.19 * dpi), max(2, int(0.08 * dpi)),
+              words=(dpi // 8, dpi // 2), gaps=(dpi // 15, dpi // 8))
+    side = 8 * int(DIAGRAM_INCHES * dpi / 8)
+    font = ImageFont.truetype(FONT_PATH, int(side / 8 * GLYPH_SCALE))
+    x, y = margin, margin + dpi // 2
+    place_diagram(page, x, y, draw_diagram(board, side // 8, font, style, rng), dpi // 8)
+    return page, (x, y, side)
+
+
+def whole(image):
+    return np.array([[0, 0, image.shape[1], image.shape[0]]])
+
+
+def matches(box, x, y, side, tolerance):
+    return (abs(box['x'] - x) <= tolerance and abs(box['y'] - y) <= tolerance and
+            abs(box['width'] - side) <= tolerance and abs(box['height'] - side) <= tolerance)
+
+
+@needs_font
+@pytest.mark.parametrize('dpi', [100, 150])
+@pytest.mark.parametrize('style', DIAGRAM_STYLES)
+@pytest.mark.parametrize('fen', BUSY_POSITIONS)
+def test_busy_positions_are_detected(fen, style, dpi):
+    page, (x, y, side) = book_page(chess.BaseBoard(fen), style, dpi)
+    boxes = detect_chessboard_contours(page)
+    assert any(matches(box, x, y, side, side // 10) for box in boxes), boxes
+
+
+@needs_font
+@pytest.mark.parametrize('style', DIAGRAM_STYLES)
+def test_random_positions_are_detected_in_every_style(style):
+    rng = np.random.default_rng(7)
+    for _ in range(4):
+        page, (x, y, side) = book_page(random_position(rng), style, 100)
+        boxes = detect_chessboard_contours(page)
+        assert len(boxes) == 1 and matches(boxes[0], x, y, side, side // 10), boxes
+
+
+@needs_font
+@pytest.mark.parametrize('noise', [0.0, 0.002])
+@pytest.mark.parametrize('dpi', [100, 150])
+def test_book_pages_recall(dpi, noise):
+    """Every diagram of a synthetic book page is found, and nothing else"""
+    scale = COORDINATE_DPI / dpi
+    for page_num in range(1, 4):
+        page, truth = render_page(page_num, 4, dpi, noise, seed=1)
+        boxes = detect_chessboard_contours(page)
+        assert len(boxes) == len(truth)
+        for diagram in truth:
+            assert any(matches(box, diagram['x'] / scale, diagram['y'] / scale, diagram['width'] / scale, 10)
+                       for box in boxes), (diagram, boxes)
+        confidences = [box['confidence'] for box in boxes]
+        assert confidences == sorted(confidences, reverse=True)
+
+
+@needs_font
+@pytest.mark.parametrize('style', DIAGRAM_STYLES)
+@pytest.mark.parametrize('fen', BUSY_POSITIONS)
+def test_busy_positions_score_well_above_threshold(fen, style):
+    font = ImageFont.truetype(FONT_PATH, int(32 * GLYPH_SCALE))
+    diagram = draw_diagram(chess.BaseBoard(fen), 32, font, style, np.random.default_rng(0))
+    assert grid_scores(diagram, whole(diagram))[0] >= GRID_MIN_SCORE + 0.25
+
+
+def test_text_and_tables_score_below_threshold():
+    rng = np.random.default_rng(0)
+    boxed_text = np.full((300, 300), 255, dtype=np.uint8)
+    draw_text(boxed_text, rng, 8, 18, 6, words=(10, 60), gaps=(4, 12))
+    boxed_text[:3] = boxed_text[-3:] = 0
+    boxed_text[:, :3] = boxed_text[:, -3:] = 0
+
+    # An 8x8 ruled table with text in its cells
+    table = np.full((320, 320), 255, dtype=np.uint8)
+    for line in np.linspace(0, 318, 9).astype(int):
+        table[line:line + 2] = 0
+        table[:, line:line + 2] = 0
+    draw_text(table, rng, 10, 14, 4, words=(5, 20), gaps=(5, 20))
+
+    for image in (boxed_text, table):
+        assert grid_scores(image, whole(image))[0] < GRID_MIN_SCORE
+
+
+def test_candidates_are_large_square_enclosures():
+    binary = np.zeros((600, 800), dtype=np.uint8)
+    cv2.rectangle(binary, (20, 20), (219, 219), 255, 3)  # a board frame
+    cv2.rectangle(binary, (60, 60), (179, 179), 255, 3)  # a square inside it
+    cv2.rectangle(binary, (300, 20), (699, 119), 255, 3)  # too wide
+    cv2.rectangle(binary, (300, 200), (349, 249), 255, 3)  # too small
+    binary[300:500, 500:504] = 255  # an L: square bounds but no enclosed area
+    binary[496:500, 500:700] = 255
+    cv2.rectangle(binary, (20, 300), (179, 539), 255, 3)  # 2:3, still accepted
+
+    for find in (traced_board_candidates, component_board_candidates, find_board_candidates):
+        rects = find(binary, 5000)
+        assert sorted(map(tuple, rects.tolist())) == [(18, 18, 204, 204), (18, 298, 164, 244)], find
+
+
+@pytest.mark.parametrize('noise', [0.0, 0.002, 0.02, 0.05])
+def test_traced_and_component_candidates_agree(noise):
+    for seed in range(3):
+        page, truth = make_page(noise=noise, seed=seed)
+        binary, min_area = threshold_page(page)
+        traced = traced_board_candidates(binary, min_area)
+        components = component_board_candidates(binary, min_area)
+        assert np.array_equal(np.unique(traced, axis=0), np.unique(components, axis=0))
+        assert np.array_equal(np.unique(find_board_candidates(binary, min_area), axis=0), np.unique(traced, axis=0))
+        # Every diagram is among the candidates, found at the 1500px working size
+        scale = 1500 / max(page.shape)
+        for box in truth:
+            assert any(abs(x - box['x'] * scale) <= 5 and abs(y - box['y'] * scale) <= 5
+                       for x, y, _, _ in traced), box
+
+
+def test_blob_estimate_picks_tracing_for_clean_pages_only():
+    clean, _ = threshold_page(make_page(seed=0)[0])
+    noisy, _ = threshold_page(make_page(noise=0.05, seed=0)[0])
+    assert count_blob_starts(clean) <= CONTOUR_TRACE_MAX_BLOBS < count_blob_starts(noisy)
+
+
+def test_blob_starts_count_compact_blobs():
+    binary = np.zeros((100, 100), dtype=np.uint8)
+    binary[10:20, 10:20] = 255
+    binary[50:52, 30:80] = 255
+    binary[70, 90] = 255
+    assert count_blob_starts(binary) == 3
+    assert len(find_board_candidates(np.zeros((50, 50), dtype=np.uint8), 100)) == 0
+
+
+def numbered_pages(pages, taken):
+    """(page_num, image) of pages, recording in taken each page handed out"""
+    for page_num, page in enumerate(pages, 1):
+        taken.append(page_num)
+        yield page_num, page
+
+
+@pytest.mark.parametrize('max_in_flight', [1, 2, 4])
+def test_detect_pages_yields_in_order_and_bounds_pages_in_flight(max_in_flight):
+    # The first page is the slowest, so a pool finishes it last
+    pages = [make_page(noise=0.05, seed=0)[0]] + [make_page(seed=seed)[0] for seed in range(1, 8)]
+    serial = list(detect_pages(numbered_pages(pages, [])))
+
+    taken, timings = [], []
+    observe = lambda page_num, started_at, seconds, worker: timings.append((page_num, worker))
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix='detect') as pool:
+        results = []
+        for page_num, boxes in detect_pages(numbered_pages(pages, taken), pool, max_in_flight, observe):
+            # Pages rendered but not yet yielded, this one included
+            assert len(taken) - len(results) <= max_in_flight
+            results.append((page_num, boxes))
+
+    assert [page_num for page_num, _ in results] == list(range(1, len(pages) + 1))
+    assert results == serial
+    assert sorted(page_num for page_num, _ in timings) == list(range(1, len(pages) + 1))
+    assert all(worker.split(':')[1].startswith('detect') for _, worker in timings)
+
+
+def test_detect_pages_without_pool_runs_in_the_caller():
+    observed = []
+    observe = lambda page_num, started_at, seconds, worker: observed.append(worker)
+    pages = [make_page(seed=seed)[0] for seed in range(2)]
+    assert [page_num for page_num, _ in detect_pages(numbered_pages(pages, []), observe=observe)] == [1, 2]
+    assert observed == [f'{os.getpid()}:{threading.current_thread().name}'] * 2
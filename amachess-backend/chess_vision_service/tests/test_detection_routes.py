@@ -0,0 +1,58 @@
+"""
+Request validation of the detection routes, through Flask's test client.
+There is no poppler here: page counts come from a stub of
+get_pdf_page_count and no page is ever rendered.
+"""
+
+import hashlib
+import io
+import os
+
+import pytest
+
+PDF_BYTES = b'%PDF-1.4\n% three page test book\n'
+PDF_HASH = hashlib.md5(PDF_BYTES).hexdigest()
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    monkeypatch.setattr(service, 'get_pdf_page_count', lambda pdf_path: 3)
+    service.client_limiter._buckets.clear()
+    return service.app.test_client()
+
+
+def upload(client, path, **fields):
+    data = {'pdf': (io.BytesIO(PDF_BYTES), 'book.pdf', 'application/pdf'), **fields}
+    return client.post(path, data=data, content_type='multipart/form-data')
+
+
+def spooled_files(service):
+    return [name for name in os.listdir(service.UPLOAD_FOLDER) if not name.startswith('.')]
+
+
+@pytest.mark.parametrize('path', ['/detect-boards', '/detect-boards/stream', '/jobs'])
+@pytest.mark.parametrize('fields, message', [
+    ({'max_pages': '-3'}, 'Invalid max_pages'),
+    ({'start_page': '0'}, 'Invalid start page'),
+    ({'start_page': '-2'}, 'Invalid start page'),
+    ({'start_page': '4'}, 'Invalid start page'),
+])
+def test_bad_page_range_is_rejected_and_upload_released(service, client, path, fields, message):
+    jobs_before = service.job_manager.stats()
+    response = upload(client, path, **fields)
+
+    assert response.status_code == 400
+    assert message in response.get_json()['message']
+    assert spooled_files(service) == []
+    assert service.job_manager.stats() == jobs_before
+
+
+@pytest.mark.parametrize('fields', [{'max_pages': -1}, {'start_page': 0}, {'start_page': 2, 'max_pages': -5}])
+def test_bad_page_range_by_hash_is_rejected(service, client, fields):
+    # Any upload stores the source, so the book is known by its hash afterwards
+    upload(client, '/detect-boards', start_page='9')
+    assert service.page_store.source_path(PDF_HASH) is not None
+
+    response = client.post('/detect-boards', json={'pdf_hash': PDF_HASH, **fields})
+    assert response.status_code == 400
+    assert service.page_store.source_path(PDF_HASH) is not None
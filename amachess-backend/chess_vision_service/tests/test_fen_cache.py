@@ -0,0 +1,52 @@
+import time
+
+from fen_cache import ENTRY_OVERHEAD_BYTES, FenCache
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+RUY_LOPEZ_FEN = 'r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 3 3'
+
+
+def test_regions_match_exactly():
+    cache = FenCache(1024 * 1024, 0)
+    region = ('book', 3, 10, 20, 240, 240)
+    assert cache.get_region(region) is None
+    cache.put(region, RUY_LOPEZ_FEN, 0.87)
+
+    assert cache.get_region(region) == (RUY_LOPEZ_FEN, 0.87)
+    # Another box, page or book is another region
+    assert cache.get_region(('book', 3, 11, 20, 240, 240)) is None
+    assert cache.get_region(('book', 4, 10, 20, 240, 240)) is None
+    assert cache.get_region(('other', 3, 10, 20, 240, 240)) is None
+
+    stats = cache.stats()['by_region']
+    assert stats['entries'] == 1
+    assert stats['hits'] == 1
+    assert stats['misses'] == 4
+
+
+def test_byte_budget_evicts_least_recently_used():
+    entry_bytes = ENTRY_OVERHEAD_BYTES + len(START_FEN)
+    cache = FenCache(2 * entry_bytes, 0)
+    for page in (1, 2):
+        cache.put(('book', page, 0, 0, 200, 200), START_FEN, 0.9)
+    cache.get_region(('book', 1, 0, 0, 200, 200))
+    cache.put(('book', 3, 0, 0, 200, 200), START_FEN, 0.9)
+
+    assert cache.get_region(('book', 2, 0, 0, 200, 200)) is None
+    assert cache.get_region(('book', 1, 0, 0, 200, 200)) is not None
+    assert cache.stats()['by_region']['evictions'] == 1
+
+
+def test_entries_expire():
+    cache = FenCache(1024 * 1024, 0.05)
+    cache.put(('book', 1, 0, 0, 200, 200), START_FEN, 0.9)
+    time.sleep(0.1)
+    assert cache.get_region(('book', 1, 0, 0, 200, 200)) is None
+
+
+def test_clear():
+    cache = FenCache(1024 * 1024, 0)
+    cache.put(('book', 1, 0, 0, 200, 200), START_FEN, 0.9)
+    cache.clear()
+    assert cache.get_region(('book', 1, 0, 0, 200, 200)) is None
+    assert cache.stats()['by_region']['resident_bytes'] == 0
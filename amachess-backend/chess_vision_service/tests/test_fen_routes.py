@@ -0,0 +1,112 @@
+"""
+The FEN routes through Flask's test client, on a book whose detection render
+is in the page store. Recognition is replaced by a stub recording the crops
+it is given, so no model is loaded.
+"""
+
+import subprocess
+import time
+
+import cv2
+import numpy as np
+import pytest
+from prometheus_client import REGISTRY
+
+BOOK = 'fe' * 16
+FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+
+@pytest.fixture
+def book(service):
+    page = np.full((1100, 850), 255, dtype=np.uint8)
+    for page_num in (1, 2):
+        service.page_store.save_page(BOOK, service.DETECTION_DPI, page_num, page)
+    yield BOOK
+    service.page_store.delete(BOOK)
+    service.fen_cache.clear()
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    recognized = []
+
+    def recognize(image_crops, pdf_hash=None):
+        recognized.extend(image_crops)
+        return [(FEN, 0.9)] * len(image_crops)
+
+    monkeypatch.setitem(service.model_state, 'ready', True)
+    monkeypatch.setattr(service, 'extract_fens_from_images', recognize)
+    service.client_limiter._buckets.clear()
+    client = service.app.test_client()
+    client.recognized = recognized
+    return client
+
+
+def stage_totals(stage):
+    labels = {'stage': stage}
+    return (REGISTRY.get_sample_value('chess_vision_stage_seconds_count', labels) or 0,
+            REGISTRY.get_sample_value('chess_vision_stage_seconds_sum', labels) or 0)
+
+
+def count_manifest_reads(service, monkeypatch):
+    reads = []
+    manifest = service.page_store.manifest
+    monkeypatch.setattr(service.page_store, 'manifest', lambda pdf_hash: reads.append(pdf_hash) or manifest(pdf_hash))
+    return reads
+
+
+def test_batch_reads_the_manifest_once(service, client, book, monkeypatch):
+    reads = count_manifest_reads(service, monkeypatch)
+    boxes = [{'page': page, 'x': 30 * i, 'y': 40, 'width': 300, 'height': 300}
+             for page in (1, 2) for i in range(3)]
+    boxes.append({'page': 1, 'x': 1300, 'y': 40, 'width': 300, 'height': 300})  # past the page's right edge
+
+    response = client.post('/extract_fen/batch', json={'pdf_hash': book, 'boxes': boxes})
+    results = response.get_json()['results']
+
+    assert [result['success'] for result in results] == [True] * 6 + [False]
+    assert results[-1]['message'] == 'Region is outside the page'
+    assert len(client.recognized) == 6
+    # Boxes are in 150 DPI pixels and cropped from the 100 DPI render
+    assert all(crop.shape == (200, 200) for crop in client.recognized)
+    assert reads == [book]
+
+
+def test_cached_batch_does_not_read_the_manifest(service, client, book, monkeypatch):
+    boxes = [{'page': 1, 'x': 10, 'y': 10, 'width': 300, 'height': 300}]
+    client.post('/extract_fen/batch', json={'pdf_hash': book, 'boxes': boxes})
+
+    reads = count_manifest_reads(service, monkeypatch)
+    results = client.post('/extract_fen/batch', json={'pdf_hash': book, 'boxes': boxes}).get_json()['results']
+    assert results[0]['cached']
+    assert reads == []
+
+
+def test_region_renders_are_not_timed_as_crops(service, client, book, tmp_path, monkeypatch):
+    pdf_path = tmp_path / 'book.pdf'
+    pdf_path.write_bytes(b'%PDF-1.4\n')
+    service.page_store.save_source(book, str(pdf_path), 2)
+
+    def pdftoppm(command, **kwargs):
+        # A slow render of a blank region, as PGM on stdout
+        time.sleep(0.2)
+        width, height = int(command[command.index('-W') + 1]), int(command[command.index('-H') + 1])
+        pgm = cv2.imencode('.pgm', np.full((height, width), 255, dtype=np.uint8))[1].tobytes()
+        return subprocess.CompletedProcess(command, 0, stdout=pgm)
+
+    monkeypatch.setattr(service.subprocess, 'run', pdftoppm)
+    renders, crops = stage_totals('rasterize_region'), stage_totals('crop')
+    boxes = [{'page': 1, 'x': 10, 'y': 10, 'width': 300, 'height': 300}]
+    client.post('/extract_fen/batch', json={'pdf_hash': book, 'boxes': boxes})
+
+    assert client.recognized[0].shape == (600, 600)
+    assert stage_totals('rasterize_region')[0] == renders[0] + 1
+    assert stage_totals('rasterize_region')[1] - renders[1] >= 0.2
+    assert stage_totals('crop') == crops
+
+    # Without a render the box is cut from the detection render, timed as a crop
+    monkeypatch.setattr(service.subprocess, 'run', lambda command, **kwargs: 1 / 0)
+    boxes[0]['x'] = 20
+    client.post('/extract_fen/batch', json={'pdf_hash': book, 'boxes': boxes})
+    assert client.recognized[1].shape == (200, 200)
+    assert stage_totals('crop')[0] == crops[0] + 1
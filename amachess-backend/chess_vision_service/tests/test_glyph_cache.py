@@ -0,0 +1,75 @@
+import numpy as np
+
+from glyph_cache import GlyphCache, perceptual_hash
+
+
+def squares(count, size=32, seed=0):
+    """Random squares of 8x8 flat blocks, so every hashed frequency carries signal"""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(30, 226, (count, 8, 8)).astype(np.uint8)
+    return np.kron(blocks, np.ones((size // 8, size // 8), dtype=np.uint8))
+
+
+def bit_difference(a, b):
+    return bin(int(a) ^ int(b)).count('1')
+
+
+def test_hash_is_stable_under_small_changes():
+    cells = squares(20)
+    hashes = perceptual_hash(cells)
+    assert (hashes.dtype.kind, hashes.dtype.itemsize, hashes.shape) == ('u', 8, (20,))
+    assert len(set(hashes.tolist())) == 20
+    assert np.array_equal(perceptual_hash(cells.copy()), hashes)
+
+    # Brightness and a little sensor noise keep a glyph's hash close
+    rng = np.random.default_rng(1)
+    noisy = (cells.astype(int) + 10 + rng.integers(-4, 5, cells.shape)).astype(np.uint8)
+    assert max(bit_difference(a, b) for a, b in zip(perceptual_hash(noisy), hashes)) <= 4
+    # while different glyphs are far apart
+    assert min(bit_difference(hashes[0], other) for other in hashes[1:]) > 10
+
+
+def test_hash_of_any_square_size():
+    for size in (24, 32, 48):
+        assert perceptual_hash(squares(3, size)).shape == (3,)
+
+
+def test_lookups_are_per_book():
+    cache = GlyphCache(100)
+    hashes = perceptual_hash(squares(3))
+    assert cache.get_many('a', hashes) == [None, None, None]
+    cache.put_many('a', hashes[:2], ['K', 'q'])
+
+    assert cache.get_many('a', hashes) == ['K', 'q', None]
+    assert cache.get_many('b', hashes) == [None, None, None]
+    assert len(cache) == 2
+
+
+def test_least_recently_used_glyphs_are_evicted():
+    cache = GlyphCache(3)
+    hashes = perceptual_hash(squares(4))
+    cache.put_many('a', hashes[:3], [1, 2, 3])
+    cache.get_many('a', hashes[:1])
+    cache.put_many('a', hashes[3:], [4])
+
+    assert cache.get_many('a', hashes) == [1, None, 3, 4]
+    assert cache.stats()['evictions'] == 1
+
+
+def test_hit_counts_per_book():
+    cache = GlyphCache(100, max_books=2)
+    cache.record('a', hits=3, misses=1)
+    cache.record('b', hits=0, misses=2)
+    cache.record('a', hits=4, misses=0)
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_ratio']) == (7, 3, 0.7)
+    assert stats['books']['a'] == {'hits': 7, 'misses': 1, 'hit_ratio': 0.875}
+    assert stats['books']['b']['hit_ratio'] == 0.0
+
+    # Only the most recently used books keep counters
+    cache.record('c', hits=1, misses=0)
+    assert set(cache.stats()['books']) == {'a', 'c'}
+
+    cache.clear()
+    assert cache.stats()['entries'] == 0 and cache.stats()['books'] == {}
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+import pytest
+
+from jobs import CANCELLED, COMPLETED, FAILED, JobManager
+
+
+def wait_for(job_manager, job_id, states, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = job_manager.get(job_id)
+        if job.status in states:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} stuck in {job_manager.get(job_id).status}')
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = JobManager(workers=1, retention_seconds=60, state_dir=str(tmp_path / 'jobs'))
+    yield manager
+    manager.shutdown(wait=False)
+
+
+def test_job_completes_with_progress(manager):
+    finished = []
+
+    def runner(job):
+        for page in range(3):
+            job.add_progress([{'page': page}])
+        return {'boards': 3}
+
+    job = manager.submit(runner, total=3, metadata={'pdf_hash': 'x'}, on_finish=finished.append)
+    job = wait_for(manager, job.id, (COMPLETED,))
+    info = job.to_dict(include_results=True)
+    assert info['progress'] == {'done': 3, 'total': 3, 'percent': 100.0}
+    assert info['result'] == {'boards': 3}
+    assert info['pdf_hash'] == 'x'
+    assert len(info['partial_results']) == 3
+    assert finished == [job]
+
+
+def test_failing_runner_records_error(manager):
+    def runner(job):
+        raise ValueError('broken pdf')
+
+    job = wait_for(manager, manager.submit(runner).id, (FAILED,))
+    assert job.error == 'broken pdf'
+
+
+def test_cancel_queued_and_running_jobs(manager):
+    started = threading.Event()
+    release = threading.Event()
+
+    def runner(job):
+        started.set()
+        for _ in range(500):
+            if release.wait(0.01):
+                break
+            job.check_cancelled()
+
+    running = manager.submit(runner)
+    queued = manager.submit(runner)
+    assert started.wait(2)
+
+    assert manager.cancel(queued.id).status == CANCELLED
+    manager.cancel(running.id)
+    assert wait_for(manager, running.id, (CANCELLED,)).status == CANCELLED
+    assert manager.stats()[CANCELLED] == 2
+
+
+def test_other_process_sees_snapshot_and_cancels_by_marker(manager, tmp_path):
+    started = threading.Event()
+
+    def runner(job):
+        started.set()
+        job.add_progress([{'page': 1}])
+        for _ in range(500):
+            job.check_cancelled()
+            time.sleep(0.01)
+
+    job = manager.submit(runner, total=5, metadata={'pdf_hash': 'abc'})
+    assert started.wait(2)
+
+    # Another worker process: same state directory, none of the jobs in memory
+    other = JobManager(workers=1, retention_seconds=60, state_dir=manager.state_dir)
+    try:
+        snapshot = other.get(job.id)
+        # Progress snapshots are throttled, so this one may predate the start
+        assert snapshot.status in ('queued', 'running')
+        assert snapshot.metadata == {'pdf_hash': 'abc'}
+
+        other.cancel(job.id)
+        assert os.path.exists(os.path.join(manager.state_dir, job.id + '.cancel'))
+        wait_for(manager, job.id, (CANCELLED,))
+        assert other.get(job.id).status == CANCELLED
+        # The owner removes the marker once the job has stopped, just after its status
+        marker = os.path.join(manager.state_dir, job.id + '.cancel')
+        deadline = time.monotonic() + 5
+        while os.path.exists(marker) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not os.path.exists(marker)
+    finally:
+        other.shutdown(wait=False)
+
+
+def test_snapshot_of_dead_owner_reports_failure(manager):
+    job = wait_for(manager, manager.submit(lambda job: None).id, (COMPLETED,))
+    path = os.path.join(manager.state_dir, job.id + '.json')
+    with open(path) as f:
+        snapshot = f.read()
+    with open(path, 'w') as f:
+        f.write(snapshot.replace('"completed"', '"running"').replace(f'"owner_pid": {os.getpid()}', '"owner_pid": 999999999'))
+
+    other = JobManager(workers=1, retention_seconds=60, state_dir=manager.state_dir)
+    try:
+        reloaded = other.get(job.id)
+        assert reloaded.status == FAILED
+        assert 'exited' in reloaded.error
+    finally:
+        other.shutdown(wait=False)
+
+
+def test_unknown_or_malformed_job_id(manager):
+    assert manager.get('0' * 32) is None
+    assert manager.get('../../etc/passwd') is None
+
+
+def test_drain_stops_accepting(manager):
+    manager.drain(timeout=1)
+    assert not manager.accepting
+    with pytest.raises(RuntimeError):
+        manager.submit(lambda job: None)
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+import page_cache
+from page_cache import PageCache, estimate_size
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(page_cache.time, 'monotonic', clock)
+    return clock
+
+
+def test_estimate_size():
+    assert estimate_size(np.zeros((10, 20), dtype=np.uint8)) == 200
+    assert estimate_size(b'abcd') == 4
+    assert estimate_size([np.zeros(8, dtype=np.uint8), b'xy']) == 10
+    assert estimate_size(None) == 0
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = PageCache(max_bytes=300, ttl_seconds=0)
+    for key in 'abc':
+        cache.put(key, key, size=100)
+    cache.get('a')
+    cache.put('d', 'd', size=100)
+
+    assert 'b' not in cache
+    assert all(key in cache for key in 'acd')
+    assert cache.resident_bytes == 300
+    assert cache.evictions == 1
+
+
+def test_oversized_entry_is_kept_alone():
+    cache = PageCache(max_bytes=100, ttl_seconds=0)
+    cache.put('small', 1, size=50)
+    cache.put('big', 2, size=500)
+
+    assert 'small' not in cache
+    assert cache.get('big') == 2
+    assert cache.resident_bytes == 500
+
+
+def test_reput_replaces_size():
+    cache = PageCache(max_bytes=1000, ttl_seconds=0)
+    cache.put('a', 1, size=100)
+    cache.put('a', 2, size=40)
+
+    assert len(cache) == 1
+    assert cache.resident_bytes == 40
+    assert cache.get('a') == 2
+
+
+def test_ttl_expiry(clock):
+    cache = PageCache(max_bytes=1000, ttl_seconds=10)
+    cache.put('old', 1, size=10)
+    clock.now += 6
+    cache.put('new', 2, size=10)
+    clock.now += 6
+
+    assert cache.get('old') is None
+    assert cache.get('new') == 2
+    assert cache.expirations == 1
+
+    clock.now += 6
+    cache.put('newest', 3, size=10)
+    assert len(cache) == 1
+    assert cache.resident_bytes == 10
+    assert cache.expirations == 2
+
+
+def test_expiry_follows_creation_not_recency(clock):
+    cache = PageCache(max_bytes=1000, ttl_seconds=10)
+    cache.put('a', 1, size=10)
+    clock.now += 5
+    cache.put('b', 2, size=10)
+    # Reading 'a' makes it most recently used but not any younger
+    cache.get('a')
+    clock.now += 6
+
+    assert cache.stats()['entries'] == 1
+    assert 'a' not in cache
+    assert 'b' in cache
+
+
+def test_contains_does_not_touch_order_or_counters():
+    cache = PageCache(max_bytes=200, ttl_seconds=0)
+    cache.put('a', 1, size=100)
+    cache.put('b', 2, size=100)
+
+    assert 'a' in cache
+    assert 'missing' not in cache
+    assert (cache.hits, cache.misses) == (0, 0)
+
+    # 'a' is still the least recently used entry
+    cache.put('c', 3, size=100)
+    assert 'a' not in cache
+    assert 'b' in cache
+
+
+def test_stats_hit_ratio():
+    cache = PageCache(max_bytes=100, ttl_seconds=0)
+    cache.put('a', 1, size=10)
+    cache.get('a')
+    cache.get('b')
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['hit_ratio'] == 0.5
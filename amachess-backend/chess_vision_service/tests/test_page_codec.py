@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from page_cache import PageCache
+from page_codec import CompressedPage, available_codecs, decode_page
+
+
+def book_page(height=301, width=213, seed=0):
+    """Mostly white page with a dark block and some speckle, odd sizes on purpose"""
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width), 255, dtype=np.uint8)
+    page[40:180, 30:170] = rng.integers(0, 256, size=(140, 140), dtype=np.uint8)
+    page[rng.random(page.shape) < 0.01] = 0
+    return page
+
+
+@pytest.mark.parametrize('codec', available_codecs())
+@pytest.mark.parametrize('band_rows', [1, 7, 64, 1000])
+def test_round_trip(codec, band_rows):
+    page = book_page()
+    compressed = CompressedPage.encode(page, codec, band_rows)
+
+    assert compressed.shape == page.shape
+    assert len(compressed.bands) == -(-page.shape[0] // band_rows)
+    decoded = compressed.decode()
+    assert decoded.dtype == np.uint8
+    assert np.array_equal(decoded, page)
+    assert np.array_equal(decode_page(compressed), page)
+
+
+@pytest.mark.parametrize('codec', available_codecs())
+def test_crops_match_array_slicing(codec):
+    page = book_page()
+    compressed = CompressedPage.encode(page, codec, band_rows=32)
+    for key in [
+        (slice(40, 180), slice(30, 170)),   # across several bands
+        (slice(32, 64), slice(0, 10)),      # exactly one band
+        (slice(290, 400), slice(200, 300)),  # past the edges
+        (slice(500, 600), slice(0, 10)),    # entirely below the page
+        (slice(10, 10), slice(0, 5)),       # empty
+        slice(5, 40),                       # rows only
+        (slice(0, 100, 3), slice(None)),    # strided: full decode
+    ]:
+        assert np.array_equal(compressed[key], page[key]), key
+
+
+def test_crop_decodes_only_overlapping_bands(monkeypatch):
+    page = book_page()
+    compressed = CompressedPage.encode(page, 'zlib', band_rows=32)
+    decoded = []
+    original = compressed._band
+    monkeypatch.setattr(compressed, '_band', lambda index: decoded.append(index) or original(index))
+
+    compressed[70:100, 10:20]
+    assert decoded == [2, 3]
+
+
+def test_three_dimensional_pages():
+    rgb = np.stack([book_page(seed=seed) for seed in range(3)], axis=2)
+    compressed = CompressedPage.encode(rgb, 'zlib', band_rows=50)
+    assert compressed.ndim == 3
+    assert np.array_equal(compressed.decode(), rgb)
+    assert np.array_equal(compressed[60:120, 5:50], rgb[60:120, 5:50])
+
+
+def test_compressed_size_is_what_the_cache_counts():
+    page = book_page()
+    compressed = CompressedPage.encode(page, 'zlib')
+    assert compressed.nbytes == sum(len(band) for band in compressed.bands)
+    assert compressed.nbytes < page.nbytes
+    assert compressed.ratio() == pytest.approx(page.nbytes / compressed.nbytes)
+
+    cache = PageCache(max_bytes=10 ** 6, ttl_seconds=0)
+    cache.put('page', compressed)
+    assert cache.resident_bytes == compressed.nbytes
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        CompressedPage.encode(book_page(), 'lzma')
+
+
+def test_raw_arrays_pass_through_decode_page():
+    page = book_page()
+    assert decode_page(page) is page
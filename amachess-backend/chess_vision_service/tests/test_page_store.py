@@ -0,0 +1,113 @@
+import json
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from page_store import PageStore
+
+BOOK_A = 'a' * 32
+BOOK_B = 'b' * 32
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PageStore(str(tmp_path / 'pdf_cache'))
+
+
+def test_page_round_trip(store):
+    page = np.arange(200, dtype=np.uint8).reshape(10, 20)
+    store.save_page(BOOK_A, 100, 1, page)
+
+    loaded = store.load_page(BOOK_A, 100, 1)
+    assert np.array_equal(loaded, page)
+    assert store.has_page(BOOK_A, 100, 1)
+    assert store.load_page(BOOK_A, 100, 2) is None
+    assert store.manifest(BOOK_A)['pages']['100']['1']['shape'] == [10, 20]
+
+
+def test_stats_follow_writes_without_rescanning(store, tmp_path):
+    store.save_page(BOOK_A, 100, 1, np.zeros((10, 10), dtype=np.uint8))
+    store.save_page(BOOK_A, 100, 2, np.zeros((10, 10), dtype=np.uint8))
+    # Overwriting a page doesn't count it twice
+    store.save_page(BOOK_A, 100, 2, np.zeros((20, 10), dtype=np.uint8))
+    pdf = tmp_path / 'book.pdf'
+    pdf.write_bytes(b'%PDF' + b'0' * 96)
+    store.save_source(BOOK_B, str(pdf), page_count=3)
+
+    stats = store.stats()
+    assert stats['books'] == 2
+    assert stats['pages'] == 2
+    page_files = [os.path.join(store.root, BOOK_A, 'dpi100', f'page_{page}.npy') for page in (1, 2)]
+    assert stats['disk_bytes'] == sum(os.path.getsize(path) for path in page_files) + 100
+
+    store.delete(BOOK_A)
+    assert store.stats()['books'] == 1
+    assert store.stats()['disk_bytes'] == 100
+
+    # A fresh store (another worker) counts the same from disk
+    assert PageStore(store.root).stats() == store.stats()
+
+
+def test_disk_budget_evicts_least_recently_used_book(tmp_path):
+    page = np.zeros((100, 100), dtype=np.uint8)
+    root = str(tmp_path / 'pdf_cache')
+    store = PageStore(root, max_bytes=25000)
+    store.save_page(BOOK_A, 100, 1, page)
+    store.save_page(BOOK_B, 100, 1, page)
+    os.utime(os.path.join(root, BOOK_A), (1, 1))
+    os.utime(os.path.join(root, BOOK_B), (2, 2))
+
+    book_c = 'c' * 32
+    store.save_page(book_c, 100, 1, page)
+
+    assert not os.path.exists(os.path.join(root, BOOK_A))
+    assert store.has_page(BOOK_B, 100, 1)
+    assert store.has_page(book_c, 100, 1)
+    assert store.stats()['evictions'] == 1
+    assert store.stats()['disk_bytes'] <= 25000
+
+
+def test_book_being_written_is_never_evicted(tmp_path):
+    store = PageStore(str(tmp_path / 'pdf_cache'), max_bytes=100)
+    for page in range(1, 4):
+        store.save_page(BOOK_A, 100, page, np.zeros((50, 50), dtype=np.uint8))
+    assert store.stats()['pages'] == 3
+    assert store.stats()['evictions'] == 0
+
+
+def test_detections_are_reused_only_by_the_same_detector(store):
+    box = {'x': 10, 'y': 20, 'width': 300, 'height': 300, 'page': 1}
+    store.save_detections(BOOK_A, 100, {1: [box], 2: []}, 'old')
+    assert store.load_detections(BOOK_A, 100, 'old') == {1: [box], 2: []}
+    assert store.load_detections(BOOK_A, 150, 'old') == {}
+    assert store.load_detections(BOOK_A, 100, 'new') == {}
+
+    # A new detector's results replace the old ones instead of mixing with them
+    store.save_detections(BOOK_A, 100, {3: []}, 'new')
+    assert store.load_detections(BOOK_A, 100, 'new') == {3: []}
+    assert store.load_detections(BOOK_A, 100, 'old') == {}
+
+
+def _record_detections(root, worker, pages):
+    store = PageStore(root)
+    for page in pages:
+        store.save_detections(BOOK_A, 100, {page: [{'worker': worker}]}, 'detector')
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='manifest locking needs fcntl')
+def test_concurrent_processes_keep_every_manifest_update(tmp_path):
+    root = str(tmp_path / 'pdf_cache')
+    PageStore(root)
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_record_detections, args=(root, worker, range(worker * 50, worker * 50 + 50)))
+               for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    with open(os.path.join(root, BOOK_A, 'manifest.json')) as f:
+        detections = json.load(f)['detections']['100']['pages']
+    assert len(detections) == 200
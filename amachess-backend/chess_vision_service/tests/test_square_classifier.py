@@ -0,0 +1,105 @@
+import os
+import sys
+
+import chess
+import numpy as np
+import pytest
+from PIL import ImageFont
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from glyph_cache import GlyphCache  # noqa: E402
+from square_classifier import PIECE_SYMBOLS, SquareClassifier, build_position, find_chess_font  # noqa: E402
+from synthetic_books import DIAGRAM_STYLES, GLYPH_SCALE, draw_diagram, random_position  # noqa: E402
+
+FONT_PATH = find_chess_font()
+
+pytestmark = pytest.mark.skipif(FONT_PATH is None, reason='no font with chess glyphs (set CHESS_FONT_PATH)')
+
+POSITIONS = [
+    chess.STARTING_BOARD_FEN,
+    'r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R',  # Ruy Lopez, 3.Bb5
+    'r1bk3r/p2pBpNp/n4n2/1p1NP2P/6P1/3P4/P1P1K3/q5b1',  # The Immortal Game, final position
+    '6k1/5ppp/8/8/8/8/8/R5K1'  # Back-rank mate pattern
+]
+
+
+@pytest.fixture(scope='module')
+def classifier():
+    return SquareClassifier(FONT_PATH)
+
+
+def diagrams(boards, size, style, seed=0):
+    rng = np.random.default_rng(seed)
+    font = ImageFont.truetype(FONT_PATH, int(size // 8 * GLYPH_SCALE))
+    return [draw_diagram(board, size // 8, font, style, rng) for board in boards]
+
+
+@pytest.mark.parametrize('size', [240, 320])
+@pytest.mark.parametrize('style', DIAGRAM_STYLES)
+def test_known_positions_round_trip(classifier, style, size):
+    images = diagrams([chess.BaseBoard(fen) for fen in POSITIONS], size, style)
+    for fen, (predicted, confidence) in zip(POSITIONS, classifier.predict_batch(images)):
+        assert predicted.split(' ')[0] == fen
+        assert confidence >= 0.5
+
+
+def test_side_to_move_follows_check(classifier):
+    fen = '4k3/4R3/8/8/8/8/8/4K3'  # Black king in check from the rook
+    predicted, _ = classifier.predict(diagrams([chess.BaseBoard(fen)], 240, 'solid')[0])
+    assert predicted.split(' ')[:2] == [fen, 'b']
+
+
+def test_empty_board(classifier):
+    predicted, confidence = classifier.predict(diagrams([chess.BaseBoard(None)], 240, 'hatched')[0])
+    assert predicted.split(' ')[0] == '8/8/8/8/8/8/8/8'
+    assert confidence == 0.0
+
+
+def test_glyph_cache_gives_the_same_positions(classifier):
+    rng = np.random.default_rng(3)
+    boards = [random_position(rng) for _ in range(6)]
+    images = diagrams(boards, 240, 'hatched')
+    cached = SquareClassifier(FONT_PATH, glyph_cache=GlyphCache(10000))
+
+    expected = classifier.predict_batch(images)
+    first = cached.predict_batch(images[:3], 'book')
+    first_misses = cached.glyph_cache.stats()['books']['book']['misses']
+    assert first + cached.predict_batch(images[3:], 'book') == expected
+    # A book's glyphs are matched once; later boards are mostly hits
+    seen = cached.glyph_cache.stats()['books']['book']
+    assert seen['misses'] - first_misses < first_misses < seen['hits']
+
+    assert cached.predict_batch(images, 'book') == expected
+    assert cached.glyph_cache.stats()['books']['book']['misses'] == seen['misses']
+
+    # Glyphs are kept per book
+    cached.predict_batch(images[:1], 'other')
+    assert cached.glyph_cache.stats()['books']['other']['misses'] > 0
+
+
+def piece_scores(placement):
+    """(64, 12) scores of 0.9 for the given {cell: symbol}, occupied mask"""
+    scores = np.zeros((64, len(PIECE_SYMBOLS)), dtype=np.float32)
+    for cell, symbol in placement.items():
+        scores[cell, PIECE_SYMBOLS.index(symbol)] = 0.9
+    return scores, scores.max(axis=1) > 0
+
+
+def test_build_position_repairs_impossible_readings():
+    # Cells run a8..h8, a7..h7, ...
+    scores, occupied = piece_scores({4: 'k', 60: 'K', 63: 'K', 0: 'P'})
+    scores[63, PIECE_SYMBOLS.index('K')] = 0.8
+    scores[63, PIECE_SYMBOLS.index('R')] = 0.7  # the weaker king reads next as a rook
+    scores[0, PIECE_SYMBOLS.index('B')] = 0.6  # a pawn can't stand on the 8th rank
+
+    fen, confidence = build_position(scores, occupied)
+    assert fen.split(' ')[0] == 'B3k3/8/8/8/8/8/8/4K2R'
+    assert confidence == pytest.approx(np.mean([0.9, 0.9, 0.7, 0.6]), abs=0.01)
+
+
+def test_build_position_halves_confidence_of_invalid_positions():
+    scores, occupied = piece_scores({4: 'k', 12: 'Q'})  # no white king
+    fen, confidence = build_position(scores, occupied)
+    assert fen.split(' ')[0] == '4k3/4Q3/8/8/8/8/8/8'
+    assert confidence == pytest.approx(0.45)
@@ -0,0 +1,163 @@
+"""
+Request-scoped span tracing.
+Each request gets a Trace; code on the request's thread opens spans with
+span() or @traced and work done elsewhere (the detection pool) is added
+afterwards with record_span(). A finished trace renders as a Server-Timing
+header (total time per span name) or as a Chrome trace-event file that
+chrome://tracing and Perfetto show as a flame chart. Outside a request,
+e.g. in background jobs, all of this is a no-op.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+_current: ContextVar[Optional['Trace']] = ContextVar('trace', default=None)
+
+
+class Trace:
+    """Spans of one request; safe to add to from several threads"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.track = threading.current_thread().name
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, started_at: float, seconds: float,
+            track: Optional[str] = None, **args):
+        """Record a finished span; started_at is epoch seconds, track names its timeline"""
+        span = {
+            'name': name,
+            'start': started_at,
+            'seconds': seconds,
+            'track': track or threading.current_thread().name,
+            'args': args
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **args):
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, started_at, time.perf_counter() - start, **args)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value: summed duration per span name, in first
+        seen order, plus the request total. Spans run in parallel (pooled
+        detection) can add up to more than the total.
+        """
+        totals: Dict[str, List[float]] = {}
+        with self._lock:
+            for span in self.spans:
+                entry = totals.setdefault(span['name'], [0.0, 0])
+                entry[0] += span['seconds']
+                entry[1] += 1
+        metrics = [
+            f'{_token(name)};dur={1000 * seconds:.1f}' + (f';desc="x{count}"' if count > 1 else '')
+            for name, (seconds, count) in totals.items()
+        ]
+        metrics.append(f'total;dur={1000 * self.elapsed():.1f}')
+        return ', '.join(metrics)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Chrome trace-event JSON: one complete ('X') event per span, one row per track"""
+        with self._lock:
+            spans = list(self.spans)
+        tracks: Dict[str, int] = {}
+        events = []
+        events.append(self._event(self.name, self.started_at, self.elapsed(),
+                                  tracks.setdefault(self.track, 1), {}))
+        for span in spans:
+            tid = tracks.setdefault(span['track'], len(tracks) + 1)
+            events.append(self._event(span['name'], span['start'], span['seconds'], tid, span['args']))
+        for track, tid in tracks.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                           'args': {'name': track}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def file_name(self) -> str:
+        """Unique name for this trace's dump file"""
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        return f'{stamp}-{_token(self.name)}-{os.getpid()}-{id(self):x}.json'
+
+    def dump(self, path: str):
+        """Write chrome_trace() to path"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def _event(self, name, started_at, seconds, tid, args):
+        return {
+            'name': name,
+            'ph': 'X',
+            'ts': round((started_at - self.started_at) * 1e6, 1),
+            'dur': round(seconds * 1e6, 1),
+            'pid': os.getpid(),
+            'tid': tid,
+            'args': args
+        }
+
+
+def start_trace(name: str) -> Trace:
+    """Begin a trace for the current request (replacing any previous one)"""
+    trace = Trace(name)
+    _current.set(trace)
+    return trace
+
+
+def end_trace():
+    _current.set(None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **args):
+    """Time a block as a span of the current trace, if there is one"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, **args):
+        yield
+
+
+def traced(name: str):
+    """Decorator form of span()"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, started_at: float, seconds: float, track: Optional[str] = None, **args):
+    """Add a span measured elsewhere (another thread or process) to the current trace"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, started_at, seconds, track, **args)
+
+
+def _token(name: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or 'span'
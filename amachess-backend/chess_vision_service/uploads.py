@@ -0,0 +1,104 @@
+"""
+Upload spooling without in-memory copies.
+Werkzeug streams every multipart file part into a file object it asks the
+request for; SpoolingRequest hands it a HashingSpoolFile, a named temp file
+in the upload folder that hashes the bytes as they are written. Once the
+request is parsed the PDF is already on disk with its content hash known,
+so per-upload memory no longer grows with the size of the PDF and the
+rasterizer reads it from the path.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import List, Optional, Tuple
+
+from flask import Request
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class HashingSpoolFile:
+    """Writable, readable temp file that keeps an MD5 of everything written to it"""
+
+    def __init__(self, directory: str, suffix: str = '.pdf'):
+        fd, self.name = tempfile.mkstemp(suffix=suffix, dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.md5()
+        self._detached = False
+        self.size = 0
+
+    def write(self, data) -> int:
+        # Werkzeug writes each part front to back, so the running hash is the content hash
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def detach(self) -> str:
+        """Close the file and hand its path over; the caller now removes it"""
+        self._file.close()
+        self._detached = True
+        return self.name
+
+    def discard(self):
+        """Close and remove the file unless it was detached"""
+        self._file.close()
+        if not self._detached:
+            try:
+                os.remove(self.name)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell, flush, ... of the underlying file
+        return getattr(self._file, name)
+
+
+class SpoolingRequest(Request):
+    """
+    Flask request class spooling uploaded files into upload_folder.
+    Spools nobody detached are removed by discard_spools() at teardown.
+    """
+
+    upload_folder: Optional[str] = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_folder is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        spool = HashingSpoolFile(self.upload_folder)
+        self.spools.append(spool)
+        return spool
+
+    @property
+    def spools(self) -> List[HashingSpoolFile]:
+        if '_spools' not in self.__dict__:
+            self.__dict__['_spools'] = []
+        return self.__dict__['_spools']
+
+    def discard_spools(self):
+        for spool in self.spools:
+            spool.discard()
+        self.spools.clear()
+
+
+def take_upload(file, directory: str) -> Tuple[str, str, int]:
+    """
+    Take over an uploaded file (werkzeug FileStorage) as a temp file in
+    directory. Returns (path, md5 hex digest, size); the caller removes path.
+    Spooled uploads are handed over as they are; any other stream is copied
+    in chunks, hashing on the way.
+    """
+    if isinstance(file.stream, HashingSpoolFile):
+        return file.stream.detach(), file.stream.hexdigest(), file.stream.size
+
+    spool = HashingSpoolFile(directory)
+    try:
+        shutil.copyfileobj(file.stream, spool, CHUNK_SIZE)
+    except Exception:
+        spool.discard()
+        raise
+    return spool.detach(), spool.hexdigest(), spool.size
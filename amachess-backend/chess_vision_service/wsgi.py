@@ -0,0 +1,23 @@
+"""
+WSGI entry point for production serving:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Importing app loads the fork-safe recognition engines. Under gunicorn the
+import happens once in the preloading master, and each worker finishes
+model loading in the post-fork hook of gunicorn.conf.py, which sets
+MODEL_INIT_POST_FORK. Any other WSGI server serves from the process that
+imports this module, so models are loaded and warmed up here, before it
+takes traffic and before /ready can pass. A preforking server other than
+gunicorn should set MODEL_INIT_POST_FORK=1 and call app.init_models()
+from its own post-fork hook.
+"""
+
+import os
+
+from app import app, init_models
+
+if os.environ.get('MODEL_INIT_POST_FORK') != '1':
+    init_models()
+
+application = app
@@ -3,6 +3,7 @@ const router = express.Router();
 const { authenticateToken } = require('../middleware/auth');
 const multer = require('multer');
 const path = require('path');
+const crypto = require('crypto');
 const fs = require('fs').promises;
 const axios = require('axios');
 const FormData = require('form-data');
@@ -41,39 +42,97 @@ const upload = multer({
 });
 
 // Python service base URL
-const PYTHON_SERVICE_URL = 'http://localhost:5000';
+const PYTHON_SERVICE_URL = process.env.PYTHON_SERVICE_URL || 'http://localhost:5000';
+
+/**
+ * Headers identifying the end user to the Python service, which applies
+ * per-client rate limits to its expensive endpoints
+ */
+function clientHeaders(req) {
+  return { 'X-Forwarded-For': req.ip };
+}
+
+/**
+ * Content hash of a PDF, computed the way the Python service does (MD5 of the bytes)
+ */
+function pdfHash(buffer) {
+  return crypto.createHash('md5').update(buffer).digest('hex');
+}
+
+/**
+ * POST a detection request for the PDF in req.file (or the pdf_hash in the
+ * body) hash-first: the Python service detects books it already stores from
+ * the hash alone and answers 404 when it needs the file, only then is the
+ * PDF uploaded. Books are reopened often, so most requests skip the upload.
+ * Without a file, the 404 (upload_required) is passed on to the client.
+ */
+async function postPdfHashFirst(req, endpoint, options) {
+  const fields = {};
+  if (req.body.max_pages) fields.max_pages = req.body.max_pages;
+  if (req.body.start_page) fields.start_page = req.body.start_page;
+
+  try {
+    return await axios.post(`${PYTHON_SERVICE_URL}${endpoint}`, {
+      pdf_hash: req.file ? pdfHash(req.file.buffer) : req.body.pdf_hash,
+      ...fields
+    }, {
+      ...options,
+      headers: {
+        'Content-Type': 'application/json',
+        ...clientHeaders(req),
+      },
+    });
+  } catch (error) {
+    if (!req.file || error.response?.status !== 404) {
+      throw error;
+    }
+    // Discard the 404 body, a stream when responseType is 'stream'
+    error.response.data?.destroy?.();
+  }
+
+  const formData = new FormData();
+  formData.append('pdf', req.file.buffer, {
+    filename: req.file.originalname,
+    contentType: req.file.mimetype
+  });
+  for (const [name, value] of Object.entries(fields)) {
+    formData.append(name, value);
+  }
+
+  return axios.post(`${PYTHON_SERVICE_URL}${endpoint}`, formData, {
+    ...options,
+    headers: {
+      ...formData.getHeaders(),
+      ...clientHeaders(req),
+    },
+    maxContentLength: 50 * 1024 * 1024, // 50MB
+    maxBodyLength: 50 * 1024 * 1024, // 50MB
+  });
+}
 
 /**
  * POST /api/get-board-bounds
- * Accept a PDF file and forward it to Python service for chess board detection
+ * Accept a PDF file and forward it to Python service for chess board detection.
+ * Instead of the file, clients may send { pdf_hash } (MD5 of the PDF) for a book
+ * uploaded before; a 404 with upload_required means the file must be sent.
  * Returns: { success: boolean, boundingBoxes: ChessBoundingBox[] }
  */
 router.post('/get-board-bounds', upload.single('pdf'), async (req, res) => {
   try {
-    if (!req.file) {
+    if (!req.file && !req.body.pdf_hash) {
       return res.status(400).json({
         success: false,
         message: 'PDF file is required'
       });
     }
 
-    console.log(`Processing PDF file: ${req.file.originalname}, Size: ${req.file.size} bytes`);
-
-    // Create form data to send to Python service
-    const formData = new FormData();
-    formData.append('pdf', req.file.buffer, {
-      filename: req.file.originalname,
-      contentType: req.file.mimetype
-    });
+    if (req.file) {
+      console.log(`Processing PDF file: ${req.file.originalname}, Size: ${req.file.size} bytes`);
+    }
 
-    // Forward to Python service with increased timeout
-    const response = await axios.post(`${PYTHON_SERVICE_URL}/detect-boards`, formData, {
-      headers: {
-        ...formData.getHeaders(),
-      },
+    // Forward to Python service with increased timeout, uploading only if it lacks the PDF
+    const response = await postPdfHashFirst(req, '/detect-boards', {
       timeout: 120000, // 2 minute timeout for PDF processing
-      maxContentLength: 50 * 1024 * 1024, // 50MB
-      maxBodyLength: 50 * 1024 * 1024, // 50MB
     });
 
     // Return the response from Python service
@@ -104,11 +163,201 @@ router.post('/get-board-bounds', upload.single('pdf'), async (req, res) => {
     res.status(statusCode).json({
       success: false,
       message: errorMessage,
-      error: error.message
+      error: error.message,
+      ...(error.response?.data?.upload_required && { upload_required: true })
     });
   }
 });
 
+/**
+ * POST /api/get-board-bounds/stream
+ * Same as /api/get-board-bounds, but pipes the Python service's streaming
+ * response through so the client receives each page's bounding boxes as soon
+ * as that page is processed instead of waiting for the whole book.
+ * Returns: newline-delimited JSON records ({ type: 'page' | 'summary' | 'error', ... }),
+ * or Server-Sent Events when the client sends Accept: text/event-stream
+ */
+router.post('/get-board-bounds/stream', upload.single('pdf'), async (req, res) => {
+  try {
+    if (!req.file && !req.body.pdf_hash) {
+      return res.status(400).json({
+        success: false,
+        message: 'PDF file is required'
+      });
+    }
+
+    if (req.file) {
+      console.log(`Streaming board detection for PDF file: ${req.file.originalname}, Size: ${req.file.size} bytes`);
+    }
+
+    const wantsSse = (req.headers.accept || '').includes('text/event-stream');
+
+    // Stop the upstream work if the client goes away. Watch the response:
+    // the request's 'close' already fired once multer read the body
+    const upstream = new AbortController();
+    res.on('close', () => {
+      if (!res.writableFinished) upstream.abort();
+    });
+
+    // No overall timeout: progress records keep the connection alive
+    const response = await postPdfHashFirst(
+      req,
+      `/detect-boards/stream${wantsSse ? '?format=sse' : ''}`,
+      { responseType: 'stream', signal: upstream.signal }
+    );
+    if (upstream.signal.aborted) {
+      response.data.destroy();
+      return;
+    }
+    upstream.signal.addEventListener('abort', () => response.data.destroy());
+
+    res.status(200);
+    res.setHeader('Content-Type', response.headers['content-type'] || 'application/x-ndjson');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.setHeader('X-Accel-Buffering', 'no');
+    res.flushHeaders();
+    response.data.pipe(res);
+
+  } catch (error) {
+    if (axios.isCancel(error)) {
+      // The client left before the Python service answered
+      return;
+    }
+    console.error('Error streaming board detection from Python service:', error);
+
+    let errorMessage = 'Failed to detect chess boards';
+    let statusCode = 500;
+
+    if (error.code === 'ECONNREFUSED') {
+      errorMessage = 'Python service is not available. Please ensure it is running on localhost:5000';
+      statusCode = 503;
+    } else if (error.response) {
+      errorMessage = 'Python service error';
+      statusCode = error.response.status;
+    }
+
+    res.status(statusCode).json({
+      success: false,
+      message: errorMessage,
+      error: error.message,
+      // Only a hash-only request can miss; the body is a stream, so the flag is not read from it
+      ...(statusCode === 404 && !req.file && { upload_required: true })
+    });
+  }
+});
+
+/**
+ * Send an error from a proxied Python service call back to the client
+ */
+function sendPythonServiceError(res, error, defaultMessage) {
+  let errorMessage = defaultMessage;
+  let statusCode = 500;
+
+  if (error.code === 'ECONNREFUSED') {
+    errorMessage = 'Python service is not available. Please ensure it is running on localhost:5000';
+    statusCode = 503;
+  } else if (error.response) {
+    errorMessage = error.response.data?.message || 'Python service error';
+    statusCode = error.response.status;
+    // Overload (503) and rate limit (429) responses say when to retry
+    if (error.response.headers?.['retry-after']) {
+      res.set('Retry-After', error.response.headers['retry-after']);
+    }
+  } else if (error.message.includes('timeout')) {
+    errorMessage = 'Request timeout - Python service took too long';
+    statusCode = 408;
+  }
+
+  res.status(statusCode).json({
+    success: false,
+    message: errorMessage,
+    error: error.message,
+    ...(error.response?.data?.upload_required && { upload_required: true })
+  });
+}
+
+/**
+ * POST /api/board-detection-jobs
+ * Queue background chess board detection for a PDF. Returns a job id
+ * immediately instead of holding the connection open for the whole book.
+ * Returns: { success: boolean, job_id: string, status: string, progress: object, pdf_hash: string }
+ */
+router.post('/board-detection-jobs', upload.single('pdf'), async (req, res) => {
+  try {
+    if (!req.file && !req.body.pdf_hash) {
+      return res.status(400).json({
+        success: false,
+        message: 'PDF file is required'
+      });
+    }
+
+    if (req.file) {
+      console.log(`Queueing board detection job for PDF file: ${req.file.originalname}, Size: ${req.file.size} bytes`);
+    }
+
+    const response = await postPdfHashFirst(req, '/jobs', {
+      timeout: 30000, // Only the upload; detection runs in the background
+    });
+
+    res.status(202).json(response.data);
+
+  } catch (error) {
+    console.error('Error queueing board detection job:', error);
+    sendPythonServiceError(res, error, 'Failed to queue board detection job');
+  }
+});
+
+/**
+ * GET /api/board-detection-jobs/:jobId
+ * Poll job status and progress (pages done out of total)
+ */
+router.get('/board-detection-jobs/:jobId', async (req, res) => {
+  try {
+    const response = await axios.get(
+      `${PYTHON_SERVICE_URL}/jobs/${encodeURIComponent(req.params.jobId)}`,
+      { headers: clientHeaders(req), timeout: 10000 }
+    );
+    res.json(response.data);
+  } catch (error) {
+    console.error('Error fetching board detection job:', error);
+    sendPythonServiceError(res, error, 'Failed to fetch board detection job');
+  }
+});
+
+/**
+ * GET /api/board-detection-jobs/:jobId/results
+ * Bounding boxes found so far, or the final detection result once completed
+ */
+router.get('/board-detection-jobs/:jobId/results', async (req, res) => {
+  try {
+    const response = await axios.get(
+      `${PYTHON_SERVICE_URL}/jobs/${encodeURIComponent(req.params.jobId)}/results`,
+      { headers: clientHeaders(req), timeout: 10000 }
+    );
+    res.json(response.data);
+  } catch (error) {
+    console.error('Error fetching board detection job results:', error);
+    sendPythonServiceError(res, error, 'Failed to fetch board detection job results');
+  }
+});
+
+/**
+ * DELETE /api/board-detection-jobs/:jobId
+ * Cancel a queued or running detection job
+ */
+router.delete('/board-detection-jobs/:jobId', async (req, res) => {
+  try {
+    const response = await axios.delete(
+      `${PYTHON_SERVICE_URL}/jobs/${encodeURIComponent(req.params.jobId)}`,
+      { headers: clientHeaders(req), timeout: 10000 }
+    );
+    res.json(response.data);
+  } catch (error) {
+    console.error('Error cancelling board detection job:', error);
+    sendPythonServiceError(res, error, 'Failed to cancel board detection job');
+  }
+});
+
 /**
  * POST /api/get-fen
  * Accept bounding box coordinates and forward to Python service for FEN extraction
@@ -139,6 +388,7 @@ router.post('/get-fen', async (req, res) => {
     }, {
       headers: {
         'Content-Type': 'application/json',
+        ...clientHeaders(req),
       },
       timeout: 10000, // 10 second timeout
     });
@@ -262,45 +512,47 @@ router.post('/detect-chess-all', async (req, res) => {
 
 /**
  * POST /api/batch-get-fen
- * Extract FENs from multiple bounding boxes
- * Body: { pdfUrl: string, boundingBoxes: ChessBoundingBox[] }
- * Returns: { success: boolean, fens: string[] }
+ * Extract FENs from multiple bounding boxes with a single call to the Python service
+ * Body: { pdf_hash: string, boundingBoxes: ChessBoundingBox[] }
+ * Returns: { success: boolean, fens: (string | null)[], results: object[] }
  */
 router.post('/batch-get-fen', async (req, res) => {
   try {
-    const { pdfUrl, boundingBoxes } = req.body;
+    const { pdf_hash, boundingBoxes } = req.body;
     
-    if (!pdfUrl || !Array.isArray(boundingBoxes)) {
+    if (!pdf_hash || !Array.isArray(boundingBoxes)) {
       return res.status(400).json({
         success: false,
-        message: 'PDF URL and bounding boxes array are required'
+        message: 'PDF hash and bounding boxes array are required'
       });
     }
 
     console.log(`Extracting FENs from ${boundingBoxes.length} bounding boxes`);
 
-    // Simulate processing delay
-    await new Promise(resolve => setTimeout(resolve, 1000));
-
-    // Extract FENs for each bounding box
-    const fens = boundingBoxes.map(box => {
-      const key = `${box.page}_${box.x}_${box.y}_${box.width}_${box.height}`;
-      return mockFenResponses[key] || 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1';
+    const response = await axios.post(`${PYTHON_SERVICE_URL}/extract_fen/batch`, {
+      pdf_hash,
+      boxes: boundingBoxes.map(({ page, x, y, width, height }) => ({ page, x, y, width, height }))
+    }, {
+      headers: {
+        'Content-Type': 'application/json',
+        ...clientHeaders(req),
+      },
+      timeout: 60000, // 1 minute for a whole batch
     });
 
+    // Per-box results; failed boxes get a null FEN instead of failing the batch
+    const results = response.data.results || [];
+
     res.json({
       success: true,
-      fens,
-      message: `Extracted ${fens.length} FENs successfully`
+      fens: results.map(result => (result.success ? result.fen : null)),
+      results,
+      message: response.data.message || `Extracted ${results.length} FENs successfully`
     });
 
   } catch (error) {
     console.error('Error in batch FEN extraction:', error);
-    res.status(500).json({
-      success: false,
-      message: 'Failed to extract FENs from bounding boxes',
-      error: error.message
-    });
+    sendPythonServiceError(res, error, 'Failed to extract FENs from bounding boxes');
   }
 });
 
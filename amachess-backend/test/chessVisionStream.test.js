@@ -0,0 +1,132 @@
+/**
+ * POST /api/get-board-bounds/stream against a fake Python service: when the
+ * client disconnects, the upstream detection stream must be torn down.
+ *
+ *   npm test
+ */
+const { test, before, after } = require('node:test');
+const assert = require('node:assert');
+const http = require('http');
+const express = require('express');
+
+const PDF_HASH = 'a'.repeat(32);
+
+let upstream;
+let backend;
+// Per-test hooks the fake Python service calls for each stream request
+let onUpstreamRequest = () => {};
+
+function listen(server) {
+  return new Promise((resolve) => server.listen(0, '127.0.0.1', () => resolve(server.address().port)));
+}
+
+function withTimeout(promise, ms, what) {
+  let timer;
+  const timeout = new Promise((_, reject) => {
+    timer = setTimeout(() => reject(new Error(`${what} within ${ms} ms`)), ms);
+  });
+  return Promise.race([promise, timeout]).finally(() => clearTimeout(timer));
+}
+
+/**
+ * Resolves when the upstream request is closed before its response finished,
+ * i.e. the backend aborted it
+ */
+function upstreamAborted(upstreamRes) {
+  return new Promise((resolve) => {
+    upstreamRes.on('close', () => {
+      if (!upstreamRes.writableFinished) resolve();
+    });
+  });
+}
+
+/**
+ * Open the stream as a client; resolves with the client request once
+ * received() says enough has arrived (or right away when it is null)
+ */
+function openStream(received) {
+  return new Promise((resolve) => {
+    const body = JSON.stringify({ pdf_hash: PDF_HASH });
+    const clientReq = http.request({
+      host: '127.0.0.1',
+      port: backend.address().port,
+      path: '/api/get-board-bounds/stream',
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(body) }
+    }, (clientRes) => {
+      let text = '';
+      clientRes.on('data', (chunk) => {
+        text += chunk;
+        if (received && received(text)) resolve(clientReq);
+      });
+    });
+    clientReq.on('error', () => {});
+    clientReq.end(body, () => {
+      if (!received) resolve(clientReq);
+    });
+  });
+}
+
+before(async () => {
+  upstream = http.createServer((req, res) => onUpstreamRequest(req, res));
+  const upstreamPort = await listen(upstream);
+
+  process.env.PYTHON_SERVICE_URL = `http://127.0.0.1:${upstreamPort}`;
+  const chessVisionRoutes = require('../src/routes/chessVision');
+  const app = express();
+  app.use(express.json());
+  app.use('/api', chessVisionRoutes);
+  backend = http.createServer(app);
+  await listen(backend);
+});
+
+after(() => {
+  backend.closeAllConnections();
+  upstream.closeAllConnections();
+  backend.close();
+  upstream.close();
+});
+
+test('client disconnecting mid-stream aborts the upstream stream', async () => {
+  let aborted;
+  let page = 0;
+  onUpstreamRequest = (req, res) => {
+    aborted = upstreamAborted(res);
+    res.writeHead(200, { 'Content-Type': 'application/x-ndjson' });
+    const timer = setInterval(() => {
+      page += 1;
+      res.write(JSON.stringify({ type: 'page', page, boundingBoxes: [] }) + '\n');
+    }, 20);
+    res.on('close', () => clearInterval(timer));
+  };
+
+  const clientReq = await withTimeout(openStream((text) => text.includes('"page":2')), 5000, 'two pages arrive');
+  clientReq.destroy();
+
+  await withTimeout(aborted, 2000, 'upstream aborted');
+  const pagesAtAbort = page;
+  await new Promise((resolve) => setTimeout(resolve, 100));
+  assert.strictEqual(page, pagesAtAbort, 'upstream kept producing pages after the client left');
+});
+
+test('client disconnecting before the upstream answers aborts the upstream request', async () => {
+  let aborted;
+  let answer;
+  onUpstreamRequest = (req, res) => {
+    aborted = upstreamAborted(res);
+    // Headers only after a while, like a service still waiting for a detection slot
+    answer = setTimeout(() => {
+      res.writeHead(200, { 'Content-Type': 'application/x-ndjson' });
+      res.write(JSON.stringify({ type: 'page', page: 1, boundingBoxes: [] }) + '\n');
+    }, 500);
+    res.on('close', () => clearTimeout(answer));
+  };
+
+  const clientReq = await openStream(null);
+  // Let the backend forward the request before leaving
+  await new Promise((resolve) => setTimeout(resolve, 100));
+  assert.ok(aborted, 'the request reached the Python service');
+  clientReq.destroy();
+
+  await withTimeout(aborted, 2000, 'upstream aborted');
+});
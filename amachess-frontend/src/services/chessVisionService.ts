@@ -220,17 +220,18 @@ export class ChessVisionService {
   }
 
   /**
-   * Batch extract FENs from multiple bounding boxes
+   * Batch extract FENs from multiple bounding boxes of the last detected PDF
    * @param pdfUrl - URL or path to the PDF file
    * @param boundingBoxes - Array of bounding boxes
-   * @returns Promise containing array of FEN strings
+   * @returns Promise containing array of FEN strings (null where extraction failed)
    */
-  async batchExtractFens(pdfUrl: string, boundingBoxes: ChessBoundingBox[]): Promise<string[]> {
+  async batchExtractFens(pdfUrl: string, boundingBoxes: ChessBoundingBox[]): Promise<(string | null)[]> {
     try {
       const response = await axios.post(
         `${API_BASE_URL}/batch-get-fen`,
         {
           pdfUrl,
+          pdf_hash: this.lastPdfHash,
           boundingBoxes
         },
         { headers: this.getAuthHeaders() }